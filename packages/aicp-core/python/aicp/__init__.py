@@ -5,4 +5,5 @@ __version__ = "0.1.0"
 __all__ = ["AICPMessage"]
 from .websocket_transport import AICPWebSocketServer, AICPWebSocketClient
 from .metrics import MetricsCollector, AgentMetrics
+from .weighted_sampler import WeightedSampler
 from .routing_strategies import Router, RoundRobinRouter, LeastLoadedRouter, TrustWeightedRouter, PerformanceBasedRouter, RandomRouter, RoutingStrategy
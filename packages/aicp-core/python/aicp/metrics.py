@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict
+from typing import Callable, Dict, List
 
 @dataclass
 class AgentMetrics:
@@ -36,6 +36,16 @@ class AgentMetrics:
 class MetricsCollector:
     def __init__(self):
         self.metrics: Dict[str, AgentMetrics] = {}
+        self.listeners: List[Callable[[str, AgentMetrics], None]] = []
+    
+    def add_listener(self, listener: Callable[[str, AgentMetrics], None]):
+        """Call listener(agent_id, metrics) after every recorded success or failure"""
+        self.listeners.append(listener)
+    
+    def _notify(self, agent_id: str):
+        metrics = self.metrics[agent_id]
+        for listener in self.listeners:
+            listener(agent_id, metrics)
     
     def get_or_create(self, agent_id: str) -> AgentMetrics:
         if agent_id not in self.metrics:
@@ -44,9 +54,11 @@ class MetricsCollector:
     
     def record_success(self, agent_id: str, latency: float):
         self.get_or_create(agent_id).record_success(latency)
+        self._notify(agent_id)
     
     def record_failure(self, agent_id: str):
         self.get_or_create(agent_id).record_failure()
+        self._notify(agent_id)
     
     def get_metrics(self, agent_id: str) -> AgentMetrics:
         return self.get_or_create(agent_id)
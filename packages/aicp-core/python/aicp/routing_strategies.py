@@ -2,6 +2,7 @@ from enum import Enum
 from typing import List, Dict
 import random
 from datetime import datetime, timedelta
+from .weighted_sampler import WeightedSampler
 
 class RoutingStrategy(Enum):
     ROUND_ROBIN = "round-robin"
@@ -47,14 +48,59 @@ class LeastLoadedRouter(Router):
             self.pending_tasks[agent_id] = max(0, self.pending_tasks[agent_id] - 1)
 
 class TrustWeightedRouter(Router):
+    def __init__(self, agent_registry, metrics_collector):
+        super().__init__(agent_registry, metrics_collector)
+        # method -> agents weighted by trust; picks are O(log n) and trust updates change one entry
+        self.samplers: Dict[str, WeightedSampler] = {}
+        self.registry_size = len(agent_registry)
+        if hasattr(metrics_collector, "add_listener"):
+            metrics_collector.add_listener(self.trust_changed)
+    
+    def trust_changed(self, agent_id: str, metrics):
+        for sampler in self.samplers.values():
+            if agent_id in sampler:
+                sampler.set(agent_id, metrics.trust_score)
+    
+    def reset(self):
+        """Rebuild samplers on next use (call after changing the registry in place)"""
+        self.samplers.clear()
+        self.registry_size = len(self.agent_registry)
+    
+    def sampler_for(self, method: str) -> WeightedSampler:
+        if len(self.agent_registry) != self.registry_size:
+            self.reset()
+        if method not in self.samplers:
+            agents = self.find_agents_with_capability(method)
+            self.samplers[method] = WeightedSampler(
+                (agent, self.metrics.get_metrics(agent).trust_score) for agent in agents
+            )
+        return self.samplers[method]
+    
     def select_agent(self, method: str) -> str:
+        sampler = self.sampler_for(method)
+        excluded: Dict[str, float] = {}
+        try:
+            for _ in range(len(sampler)):
+                agent = sampler.sample()
+                if agent is None:
+                    break
+                if self.is_agent_healthy(agent):
+                    return agent
+                # Out of this draw only: its trust is restored below, so it is back once healthy
+                excluded[agent] = sampler.weight(agent)
+                sampler.set(agent, 0.0)
+        finally:
+            for agent, weight in excluded.items():
+                sampler.set(agent, weight)
+        
+        # No healthy agent with trust in the sampler: weigh the healthy ones by their current trust
         agents = [a for a in self.find_agents_with_capability(method) if self.is_agent_healthy(a)]
-        if not agents: raise ValueError(f"No healthy agents for {method}")
-        if len(agents) == 1: return agents[0]
-        metrics = {a: self.metrics.get_metrics(a).trust_score for a in agents}
-        total = sum(metrics.values())
-        weights = [metrics[a] / total for a in agents]
-        return random.choices(agents, weights=weights, k=1)[0]
+        if not agents:
+            raise ValueError(f"No healthy agents for {method}")
+        weights = [self.metrics.get_metrics(a).trust_score for a in agents]
+        if sum(weights) <= 0:
+            return random.choice(agents)
+        return random.choices(agents, weights=weights)[0]
 
 class PerformanceBasedRouter(Router):
     def select_agent(self, method: str) -> str:
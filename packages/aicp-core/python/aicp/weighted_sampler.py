@@ -0,0 +1,155 @@
+"""Weighted random sampling over a mutable set of keys
+
+Routers pick agents with probability proportional to a weight (trust).
+Rebuilding a weight list and calling random.choices costs O(n) per pick;
+WeightedSampler keeps the weights in a Fenwick (binary indexed) tree so
+set/remove and sample are O(log n) however many agents there are, and a
+trust change updates one entry in place.
+"""
+
+import random
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class WeightedSampler:
+    """Keys with non-negative weights, sampled proportionally to weight"""
+
+    def __init__(self, items: Iterable[Tuple[Hashable, float]] = ()):
+        """
+        Args:
+            items: Initial (key, weight) pairs
+        """
+        self.keys: List[Hashable] = []
+        self.weights: List[float] = []
+        self.slots: Dict[Hashable, int] = {}
+        for key, weight in items:
+            if key in self.slots:
+                self.weights[self.slots[key]] = self._check(weight)
+            else:
+                self.slots[key] = len(self.keys)
+                self.keys.append(key)
+                self.weights.append(self._check(weight))
+        self._rebuild(max(1, len(self.keys)))
+
+    @staticmethod
+    def _check(weight: float) -> float:
+        weight = float(weight)
+        if weight < 0 or weight != weight:
+            raise ValueError(f"Weight must be a non-negative number, got {weight}")
+        return weight
+
+    def _rebuild(self, capacity: int):
+        """Build the tree in O(n) for at least capacity slots"""
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.tree = [0.0] * (size + 1)
+        self.tree[1:len(self.weights) + 1] = self.weights
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent <= size:
+                self.tree[parent] += self.tree[i]
+        self.updates = 0
+
+    def _add(self, slot: int, delta: float):
+        i = slot + 1
+        size = len(self.tree) - 1
+        while i <= size:
+            self.tree[i] += delta
+            i += i & -i
+        self.updates += 1
+
+    def _settle(self):
+        # Rebuild now and then so float error from many updates can't pile up
+        size = len(self.tree) - 1
+        if self.updates > 4 * size:
+            self._rebuild(size)
+
+    # ==================== MUTATION ====================
+
+    def set(self, key: Hashable, weight: float):
+        """Add a key or change its weight"""
+        weight = self._check(weight)
+        slot = self.slots.get(key)
+        if slot is not None:
+            self._add(slot, weight - self.weights[slot])
+            self.weights[slot] = weight
+            self._settle()
+            return
+
+        slot = self.slots[key] = len(self.keys)
+        self.keys.append(key)
+        self.weights.append(weight)
+        if len(self.keys) > len(self.tree) - 1:
+            self._rebuild(2 * (len(self.tree) - 1))
+        else:
+            self._add(slot, weight)
+            self._settle()
+
+    def remove(self, key: Hashable):
+        """Drop a key; the last key moves into its slot"""
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return
+        last = len(self.keys) - 1
+        self._add(slot, -self.weights[slot])
+        if slot != last:
+            moved, moved_weight = self.keys[last], self.weights[last]
+            self._add(last, -moved_weight)
+            self.keys[slot], self.weights[slot] = moved, moved_weight
+            self.slots[moved] = slot
+            self._add(slot, moved_weight)
+        self.keys.pop()
+        self.weights.pop()
+        self._settle()
+
+    # ==================== QUERIES ====================
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.slots
+
+    def weight(self, key: Hashable) -> float:
+        slot = self.slots.get(key)
+        return 0.0 if slot is None else self.weights[slot]
+
+    @property
+    def total(self) -> float:
+        # The tree size is a power of two, so its last node covers every slot
+        return self.tree[-1]
+
+    def sample(self, rng=random) -> Optional[Hashable]:
+        """
+        Pick a key with probability weight / total.
+
+        Args:
+            rng: Random source with a random() method
+
+        Returns:
+            A key, or None if there are no keys with positive weight
+        """
+        size = len(self.tree) - 1
+        total = self.tree[size]
+        if not self.keys or total <= 0:
+            return None
+
+        # Walk down the tree to the first slot whose prefix sum exceeds the target
+        target = rng.random() * total
+        position = 0
+        step = size
+        while step:
+            following = position + step
+            if following <= size and self.tree[following] <= target:
+                target -= self.tree[following]
+                position = following
+            step //= 2
+
+        # Float error can land on an empty or out-of-range slot; step back to a weighted one
+        slot = min(position, len(self.keys) - 1)
+        while slot > 0 and self.weights[slot] <= 0:
+            slot -= 1
+        if self.weights[slot] <= 0:
+            return None
+        return self.keys[slot]
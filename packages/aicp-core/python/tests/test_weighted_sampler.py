@@ -0,0 +1,75 @@
+"""Test the Fenwick-tree weighted sampler and trust-weighted routing on top of it"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from aicp.metrics import MetricsCollector
+from aicp.routing_strategies import TrustWeightedRouter
+from aicp.weighted_sampler import WeightedSampler
+
+REGISTRY = {"a": {"capabilities": ["x"]}, "b": {"capabilities": ["x"]}}
+
+
+def test_sampling_follows_weights():
+    sampler = WeightedSampler([("a", 1.0), ("b", 3.0)])
+    rng = random.Random(7)
+
+    picks = [sampler.sample(rng) for _ in range(4000)]
+
+    assert sampler.total == 4.0
+    assert 0.7 < picks.count("b") / 4000 < 0.8
+
+
+def test_update_remove_and_growth():
+    sampler = WeightedSampler()
+    rng = random.Random(1)
+
+    # Growing past the initial capacity, then removing all but one key
+    for i in range(100):
+        sampler.set(i, 1.0)
+    for i in range(99):
+        sampler.remove(i)
+    assert len(sampler) == 1
+    assert sampler.sample(rng) == 99
+    assert sampler.total == pytest.approx(1.0)
+
+    # Zero weight keeps the key but never samples it
+    sampler.set(99, 0.0)
+    assert sampler.sample(rng) is None
+    sampler.set("x", 2.0)
+    assert sampler.sample(rng) == "x"
+    assert 99 in sampler
+
+    with pytest.raises(ValueError):
+        sampler.set("y", -1)
+
+
+def test_router_follows_trust_changes():
+    metrics = MetricsCollector()
+    router = TrustWeightedRouter(REGISTRY, metrics)
+    router.select_agent("x")
+
+    # Failures drop a's trust through the collector listener, in place
+    for _ in range(10):
+        metrics.record_failure("a")
+
+    assert router.samplers["x"].weight("a") == pytest.approx(0.0)
+    assert all(router.select_agent("x") == "b" for _ in range(50))
+
+
+def test_unhealthy_agents_are_skipped_without_losing_trust():
+    metrics = MetricsCollector()
+    router = TrustWeightedRouter(REGISTRY, metrics)
+    metrics.get_or_create("b").trust_score = 0.9
+
+    # b is unhealthy: every pick goes to a, and b keeps its weight
+    metrics.get_metrics("b").last_seen = datetime.now() - timedelta(minutes=10)
+    assert all(router.select_agent("x") == "a" for _ in range(50))
+    assert router.samplers["x"].weight("b") == pytest.approx(0.9)
+
+    # Healthy again: b is back at its trust share
+    metrics.get_metrics("b").last_seen = datetime.now()
+    random.seed(3)
+    picks = [router.select_agent("x") for _ in range(2000)]
+    assert 0.55 < picks.count("b") / 2000 < 0.8
@@ -4,9 +4,12 @@ from typing import List, Optional, Dict, Any
 import secrets
 import random
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, update
 
 from .db import Task, Agent, TaskChain, ScheduledTask
+from .load_index import load_index
+from .trust_index import trust_index
+from .latency_sketch import latency_tracker
 
 
 # ============================================================================
@@ -221,36 +224,79 @@ def on_chain_task_complete(db: Session, task: Task):
 # ROUTING STRATEGIES
 # ============================================================================
 
+# Selection rules are kept free of the database so the scheduling simulator
+# (see simulator.py) runs the same logic against in-memory agents. Agents
+# only need agent_id, tags, trust_score, last_assigned_at,
+# avg_completion_time_seconds and total_tasks_completed.
+
+_MIN_DATETIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _last_assigned_key(agent) -> datetime:
+    if agent.last_assigned_at is None:
+        return _MIN_DATETIME
+    # Ensure timezone-aware
+    if agent.last_assigned_at.tzinfo is None:
+        return agent.last_assigned_at.replace(tzinfo=timezone.utc)
+    return agent.last_assigned_at
+
+
+def pick_round_robin(agents: List[Any]) -> Optional[Any]:
+    """Least recently assigned agent (never-assigned agents first)"""
+    if not agents:
+        return None
+    # min() keeps the first of equal keys, like a stable sort
+    return min(agents, key=_last_assigned_key)
+
+
+def pick_trust_weighted(agents: List[Any], capability: str, rng=random) -> Optional[Any]:
+    """Random capable agent weighted by trust, preferring trust >= 0.3"""
+    capable_agents = [agent for agent in agents if capability in (agent.tags or [])]
+    trusted_agents = [agent for agent in capable_agents if agent.trust_score >= 0.3]
+    # Fallback: any capable agent
+    candidates = trusted_agents or capable_agents
+    if not candidates:
+        return None
+    
+    # Weight selection by trust score
+    weights = [max(agent.trust_score, 0.1) for agent in candidates]
+    return rng.choices(candidates, weights=weights, k=1)[0]
+
+
+def pick_fastest_response(agents: List[Any]) -> Optional[Any]:
+    """Agent with the fastest average completion time, else the first agent"""
+    if not agents:
+        return None
+    measured = [
+        agent for agent in agents
+        if agent.avg_completion_time_seconds is not None and agent.total_tasks_completed > 0
+    ]
+    if not measured:
+        return agents[0]
+    return min(measured, key=lambda agent: agent.avg_completion_time_seconds)
+
+
+def _with_free_slots(db: Session, agents: List[Any]) -> List[Any]:
+    """Agents below their max_concurrency (per the load index)"""
+    load_index.ensure_loaded(db)
+    return [agent for agent in agents if load_index.free_slots(agent.agent_id) > 0]
+
+
 def route_round_robin(db: Session, task: Task) -> Optional[str]:
     """Round-robin routing: distribute tasks evenly"""
     # Find capable agents
     agents = db.query(Agent).all()
     
-    # Filter agents with matching capability
-    capable_agents = [
+    # Filter agents with matching capability and a free slot
+    capable_agents = _with_free_slots(db, [
         agent for agent in agents
         if task.capability_required in (agent.tags or [])
-    ]
+    ])
     
-    if not capable_agents:
+    # Select least recently assigned agent
+    selected = pick_round_robin(capable_agents)
+    if selected is None:
         return None
-    
-    # Sort by last_assigned_at (nulls first)
-    # Use a sentinel value that's timezone-aware
-    min_datetime = datetime.min.replace(tzinfo=timezone.utc)
-    
-    def get_sort_key(agent):
-        if agent.last_assigned_at is None:
-            return min_datetime
-        # Ensure timezone-aware
-        if agent.last_assigned_at.tzinfo is None:
-            return agent.last_assigned_at.replace(tzinfo=timezone.utc)
-        return agent.last_assigned_at
-    
-    capable_agents.sort(key=get_sort_key)
-    
-    # Select first agent (least recently assigned)
-    selected = capable_agents[0]
     selected.last_assigned_at = datetime.now(timezone.utc)
     db.commit()
     
@@ -260,58 +306,47 @@ def route_round_robin(db: Session, task: Task) -> Optional[str]:
 
 def route_least_loaded(db: Session, task: Task) -> Optional[str]:
     """Route to agent with fewest active tasks"""
-    # Find capable agents
-    agents = db.query(Agent).filter(
-        Agent.tags.contains([task.capability_required])
-    ).all()
-    
-    if not agents:
+    # In-flight counts come from the load index, not a count() per agent
+    load_index.ensure_loaded(db)
+    agent_id = load_index.least_loaded(task.capability_required)
+    if agent_id is None:
         return None
     
-    # Calculate load for each agent
-    agent_loads = []
-    for agent in agents:
-        active_count = db.query(Task).filter(
-            Task.assigned_agent_id == agent.agent_id,
-            Task.status.in_(["ASSIGNED", "RUNNING"])
-        ).count()
-        agent_loads.append((agent, active_count))
-    
-    # Sort by load (ascending) and select least loaded
-    agent_loads.sort(key=lambda x: x[1])
-    
-    selected = agent_loads[0][0]
-    selected.last_assigned_at = datetime.now(timezone.utc)
+    table = Agent.__table__
+    db.execute(
+        update(table).where(table.c.agent_id == agent_id).values(last_assigned_at=datetime.now(timezone.utc))
+    )
     db.commit()
     
-    return selected.agent_id
+    return agent_id
 
 
 def route_trust_weighted(db: Session, task: Task) -> Optional[str]:
     """Route based on trust score, favoring highly trusted agents"""
-    # Find all agents
-    agents = db.query(Agent).all()
-    
-    # Filter capable agents with minimum trust
-    capable_agents = [
-        agent for agent in agents
-        if task.capability_required in (agent.tags or [])
-        and agent.trust_score >= 0.3
-    ]
-    
-    if not capable_agents:
-        # Fallback: any capable agent
-        capable_agents = [
-            agent for agent in agents
-            if task.capability_required in (agent.tags or [])
-        ]
-        
-        if not capable_agents:
+    if trust_index.available:
+        # O(log n) draw from the capability's trust sampler instead of loading every agent
+        trust_index.ensure_loaded(db)
+        load_index.ensure_loaded(db)
+        agent_id = trust_index.sample(
+            task.capability_required, accept=lambda candidate: load_index.free_slots(candidate) > 0
+        )
+        if agent_id is None:
             return None
+        
+        table = Agent.__table__
+        db.execute(
+            update(table).where(table.c.agent_id == agent_id).values(last_assigned_at=datetime.now(timezone.utc))
+        )
+        db.commit()
+        
+        return agent_id
     
-    # Weight selection by trust score
-    weights = [max(agent.trust_score, 0.1) for agent in capable_agents]
-    selected = random.choices(capable_agents, weights=weights, k=1)[0]
+    # Find all agents with a free slot
+    agents = _with_free_slots(db, db.query(Agent).all())
+    
+    selected = pick_trust_weighted(agents, task.capability_required)
+    if selected is None:
+        return None
     
     selected.last_assigned_at = datetime.now(timezone.utc)
     db.commit()
@@ -326,23 +361,57 @@ def route_fastest_response(db: Session, task: Task) -> Optional[str]:
         Agent.avg_completion_time_seconds.isnot(None),
         Agent.total_tasks_completed > 0
     ).order_by(Agent.avg_completion_time_seconds.asc()).all()
+    agents = _with_free_slots(db, agents)
     
     if not agents:
         # Fallback: any capable agent
-        agents = db.query(Agent).filter(
+        agents = _with_free_slots(db, db.query(Agent).filter(
             Agent.tags.contains([task.capability_required])
-        ).all()
+        ).all())
         
         if not agents:
             return None
     
-    selected = agents[0]
+    selected = pick_fastest_response(agents)
     selected.last_assigned_at = datetime.now(timezone.utc)
     db.commit()
     
     return selected.agent_id
 
 
+def task_deadline_ms(task: Task, now: Optional[datetime] = None) -> Optional[float]:
+    """Time the client allows for a task: its timeout, else what is left until it expires"""
+    if task.timeout_seconds:
+        return task.timeout_seconds * 1000.0
+    if task.expires_at is not None:
+        now = now or datetime.now(timezone.utc)
+        expires_at = task.expires_at if task.expires_at.tzinfo else task.expires_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (expires_at - now).total_seconds() * 1000)
+    return None
+
+
+def route_slo_aware(db: Session, task: Task) -> Optional[str]:
+    """Route to the agent with the lowest predicted p99 latency that meets the task's deadline"""
+    table = Agent.__table__
+    load_index.ensure_loaded(db)
+    capable = [
+        agent_id for agent_id, tags in db.execute(select(table.c.agent_id, table.c.tags)).all()
+        if task.capability_required in (tags or []) and load_index.free_slots(agent_id) > 0
+    ]
+    
+    # Predictions come from observed latency sketches, or advertised SLOs for cold agents
+    agent_id = latency_tracker.choose(task.capability_required, capable, task_deadline_ms(task))
+    if agent_id is None:
+        return None
+    
+    db.execute(
+        update(table).where(table.c.agent_id == agent_id).values(last_assigned_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+    
+    return agent_id
+
+
 def route_task(db: Session, task: Task) -> Optional[str]:
     """
     Route a task to an agent based on the specified routing strategy.
@@ -356,7 +425,8 @@ def route_task(db: Session, task: Task) -> Optional[str]:
         "round_robin": route_round_robin,
         "least_loaded": route_least_loaded,
         "trust_weighted": route_trust_weighted,
-        "fastest_response": route_fastest_response
+        "fastest_response": route_fastest_response,
+        "slo_aware": route_slo_aware
     }
     
     route_func = routing_functions.get(strategy, route_round_robin)
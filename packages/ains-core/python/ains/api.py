@@ -6,7 +6,7 @@ from .trust_system import (
     adjust_trust_score
 )
 from .db import TrustRecord
-from .performance import get_system_stats, get_database_size, cleanup_old_data
+from .performance import stats_snapshot, get_database_size, get_slow_queries, cleanup_old_data
 from .webhooks import register_webhook, trigger_webhook_event, get_webhook_deliveries
 from .db import Webhook, WebhookDelivery
 from .batch import submit_batch_tasks, get_batch_status, cancel_batch_tasks
@@ -20,20 +20,32 @@ from fastapi import Query
 import json
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect, Header
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import func, create_engine, or_
 import sys
 import os
 import uuid
 import asyncio
+import anyio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .db import SessionLocal
 from .routing import route_pending_tasks
 from .task_queue import PriorityQueue, adjust_priority_by_age
+from .fair_queue import fair_queue
+from .leasing import lease_manager, lease_payload
+from .push import push_hub, PushEvent, parse_last_event_id
+from .heartbeats import heartbeat_buffer, HEARTBEAT_FLUSH_SECONDS, HEALTH_SWEEP_SECONDS, AGENT_STALE_SECONDS
+from .load_index import load_index
+from .trust_index import trust_index
+from .latency_sketch import latency_tracker
+from .hedging import hedge_manager
+from .result_cache import result_cache, capability_version
+from .idempotency import idempotency_store, IdempotencyKeyReused, IdempotencyInProgress, MAX_KEY_LENGTH
+from fastapi.encoders import jsonable_encoder
 import secrets  # Add this if not already present
 
 from .advanced_features import (
@@ -45,10 +57,16 @@ from .advanced_features import (
 )
 from .db import TaskChain, ScheduledTask
 
-from fastapi.responses import Response as FastAPIResponse
+from fastapi.responses import Response as FastAPIResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from ains.observability.metrics import get_metrics, initialize_app_info
 from ains.observability.middleware import PrometheusMiddleware
 from ains.observability.metrics import record_task_created, update_queue_depth
+from ains.observability.query_stats import query_stats
+from .db import engine as db_engine
+
+# Time every statement (slow-query log, per-request query budget)
+query_stats.instrument(db_engine)
 
 from .scheduling_endpoints import router as scheduling_router
 
@@ -60,7 +78,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../aicp-core/p
 
 # from aicp import KeyPair  # Optional for signature/data management
 from .db import Agent, AgentTag, Capability, TrustRecord, Task, get_db, create_tables
-from .cache import cache
+from .cache import cache, agent_key, capabilities_key, agent_list_key, etag_matches
+from .search_index import search_index
+from .pagination import keyset_page, count_rows, COUNT_MODE_PATTERN
 from .trust import calculate_trust_score, update_trust_score
 
 from typing import Optional, Dict, Any
@@ -82,12 +102,8 @@ router = APIRouter(prefix="/aitp/tasks", tags=["scheduling"])
 # Create router for scheduling endpoints
 router = APIRouter(prefix="/aitp/tasks", tags=["scheduling"])
 
-# Define database URL locally (not imported from db.py)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./ains.db"
-
-# Create SessionLocal for background tasks
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Background tasks use db.SessionLocal (imported above), so they share the
+# request handlers' DATABASE_URL engine
 
 
 class AgentRegistration(BaseModel):
@@ -98,6 +114,7 @@ class AgentRegistration(BaseModel):
     endpoint: str
     signature: str  # Hex-encoded signature
     tags: Optional[List[str]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, le=1024)  # Concurrent tasks accepted (default AINS_DEFAULT_AGENT_CONCURRENCY)
 
 class CapabilityPublish(BaseModel):
     name: str
@@ -116,6 +133,7 @@ class Heartbeat(BaseModel):
     status: str  # ACTIVE, DEGRADED, OFFLINE
     uptime_ms: int
     metrics: Optional[dict] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, le=1024)  # Re-declares the agent's concurrency slots
 
 
 # Task-related models
@@ -147,6 +165,7 @@ class TaskResponse(BaseModel):
     result_data: Optional[Dict[str, Any]] = None
     error_message: Optional[str] = None
     retry_count: int
+    result_cache: Optional[str] = None  # "hit" or "coalesced" when answered by the result cache
 
 
 class TaskUpdateStatus(BaseModel):
@@ -162,13 +181,77 @@ async def lifespan(app: FastAPI):
     # Startup
     print("✅ AINS API started - Database tables created")
     
+    # Rebuild the in-memory fair queue from pending tasks
+    db = SessionLocal()
+    try:
+        fair_queue.load_from_db(db)
+    except Exception as e:
+        print(f"⚠️  Fair queue not loaded at startup: {e}")
+    finally:
+        db.close()
+    
+    # Load agent statuses for heartbeat batching
+    db = SessionLocal()
+    try:
+        heartbeat_buffer.load_from_db(db)
+    except Exception as e:
+        print(f"⚠️  Heartbeat buffer not loaded at startup: {e}")
+    finally:
+        db.close()
+    
+    # Load agent in-flight counts for least-loaded routing
+    db = SessionLocal()
+    try:
+        load_index.load_from_db(db)
+    except Exception as e:
+        print(f"⚠️  Load index not loaded at startup: {e}")
+    finally:
+        db.close()
+    
+    # Build per-capability trust samplers for trust-weighted routing
+    db = SessionLocal()
+    try:
+        trust_index.load_from_db(db)
+    except Exception as e:
+        print(f"⚠️  Trust index not loaded at startup: {e}")
+    finally:
+        db.close()
+    
+    # Rebuild latency sketches and advertised SLOs for SLO-aware routing
+    db = SessionLocal()
+    try:
+        latency_tracker.load_from_db(db)
+    except Exception as e:
+        print(f"⚠️  Latency sketches not loaded at startup: {e}")
+    finally:
+        db.close()
+    
     # Start background task routing worker
     routing_task = asyncio.create_task(task_routing_worker())
+    reaper_task = asyncio.create_task(lease_reaper_worker())
+    flush_task = asyncio.create_task(heartbeat_flush_worker())
+    health_task = asyncio.create_task(monitor_agent_health_loop())
+    reconcile_task = asyncio.create_task(load_reconcile_worker())
+    hedge_task = asyncio.create_task(hedge_worker())
     
     yield
     
     # Shutdown
     routing_task.cancel()
+    reaper_task.cancel()
+    flush_task.cancel()
+    health_task.cancel()
+    reconcile_task.cancel()
+    hedge_task.cancel()
+    
+    # Persist heartbeats received since the last flush
+    db = SessionLocal()
+    try:
+        heartbeat_buffer.flush(db)
+    except Exception as e:
+        print(f"⚠️  Final heartbeat flush failed: {e}")
+    finally:
+        db.close()
     print("AINS API shutting down...")
 
 async def task_routing_worker():
@@ -190,6 +273,68 @@ async def task_routing_worker():
         # Wait 5 seconds before next routing cycle
         await asyncio.sleep(5)
 
+async def heartbeat_flush_worker():
+    """Background worker writing buffered heartbeats in batches"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_FLUSH_SECONDS)
+        try:
+            db = SessionLocal()
+            try:
+                await run_in_threadpool(heartbeat_buffer.flush, db)
+            except Exception as e:
+                print(f"Error flushing heartbeats: {e}")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Heartbeat flush worker error: {e}")
+
+async def load_reconcile_worker():
+    """Background worker correcting load index drift from writes that bypass task events"""
+    while True:
+        await asyncio.sleep(load_index.reconcile_seconds)
+        try:
+            db = SessionLocal()
+            try:
+                await run_in_threadpool(load_index.maybe_reconcile, db)
+            except Exception as e:
+                print(f"Error reconciling agent loads: {e}")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Load reconcile worker error: {e}")
+
+async def hedge_worker():
+    """Background worker dispatching hedge copies of overdue tasks and cancelling redundant ones"""
+    while True:
+        await asyncio.sleep(hedge_manager.check_seconds)
+        try:
+            db = SessionLocal()
+            try:
+                await run_in_threadpool(hedge_manager.run, db)
+            except Exception as e:
+                print(f"Error in hedging: {e}")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Hedge worker error: {e}")
+
+async def lease_reaper_worker():
+    """Background worker returning tasks with expired leases to the queue"""
+    interval = float(os.getenv("AINS_LEASE_REAP_SECONDS", "5"))
+    while True:
+        try:
+            db = SessionLocal()
+            try:
+                await run_in_threadpool(lease_manager.reap_expired, db)
+            except Exception as e:
+                print(f"Error in lease reaper: {e}")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Lease reaper worker error: {e}")
+        
+        await asyncio.sleep(interval)
+
 # Make sure to use this lifespan in your FastAPI app
 
 app = FastAPI(title="AINS API", version="0.1.0", lifespan=lifespan)
@@ -225,22 +370,18 @@ async def health_check():
     }
 
 async def monitor_agent_health_loop():
-    """Background task to monitor agent health"""
-    import asyncio
+    """Background task marking agents that stopped sending heartbeats INACTIVE"""
     while True:
         try:
-            await asyncio.sleep(60)  # Run every 60 seconds
+            await asyncio.sleep(HEALTH_SWEEP_SECONDS)
             session = SessionLocal()
-            threshold = datetime.now(timezone.utc) - timedelta(minutes=10)
-            stale_agents = session.query(Agent).filter(
-                Agent.last_heartbeat < threshold,
-                Agent.status == "ACTIVE"
-            ).all()
-            for agent in stale_agents:
-                agent.status = "INACTIVE"
-                cache.invalidate_agent(agent.agent_id)
-            session.commit()
-            session.close()
+            try:
+                # Runs in the threadpool so a mass outage can't stall the event loop
+                await run_in_threadpool(
+                    heartbeat_buffer.sweep, session, timedelta(seconds=AGENT_STALE_SECONDS)
+                )
+            finally:
+                session.close()
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -337,6 +478,31 @@ async def task_monitoring_loop():
             print(f"Error in task monitoring: {e}")
 
 
+def _json_body(payload: Any) -> bytes:
+    """Serialize a response payload once so it can be cached as bytes"""
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _cached_json_response(request: Request, key: str, build) -> FastAPIResponse:
+    """
+    Serve a JSON response through the response cache.
+    
+    On a miss, build() produces the payload, which is serialized and cached.
+    Clients sending a matching If-None-Match get a 304 without a body.
+    """
+    cached = cache.get_response(key)
+    if cached:
+        body, etag = cached
+    else:
+        body = _json_body(build())
+        etag = cache.set_response(key, body)
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return FastAPIResponse(status_code=304, headers=headers)
+    return FastAPIResponse(content=body, media_type="application/json", headers=headers)
+
+
 def find_suitable_agent(db: Session, capability_name: str) -> Optional[Agent]:
     """
     Find the most suitable agent for a given capability.
@@ -383,6 +549,7 @@ def register_agent(registration: AgentRegistration, db: Session = Depends(get_db
         endpoint=registration.endpoint,  # Changed from endpoint_url
         signature=registration.signature,
         tags=registration.tags or [],
+        max_concurrency=registration.max_concurrency,
         created_at=datetime.now(timezone.utc),
         last_seen_at=datetime.now(timezone.utc),
         trust_score=0.5  # Default trust score (0.0-1.0 range)
@@ -395,26 +562,30 @@ def register_agent(registration: AgentRegistration, db: Session = Depends(get_db
     db.commit()
     db.refresh(new_agent)
 
-    # Cache agent data
-    agent_data = {
-        "agent_id": new_agent.agent_id,
-        "public_key": new_agent.public_key,
-        "display_name": new_agent.display_name,
-        "endpoint": new_agent.endpoint,
-        "trust_score": float(new_agent.trust_score),
-        "created_at": new_agent.created_at.isoformat(),
-        "tags": new_agent.tags or []
-    }
-    cache.set_agent(new_agent.agent_id, agent_data)
+    response = AgentResponse(
+        agent_id=new_agent.agent_id,
+        public_key=new_agent.public_key,
+        display_name=new_agent.display_name,
+        endpoint=new_agent.endpoint,
+        created_at=new_agent.created_at.isoformat(),
+        trust_score=float(new_agent.trust_score),
+        tags=new_agent.tags or [],
+        max_concurrency=new_agent.max_concurrency
+    )
+
+    # Warm the read-through cache and drop listings that no longer include this agent
+    cache.set_response(agent_key(new_agent.agent_id), _json_body(response.model_dump()))
+    cache.invalidate_agent_listings()
+    search_index.add_agent(new_agent)
 
     # ========== METRICS: Track agent registration ==========
-    from ains.observability.metrics import agents_total, agents_active, update_agent_metrics
+    from ains.observability.metrics import agents_total, update_agent_metrics
     
-    # Update agent counts
+    # Update agent counts (the active gauge is kept by the heartbeat buffer)
     total_agents = db.query(Agent).count()
-    active_agents = total_agents
     agents_total.set(total_agents)
-    agents_active.set(active_agents)
+    heartbeat_buffer.track(new_agent.agent_id, new_agent.status, new_agent.last_heartbeat)
+    load_index.track_agent(new_agent.agent_id, new_agent.tags or [], new_agent.max_concurrency)
     
     # Update individual agent trust score
     update_agent_metrics(
@@ -424,15 +595,7 @@ def register_agent(registration: AgentRegistration, db: Session = Depends(get_db
     )
     # =======================================================
 
-    return AgentResponse(
-        agent_id=new_agent.agent_id,
-        public_key=new_agent.public_key,
-        display_name=new_agent.display_name,
-        endpoint=new_agent.endpoint,
-        created_at=new_agent.created_at.isoformat(),
-        trust_score=float(new_agent.trust_score),
-        tags=new_agent.tags or []
-    )
+    return response
 # ========== AGENT ENDPOINTS ==========
 
     
@@ -457,6 +620,15 @@ def get_agent_trust_metrics(agent_id: str, db: Session = Depends(get_db)):
     return get_trust_metrics(db, agent_id)
 
 
+@app.get("/ains/agents/{agent_id}/latency")
+def get_agent_latency(agent_id: str):
+    """Observed latency sketches and advertised SLOs for each of an agent's capabilities"""
+    capabilities = latency_tracker.agent_summary(agent_id)
+    if not capabilities:
+        raise HTTPException(status_code=404, detail="No latency data for agent")
+    return {"agent_id": agent_id, "capabilities": capabilities}
+
+
 @app.get("/ains/agents/{agent_id}/trust/history")
 def get_agent_trust_history(
     agent_id: str,
@@ -510,71 +682,68 @@ def manual_trust_adjustment(
 
 
 @app.get("/ains/agents/{agent_id}", response_model=AgentResponse)
-def get_agent(agent_id: str, db: Session = Depends(get_db)):
-    cached_agent = cache.get_agent(agent_id)
-    if cached_agent:
-        return AgentResponse(**cached_agent, tags=[])
-
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
-    if not agent:
-        raise HTTPException(status_code=404, detail="Agent not found")
-
-    tags = db.query(AgentTag).filter(AgentTag.agent_id == agent_id).all()
-    tag_list = [tag.tag for tag in tags]
-
-    agent_data = {
-        "agent_id": agent.agent_id,
-        "public_key": agent.public_key,
-        "display_name": agent.display_name,
-        "description": agent.description,
-        "endpoint": agent.endpoint_url,
-        "status": agent.status,
-        "trust_score": float(agent.trust_score),
-        "created_at": agent.created_at.isoformat()
-    }
-    cache.set_agent(agent.agent_id, agent_data)
-
-    return AgentResponse(
-        agent_id=agent.agent_id,
-        public_key=agent.public_key,
-        display_name=agent.display_name,
-        description=agent.description,
-        endpoint=agent.endpoint_url,
-        status=agent.status,
-        created_at=agent.created_at.isoformat(),
-        trust_score=float(agent.trust_score),
-        tags=tag_list
-    )
+def get_agent(agent_id: str, request: Request, db: Session = Depends(get_db)):
+    """Get agent details (read-through cached, supports If-None-Match)"""
+    def build():
+        agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        
+        return AgentResponse(
+            agent_id=agent.agent_id,
+            public_key=agent.public_key,
+            display_name=agent.display_name,
+            endpoint=agent.endpoint,
+            created_at=agent.created_at.isoformat(),
+            trust_score=float(agent.trust_score),
+            tags=agent.tags or [],
+            max_concurrency=agent.max_concurrency
+        ).model_dump()
+    
+    return _cached_json_response(request, agent_key(agent_id), build)
 
 
 @app.get("/ains/agents")
 def list_agents(
+    request: Request,
     status: Optional[str] = None,
     limit: int = Query(10, gt=0),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Agent)
-    if status:
-        query = query.filter(Agent.status == status)
+    """List agents (keyset-paginated on id, read-through cached, supports If-None-Match)"""
+    def build():
+        query = db.query(Agent)
+        if status:
+            query = query.filter(Agent.status == status)
 
-    total = query.count()
-    agents = query.limit(limit).offset(offset).all()
+        try:
+            agents, next_cursor = keyset_page(
+                query, [Agent.id], limit, cursor=cursor, offset=offset, descending=False
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    return {
-        "agents": [
-            {
-                "agent_id": agent.agent_id,
-                "display_name": agent.display_name,
-                "status": agent.status,
-                "trust_score": float(agent.trust_score)
-            }
-            for agent in agents
-        ],
-        "total": total,
-        "limit": limit,
-        "offset": offset
-    }
+        return {
+            "agents": [
+                {
+                    "agent_id": agent.agent_id,
+                    "display_name": agent.display_name,
+                    "status": agent.status,
+                    "trust_score": float(agent.trust_score)
+                }
+                for agent in agents
+            ],
+            "total": count_rows(db, query, count),
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor
+        }
+    
+    key = agent_list_key(cache.get_list_generation(), status, limit, offset, cursor, count)
+    return _cached_json_response(request, key, build)
 
 
 @app.post("/ains/agents/{agent_id}/capabilities")
@@ -603,67 +772,67 @@ def publish_capability(agent_id: str, cap: CapabilityPublish, db: Session = Depe
     db.add(new_cap)
     db.commit()
     db.refresh(new_cap)
+    cache.invalidate_response(capabilities_key(agent_id))
+    search_index.add_capability(new_cap)
+    latency_tracker.advertise(agent_id, new_cap.name, new_cap.latency_p99_ms, new_cap.availability_percent)
     return {"capability_id": new_cap.capability_id, "status": "published"}
 
 
 @app.get("/ains/agents/{agent_id}/capabilities")
-def list_agent_capabilities(agent_id: str, db: Session = Depends(get_db)):
-    caps = db.query(Capability).filter(Capability.agent_id == agent_id).all()
-    return [
-        {
-            "capability_id": cap.capability_id,
-            "name": cap.name,
-            "description": cap.description,
-            "pricing_model": cap.pricing_model,
-            "price": float(cap.price) if cap.price else None,
-            "availability_percent": float(cap.availability_percent),
-        }
-        for cap in caps
-    ]
+def list_agent_capabilities(agent_id: str, request: Request, db: Session = Depends(get_db)):
+    """List an agent's capabilities (read-through cached, supports If-None-Match)"""
+    def build():
+        caps = db.query(Capability).filter(Capability.agent_id == agent_id).all()
+        return [
+            {
+                "capability_id": cap.capability_id,
+                "name": cap.name,
+                "description": cap.description,
+                "pricing_model": cap.pricing_model,
+                "price": float(cap.price) if cap.price else None,
+                "availability_percent": float(cap.availability_percent),
+            }
+            for cap in caps
+        ]
+    
+    return _cached_json_response(request, capabilities_key(agent_id), build)
 
 
 @app.get("/ains/search")
 def search_agents(
+    q: Optional[str] = Query(None),
     capability: Optional[str] = Query(None),
     tags: Optional[str] = Query(None),  # comma-separated
     min_trust: Optional[float] = Query(0),
+    max_price: Optional[float] = Query(None),
+    max_latency_ms: Optional[int] = Query(None),
+    fuzzy: bool = Query(False),
     sort_by: str = Query("trust_score"),
     limit: int = Query(10, gt=0),
     offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Agent).join(Capability, Capability.agent_id == Agent.agent_id)
-
-    if capability:
-        query = query.filter(func.lower(Capability.name).like(f"%{capability.lower()}%"))
-    if tags:
-        tag_list = tags.split(",")
-        query = query.join(AgentTag).filter(AgentTag.tag.in_(tag_list))
-    if min_trust:
-        query = query.filter(Agent.trust_score >= min_trust)
-
-    total = query.distinct().count()
-
-    if sort_by == "price":
-        query = query.order_by(Capability.price.asc())
-    elif sort_by == "latency":
-        query = query.order_by(Capability.latency_p99_ms.asc())
-    else:
-        query = query.order_by(Agent.trust_score.desc())
-
-    agents = query.distinct().limit(limit).offset(offset).all()
-
-    results = []
-    for agent in agents:
-        caps = [cap.name for cap in agent.capabilities]
-        results.append({
-            "agent_id": agent.agent_id,
-            "display_name": agent.display_name,
-            "trust_score": float(agent.trust_score),
-            "capabilities": caps,
-        })
-
-        
+    """
+    Search agents by capability, free text and tags.
+    
+    Served from the in-memory search index (built on first use with
+    capabilities eager-loaded); q supports prefix and, with fuzzy=true,
+    trigram-similarity matching.
+    """
+    search_index.ensure_loaded(db)
+    
+    results, total = search_index.search(
+        q=q,
+        capability=capability,
+        tags=tags.split(",") if tags else None,
+        min_trust=min_trust,
+        max_price=max_price,
+        max_latency_ms=max_latency_ms,
+        fuzzy=fuzzy,
+        sort_by=sort_by,
+        limit=limit,
+        offset=offset
+    )
     
     return {
         "results": results,
@@ -675,51 +844,179 @@ def search_agents(
 
 @app.post("/ains/agents/{agent_id}/heartbeat")
 def send_heartbeat(agent_id: str, heartbeat: Heartbeat, db: Session = Depends(get_db)):
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
-    if not agent:
-        raise HTTPException(status_code=404, detail="Agent not found")
-
-    try:
-        # Map heartbeat status to agent model status
-        status_mapping = {
-            "ACTIVE": "AVAILABLE",
-            "DEGRADED": "BUSY",
-            "OFFLINE": "INACTIVE"
-        }
-        
-        # Update timestamp and status
-        agent.last_heartbeat = datetime.now(timezone.utc)
-        
-        # Only update status if the heartbeat status is valid
-        if heartbeat.status in status_mapping:
-            agent.status = status_mapping[heartbeat.status]
-        
-        cache.invalidate_agent(agent_id)
-        db.commit()
-        
-        # ========== METRICS: Track agent heartbeat ==========
-        from ains.observability.metrics import agents_active, update_agent_metrics
-        
-        active_agents = db.query(Agent).filter(Agent.status == "AVAILABLE").count()
-        agents_active.set(active_agents)
-        
-        update_agent_metrics(
-            agent_id=agent.agent_id,
-            display_name=agent.display_name,
-            trust_score=float(agent.trust_score)
-        )
-        
-        return {
-            "acknowledged": True,
-            "next_heartbeat_in": 300,
-            "agent_health_status": heartbeat.status,
-            "agent_status": agent.status,
-            "last_heartbeat": agent.last_heartbeat.isoformat()
-        }
+    """
+    Record an agent heartbeat.
     
+    Heartbeats land in the in-memory heartbeat buffer and are written in
+    batches; only a status transition hits the database right away and
+    invalidates the agent's cached responses.
+    """
+    try:
+        recorded = heartbeat_buffer.record(db, agent_id, heartbeat.status)
     except Exception as e:
         print(f"❌ Heartbeat error for agent {agent_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed: {str(e)}")
+    
+    if recorded is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    # Any heartbeat may re-declare the agent's concurrency slots
+    if heartbeat.max_concurrency is not None and load_index.set_max_concurrency(agent_id, heartbeat.max_concurrency):
+        db.query(Agent).filter(Agent.agent_id == agent_id).update(
+            {Agent.max_concurrency: heartbeat.max_concurrency},
+            synchronize_session=False
+        )
+        db.commit()
+        cache.invalidate_agent(agent_id)
+    
+    _, status, last_heartbeat = recorded
+    return {
+        "acknowledged": True,
+        "next_heartbeat_in": 300,
+        "agent_health_status": heartbeat.status,
+        "agent_status": status,
+        "last_heartbeat": last_heartbeat.isoformat()
+    }
+
+
+# ========== AGENT PUSH CHANNEL ==========
+
+PUSH_KEEPALIVE_SECONDS = float(os.getenv("AINS_PUSH_KEEPALIVE_SECONDS", "15"))
+
+
+def _in_session(work: Callable[[Session], Any]) -> Any:
+    """
+    Run work on a short-lived session. Push connections live for hours, so
+    they must not hold a pooled connection between messages.
+    """
+    db = SessionLocal()
+    try:
+        return work(db)
+    finally:
+        db.close()
+
+
+def _agent_exists(db: Session, agent_id: str) -> bool:
+    return db.query(Agent.agent_id).filter(Agent.agent_id == agent_id).first() is not None
+
+
+@app.websocket("/ains/agents/{agent_id}/push")
+async def agent_push_socket(
+    websocket: WebSocket,
+    agent_id: str,
+    last_seq: Optional[int] = None,
+    epoch: Optional[str] = None
+):
+    """
+    Persistent push channel for an agent.
+    
+    Server -> agent: hello, task.assigned, task.cancelled,
+    task.timeout_changed, heartbeat.ack, pong, error. Reconnect with the
+    last seq and epoch received to replay missed events; hello.resync is
+    true when some were lost and the agent should re-read its state.
+    
+    Agent -> server: {"type": "heartbeat", "data": <Heartbeat>} or
+    {"type": "ping"}, so a connected agent needs no HTTP polling at all.
+    
+    Each message uses its own short-lived database session; an idle socket
+    holds no pooled connection.
+    """
+    if not await run_in_threadpool(_in_session, lambda db: _agent_exists(db, agent_id)):
+        await websocket.close(code=4404, reason="Agent not found")
+        return
+    
+    await websocket.accept()
+    connection, replay, resync = push_hub.connect(agent_id, last_seq, epoch)
+    
+    async def sender():
+        await websocket.send_json(push_hub.hello(agent_id, resync).to_dict(push_hub.epoch))
+        for event in replay:
+            await websocket.send_json(event.to_dict(push_hub.epoch))
+        while True:
+            event = await connection.next_event()
+            if event is None:
+                await websocket.close(code=4408, reason="Send queue overflow; reconnect with last_seq")
+                return
+            await websocket.send_json(event.to_dict(push_hub.epoch))
+    
+    async def receiver():
+        try:
+            while True:
+                message = await websocket.receive_json()
+                kind = message.get("type") if isinstance(message, dict) else None
+                if kind == "heartbeat":
+                    try:
+                        heartbeat = Heartbeat(**(message.get("data") or {}))
+                        result = await run_in_threadpool(
+                            _in_session, lambda db: send_heartbeat(agent_id, heartbeat, db)
+                        )
+                        connection.offer(PushEvent(type="heartbeat.ack", data=result))
+                    except Exception as e:
+                        connection.offer(PushEvent(type="error", data={"detail": f"Invalid heartbeat: {e}"}))
+                elif kind == "ping":
+                    connection.offer(PushEvent(type="pong", data={}))
+                else:
+                    connection.offer(PushEvent(type="error", data={"detail": f"Unknown message type: {kind}"}))
+        except WebSocketDisconnect:
+            pass
+    
+    try:
+        # Whichever side finishes first (overflow close or client disconnect) ends both
+        async with anyio.create_task_group() as group:
+            async def run(side):
+                await side()
+                group.cancel_scope.cancel()
+            group.start_soon(run, sender)
+            group.start_soon(run, receiver)
+    finally:
+        push_hub.disconnect(connection)
+
+
+@app.get("/ains/agents/{agent_id}/events")
+async def agent_push_events(
+    agent_id: str,
+    request: Request,
+    last_seq: Optional[int] = Query(None, ge=0),
+    epoch: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events fallback for the agent push channel.
+    
+    Carries the same events as the WebSocket; the browser-standard
+    Last-Event-ID header (or last_seq/epoch) resumes the stream.
+    Heartbeats still go to the HTTP heartbeat endpoint.
+    """
+    if not await run_in_threadpool(_in_session, lambda db: _agent_exists(db, agent_id)):
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    if last_seq is None:
+        epoch, last_seq = parse_last_event_id(last_event_id)
+    connection, replay, resync = push_hub.connect(agent_id, last_seq, epoch)
+    
+    async def stream():
+        try:
+            yield push_hub.hello(agent_id, resync).to_sse(push_hub.epoch)
+            for event in replay:
+                yield event.to_sse(push_hub.epoch)
+            while not await request.is_disconnected():
+                try:
+                    event = await connection.next_event(timeout=PUSH_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    # Overflowed: end the stream, EventSource reconnects with Last-Event-ID
+                    return
+                yield event.to_sse(push_hub.epoch)
+        finally:
+            push_hub.disconnect(connection)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # ========== TASK ENDPOINTS (AITP - AI Task Protocol) ==========
@@ -814,12 +1111,55 @@ def create_task(
 
 
 
+def _idempotent(
+    db: Session,
+    response: FastAPIResponse,
+    endpoint: str,
+    client_id: str,
+    idempotency_key: Optional[str],
+    request_body: Dict[str, Any],
+    handler,
+    store_if=None
+):
+    """Run a submission once per Idempotency-Key, replaying the stored response to retries"""
+    if idempotency_key is None:
+        return handler()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    try:
+        body, replayed = idempotency_store.run(
+            db, endpoint, client_id, idempotency_key, request_body, handler, jsonable_encoder, store_if
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+
 @app.post("/aitp/tasks", response_model=TaskResponse)
-def submit_task(task_submission: TaskSubmission, db: Session = Depends(get_db)):
+def submit_task(
+    task_submission: TaskSubmission,
+    response: FastAPIResponse,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Submit a new AI task for execution.
     Tasks are validated, queued, and automatically routed to suitable agents.
+    
+    Retries carrying the same Idempotency-Key header get the original
+    response instead of a duplicate task.
     """
+    return _idempotent(
+        db, response, "tasks", task_submission.client_id, idempotency_key,
+        task_submission.model_dump(), lambda: _submit_task(task_submission, db)
+    )
+
+
+def _submit_task(task_submission: TaskSubmission, db: Session) -> TaskResponse:
     # Validate that the client agent exists
     client = db.query(Agent).filter(Agent.agent_id == task_submission.client_id).first()
     if not client:
@@ -829,10 +1169,26 @@ def submit_task(task_submission: TaskSubmission, db: Session = Depends(get_db)):
         )
     
     # Validate that the required capability exists
-    capability_exists = db.query(Capability).filter(
+    capability_filter = db.query(Capability).filter(
         func.lower(Capability.name) == task_submission.capability_required.lower(),
         Capability.deprecated == False
-    ).first()
+    )
+    
+    # Deterministic capabilities may be answered from the result cache
+    cache_key = None
+    if result_cache.ttl_for(task_submission.capability_required) is not None and \
+            (task_submission.metadata or {}).get("result_cache") is not False:
+        versions = capability_filter.with_entities(Capability.version).distinct().all()
+        capability_exists = bool(versions)
+        if capability_exists:
+            cache_key = result_cache.key(
+                task_submission.capability_required,
+                task_submission.client_id,
+                capability_version(version for (version,) in versions),
+                task_submission.input_data
+            )
+    else:
+        capability_exists = capability_filter.first()
     
     if not capability_exists:
         raise HTTPException(
@@ -840,6 +1196,11 @@ def submit_task(task_submission: TaskSubmission, db: Session = Depends(get_db)):
             detail=f"No agents provide capability '{task_submission.capability_required}'"
         )
     
+    if cache_key is not None:
+        cached = _answer_from_result_cache(db, cache_key)
+        if cached is not None:
+            return cached
+    
     # Generate unique task ID
     task_id = f"task_{uuid.uuid4().hex[:16]}"
     
@@ -858,6 +1219,7 @@ def submit_task(task_submission: TaskSubmission, db: Session = Depends(get_db)):
         task_type=task_submission.task_type,
         capability_required=task_submission.capability_required,
         input_data=task_submission.input_data,
+        task_metadata=task_submission.metadata,
         priority=task_submission.priority,
         expires_at=expires_at,
         status="PENDING",
@@ -881,32 +1243,66 @@ def submit_task(task_submission: TaskSubmission, db: Session = Depends(get_db)):
         priority=new_task.priority
     )
     
-    # Update queue depth
-    pending_count = db.query(Task).filter(Task.status == "PENDING").count()
+    # Update queue depth (from the in-memory fair queue, no COUNT query)
+    pending_count = sum(fair_queue.depth().values())
     update_queue_depth(priority=new_task.priority, count=pending_count)
     # ==================================================
 
     
     # Return the created task as TaskResponse
+    response = _task_response(new_task)
+    if cache_key is not None:
+        result_cache.track(cache_key, new_task.task_id, response.model_dump())
+    return response
+
+
+def _task_response(task: Task, cache_outcome: Optional[str] = None) -> TaskResponse:
     return TaskResponse(
-        task_id=new_task.task_id,
-        client_id=new_task.client_id,
-        task_type=new_task.task_type,
-        capability_required=new_task.capability_required,
-        status=new_task.status,
-        priority=new_task.priority,
-        assigned_agent_id=new_task.assigned_agent_id,
-        created_at=new_task.created_at.isoformat(),
-        updated_at=new_task.updated_at.isoformat(),
-        assigned_at=new_task.assigned_at.isoformat() if new_task.assigned_at else None,
-        started_at=new_task.started_at.isoformat() if new_task.started_at else None,
-        completed_at=new_task.completed_at.isoformat() if new_task.completed_at else None,
-        result_data=new_task.result_data,
-        error_message=new_task.error_message,
-        retry_count=new_task.retry_count
+        task_id=task.task_id,
+        client_id=task.client_id,
+        task_type=task.task_type,
+        capability_required=task.capability_required,
+        status=task.status,
+        priority=task.priority,
+        assigned_agent_id=task.assigned_agent_id,
+        created_at=task.created_at.isoformat(),
+        updated_at=task.updated_at.isoformat(),
+        assigned_at=task.assigned_at.isoformat() if task.assigned_at else None,
+        started_at=task.started_at.isoformat() if task.started_at else None,
+        completed_at=task.completed_at.isoformat() if task.completed_at else None,
+        result_data=task.result_data,
+        error_message=task.error_message,
+        retry_count=task.retry_count,
+        result_cache=cache_outcome
     )
 
 
+def _answer_from_result_cache(db: Session, key) -> Optional[TaskResponse]:
+    """A cached result or the identical running task for a submission, or None on a miss"""
+    from ains.observability.metrics import record_result_cache_lookup
+    
+    cached, running_id = result_cache.lookup(key)
+    response = None
+    if cached is not None:
+        response = TaskResponse(**{**cached, "result_cache": "hit"})
+    elif running_id is not None:
+        running = db.query(Task).filter(Task.task_id == running_id).first()
+        if running is not None and running.status in ("PENDING", "ASSIGNED", "ACTIVE"):
+            response = _task_response(running, "coalesced")
+        elif running is not None and running.status == "COMPLETED":
+            # Completed without passing through update_task_status
+            response = _task_response(running, "hit")
+            result_cache.complete(running_id, response.model_dump(exclude={"result_cache"}))
+        else:
+            result_cache.forget(running_id)
+    
+    outcome = response.result_cache if response is not None else "miss"
+    result_cache.record(outcome)
+    stats = result_cache.stats()
+    record_result_cache_lookup(outcome, stats["entries"], stats["bytes"])
+    return response
+
+
 
 @app.get("/aitp/tasks")
 def list_tasks(
@@ -916,26 +1312,34 @@ def list_tasks(
     assigned_agent_id: Optional[str] = Query(None),
     limit: int = Query(20, gt=0, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
     db: Session = Depends(get_db)
 ):
     """
     List tasks with optional filtering.
-    """
     
-        # to match the table created during database initialization ('scheduled_tasks').
+    Pass next_cursor back as cursor for keyset pagination on
+    (created_at, task_id); offset still works for older clients.
+    count selects an exact, estimated or no total.
+    """
     query = db.query(Task)
     
     if client_id:
-        query = query.filter(ScheduledTask.client_id == client_id)
+        query = query.filter(Task.client_id == client_id)
     if status:
-        query = query.filter(ScheduledTask.status == status)
+        query = query.filter(Task.status == status)
     if task_type:
-        query = query.filter(ScheduledTask.task_type == task_type)
+        query = query.filter(Task.task_type == task_type)
     if assigned_agent_id:
         query = query.filter(Task.assigned_agent_id == assigned_agent_id)
     
-    total = query.count()
-    tasks = query.order_by(Task.created_at.desc()).limit(limit).offset(offset).all()
+    try:
+        tasks, next_cursor = keyset_page(
+            query, [Task.created_at, Task.task_id], limit, cursor=cursor, offset=offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "tasks": [
@@ -951,9 +1355,10 @@ def list_tasks(
             }
             for task in tasks
         ],
-        "total": total,
+        "total": count_rows(db, query, count),
         "limit": limit,
-        "offset": offset
+        "offset": offset,
+        "next_cursor": next_cursor
     }
 @app.put("/aitp/tasks/{task_id}/status")
 def update_task_status(
@@ -970,12 +1375,19 @@ def update_task_status(
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    # A hedged task's result was already taken from the other agent (a won
+    # original is reassigned to the winner, so this comes before the agent check)
+    if task.status in ['COMPLETED', 'CANCELLED'] and hedge_manager.was_hedged(task.task_id):
+        raise HTTPException(status_code=409, detail="Result already accepted from another agent")
+    
     # Verify the agent is assigned to this task
     if task.assigned_agent_id != agent_id:
         raise HTTPException(status_code=403, detail="Agent not assigned to this task")
     
     now = datetime.now(timezone.utc)
     
+    hedge = None
+    
     # Update status based on the new status
     if status_update.status == 'ACTIVE':
         if task.status not in ['ASSIGNED']:
@@ -986,14 +1398,23 @@ def update_task_status(
     elif status_update.status == 'COMPLETED':
         if task.status not in ['ACTIVE']:
             raise HTTPException(status_code=400, detail="Can only complete ACTIVE tasks")
+        
+        # Hedged tasks keep the first result; the other one is rejected
+        hedge = hedge_manager.settle(db, task, status_update.result_data, now)
+        if hedge is not None and not hedge.won:
+            if task.task_id != hedge.original_id:
+                hedge_manager.reject(db, task, now)
+            raise HTTPException(status_code=409, detail="Result already accepted from another agent")
+        
         task.status = 'COMPLETED'
         task.completed_at = now
         task.result_data = status_update.result_data
+        task.lease_expires_at = None
         
         # Update agent trust score on successful completion
         agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
-        if agent and agent.trust_record:
-            agent.trust_record.successful_transactions += 1
+        if agent:
+            agent.total_tasks_completed = (agent.total_tasks_completed or 0) + 1
             # Recalculate trust score (simple increment for now)
             if agent.trust_score < 100:
                 agent.trust_score = min(100.0, float(agent.trust_score) + 0.5)
@@ -1008,17 +1429,19 @@ def update_task_status(
             task.assigned_agent_id = None
             task.assigned_at = None
             task.started_at = None
+            task.lease_expires_at = None
             task.retry_count += 1
             task.error_message = status_update.error_message
         else:
             task.status = 'FAILED'
             task.completed_at = now
             task.error_message = status_update.error_message
+            task.lease_expires_at = None
             
             # Update agent trust score on failure
             agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
-            if agent and agent.trust_record:
-                agent.trust_record.failed_transactions += 1
+            if agent:
+                agent.total_tasks_failed = (agent.total_tasks_failed or 0) + 1
                 # Decrease trust score
                 if agent.trust_score > 0:
                     agent.trust_score = max(0.0, float(agent.trust_score) - 1.0)
@@ -1029,13 +1452,32 @@ def update_task_status(
     db.commit()
     db.refresh(task)
     
+    if hedge is not None:
+        hedge_manager.finish(db, hedge)
+    
+    # Deterministic results are cached for identical submissions
+    if task.status == "COMPLETED":
+        result_cache.complete(hedge.original_id if hedge is not None else task.task_id, {
+            "status": "COMPLETED",
+            "result_data": task.result_data,
+            "assigned_agent_id": task.assigned_agent_id,
+            "completed_at": task.completed_at.isoformat() if task.completed_at else None,
+            "updated_at": task.updated_at.isoformat()
+        })
+    
+    # Terminal transitions adjust the agent's trust score
+    if task.status in ["COMPLETED", "FAILED"]:
+        cache.invalidate_agent(agent_id)
+        search_index.refresh_agent(db, agent_id)
+    
     # ========== METRICS: Track task completion/failure ==========
     from ains.observability.metrics import record_task_completed, record_task_failed, record_task_retry
     
     # Calculate duration if task is completed or failed
     if task.status in ["COMPLETED", "FAILED"]:
         if task.started_at:
-            duration = (now - task.started_at).total_seconds()
+            started_at = task.started_at if task.started_at.tzinfo else task.started_at.replace(tzinfo=timezone.utc)
+            duration = (now - started_at).total_seconds()
         else:
             duration = 0
         
@@ -1198,6 +1640,211 @@ def get_queue_stats(db: Session = Depends(get_db)):
     }
 
 
+@app.get("/aitp/queue/tenants")
+def get_tenant_queue_stats(db: Session = Depends(get_db)):
+    """
+    Get per-tenant fair-share queue statistics.
+    
+    Returns queued and in-flight counts, weight, concurrency cap and
+    dispatch wait times for every client_id the fair queue has seen.
+    """
+    fair_queue.ensure_loaded(db)
+    
+    return {
+        "tenants": fair_queue.tenant_stats(),
+        "bands": fair_queue.depth(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+@app.put("/aitp/queue/tenants/{client_id}")
+def set_tenant_queue_policy(
+    client_id: str,
+    weight: Optional[float] = Query(None, gt=0),
+    max_concurrency: Optional[int] = Query(None, ge=0)
+):
+    """
+    Set a tenant's fair-share weight and/or concurrent task cap (0 = unlimited).
+    
+    Applies to this process until restart; set AINS_CLIENT_WEIGHTS and
+    AINS_CLIENT_MAX_CONCURRENCY for persistent defaults.
+    """
+    fair_queue.set_client_policy(client_id, weight=weight, max_concurrency=max_concurrency)
+    
+    return {
+        "client_id": client_id,
+        "weight": fair_queue.client_weight(client_id),
+        "max_concurrency": fair_queue.client_cap(client_id)
+    }
+
+
+@app.post("/aitp/queue/age")
+def age_queued_tasks(
+    max_age_hours: int = Query(24, ge=1, le=720),
+    dry_run: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Permanently boost old low/medium priority tasks (+2, max 9).
+
+    Dispatch already ages tasks at dequeue time; this rewrites the stored
+    priority so listings, stats and restarts see the boost too.
+    dry_run only counts the tasks past the threshold.
+    """
+    boosted = adjust_priority_by_age(db, max_age_hours=max_age_hours, persist=not dry_run)
+
+    return {
+        "boosted": boosted,
+        "max_age_hours": max_age_hours,
+        "dry_run": dry_run
+    }
+
+
+@app.get("/aitp/result-cache")
+def get_result_cache_stats():
+    """Result cache policies, size and hit rate"""
+    return result_cache.stats()
+
+
+@app.put("/aitp/result-cache/capabilities/{capability}")
+def set_result_cache_policy(capability: str, ttl_seconds: float = Query(..., gt=0)):
+    """
+    Answer identical submissions of a deterministic capability from results
+    completed within ttl_seconds.
+    
+    Applies to this process until restart; set AINS_RESULT_CACHE_CAPABILITIES
+    for persistent policies.
+    """
+    result_cache.set_policy(capability, ttl_seconds)
+    return {"capability": capability.lower(), "ttl_seconds": result_cache.ttl_for(capability)}
+
+
+@app.delete("/aitp/result-cache/capabilities/{capability}")
+def delete_result_cache_policy(capability: str):
+    """Stop caching a capability's results (cached entries expire with their TTL)"""
+    result_cache.set_policy(capability, None)
+    return {"capability": capability.lower(), "ttl_seconds": None}
+
+
+@app.get("/aitp/hedging")
+def get_hedging_stats():
+    """Hedging policies, budget tokens and outcome counters"""
+    return hedge_manager.stats()
+
+
+@app.put("/aitp/hedging/capabilities/{capability}")
+def set_hedging_policy(capability: str, quantile: float = Query(0.95, gt=0, lt=1)):
+    """
+    Hedge tasks of a capability that run longer than its observed latency quantile.
+    
+    Applies to this process until restart; set AINS_HEDGE_CAPABILITIES for
+    persistent policies.
+    """
+    hedge_manager.set_policy(capability, quantile)
+    return {"capability": capability.lower(), "quantile": hedge_manager.quantile_for(capability)}
+
+
+@app.delete("/aitp/hedging/capabilities/{capability}")
+def delete_hedging_policy(capability: str):
+    """Stop hedging a capability (copies already dispatched still run)"""
+    hedge_manager.set_policy(capability, None)
+    return {"capability": capability.lower(), "quantile": None}
+
+
+@app.post("/aitp/agents/{agent_id}/lease")
+async def lease_tasks(
+    agent_id: str,
+    capability: Optional[List[str]] = Query(None, description="Capabilities to serve (default: all published)"),
+    max_tasks: int = Query(1, ge=1, le=1024),
+    wait_seconds: float = Query(20.0, ge=0, le=60),
+    visibility_timeout: Optional[int] = Query(None, ge=1, le=3600),
+    db: Session = Depends(get_db)
+):
+    """
+    Long-poll for work.
+    
+    Holds the request until a matching task is queued or wait_seconds
+    passes, then leases up to max_tasks tasks (at most the agent's free
+    max_concurrency slots) for visibility_timeout seconds. Extend the lease
+    while working and ack it with the outcome; an expired lease puts the
+    task back in the queue.
+    """
+    def lookup():
+        # Blocking DB work stays off the event loop: a pool checkout waiting
+        # here would stall the threads that return connections
+        if db.query(Agent.agent_id).filter(Agent.agent_id == agent_id).first() is None:
+            return None
+        capabilities = [c.lower() for c in capability] if capability else lease_manager.agent_capabilities(db, agent_id)
+        db.commit()
+        return capabilities
+    
+    capabilities = await run_in_threadpool(lookup)
+    if capabilities is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if not capabilities:
+        raise HTTPException(status_code=400, detail="Agent has no capabilities to lease tasks for")
+    
+    tasks = await lease_manager.wait_for_tasks(
+        db, agent_id, capabilities,
+        max_tasks=max_tasks,
+        wait_seconds=wait_seconds,
+        visibility_timeout=visibility_timeout
+    )
+    
+    return {
+        "agent_id": agent_id,
+        "tasks": [lease_payload(task) for task in tasks],
+        "count": len(tasks)
+    }
+
+
+@app.post("/aitp/agents/{agent_id}/leases/{task_id}/extend")
+def extend_task_lease(
+    agent_id: str,
+    task_id: str,
+    seconds: Optional[int] = Query(None, ge=1, le=3600),
+    db: Session = Depends(get_db)
+):
+    """Extend a held lease to now + seconds (default: the configured lease length)."""
+    expires_at = lease_manager.extend(db, agent_id, task_id, seconds)
+    if expires_at is None:
+        raise HTTPException(status_code=409, detail="Lease not held or already expired")
+    
+    return {
+        "task_id": task_id,
+        "agent_id": agent_id,
+        "lease_expires_at": expires_at.isoformat()
+    }
+
+
+@app.post("/aitp/agents/{agent_id}/leases/{task_id}/ack")
+def ack_task_lease(
+    agent_id: str,
+    task_id: str,
+    status_update: TaskUpdateStatus,
+    db: Session = Depends(get_db)
+):
+    """
+    Settle a lease with the task outcome (COMPLETED or FAILED).
+    
+    Applies the same trust, retry and metrics handling as the task status
+    endpoint; a failed task with retries left goes back to the queue.
+    """
+    if status_update.status not in ('COMPLETED', 'FAILED'):
+        raise HTTPException(status_code=400, detail="Ack status must be COMPLETED or FAILED")
+    if not lease_manager.holds_lease(db, agent_id, task_id):
+        raise HTTPException(status_code=409, detail="Lease not held or already expired")
+    
+    task = db.query(Task).filter(Task.task_id == task_id).first()
+    if status_update.status == 'COMPLETED' and task.status == 'ASSIGNED':
+        # Leased tasks may be completed without a separate ACTIVE report
+        task.status = 'ACTIVE'
+        task.started_at = task.assigned_at or datetime.now(timezone.utc)
+        db.commit()
+    
+    return update_task_status(task_id, agent_id, status_update, db)
+
+
 @app.put("/aitp/tasks/{task_id}/priority")
 def adjust_task_priority(
     task_id: str,
@@ -1309,6 +1956,12 @@ def set_timeout_endpoint(
             detail=f"Cannot set timeout on {task.status} task"
         )
     
+    if task.assigned_agent_id:
+        push_hub.publish(task.assigned_agent_id, "task.timeout_changed", {
+            "task_id": task_id,
+            "timeout_seconds": timeout_seconds
+        })
+    
     return {
         "task_id": task_id,
         "timeout_seconds": timeout_seconds,
@@ -1340,6 +1993,7 @@ class BatchTaskSpec(BaseModel):
     max_retries: int = Field(default=3, ge=0, le=10)
     retry_policy: str = Field(default="exponential")
     timeout_seconds: int = Field(default=300)
+    metadata: Optional[Dict[str, Any]] = None
 
 
 class BatchTaskSubmission(BaseModel):
@@ -1351,14 +2005,26 @@ class BatchTaskSubmission(BaseModel):
 @app.post("/aitp/tasks/batch")
 def submit_batch_tasks_endpoint(
     batch: BatchTaskSubmission,
-    db: Session = Depends(get_db)
+    response: FastAPIResponse,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Submit multiple tasks in a single batch.
     
     Maximum 1000 tasks per batch.
-    All tasks are committed atomically.
+    All tasks are committed atomically, so a retry with the same
+    Idempotency-Key header replays the batch result instead of creating
+    the tasks again.
     """
+    return _idempotent(
+        db, response, "tasks/batch", batch.client_id, idempotency_key,
+        batch.model_dump(), lambda: _submit_batch(batch, db),
+        store_if=lambda result: result.get("success") is not False
+    )
+
+
+def _submit_batch(batch: BatchTaskSubmission, db: Session):
     if len(batch.tasks) > 1000:
         raise HTTPException(
             status_code=400,
@@ -1549,8 +2215,9 @@ def get_stats_endpoint(db: Session = Depends(get_db)):
     Get system-wide performance statistics.
     
     Returns metrics on tasks, agents, throughput, and performance.
+    Served from a short-TTL snapshot shared by concurrent callers.
     """
-    stats = get_system_stats(db)
+    stats = stats_snapshot.get(db)
     return stats
 
 
@@ -1561,6 +2228,36 @@ def get_database_stats_endpoint(db: Session = Depends(get_db)):
     return stats
 
 
+@app.get("/ains/stats/agents")
+def get_agent_metric_detail_endpoint(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    sort: str = Query("tasks_completed", pattern="^(tasks_completed|tasks_failed|trust_score)$")
+):
+    """
+    Per-agent metric detail, paginated.
+
+    /metrics only labels the top AINS_METRICS_MAX_AGENTS agents and folds
+    the rest into agent_id="other"; this lists every agent this instance
+    has recorded, with "labelled" marking those exposed individually.
+    """
+    from ains.observability.metrics import agent_detail
+    return agent_detail(limit=limit, offset=offset, sort=sort)
+
+
+@app.get("/ains/stats/slow-queries")
+def get_slow_queries_endpoint(
+    limit: int = Query(50, ge=1, le=500),
+    threshold_ms: Optional[float] = Query(None, ge=0)
+):
+    """
+    Slowest recent SQL statements (parameters redacted) and the statement
+    fingerprints with the most total execution time on this instance.
+    """
+    threshold_seconds = threshold_ms / 1000 if threshold_ms is not None else None
+    return get_slow_queries(threshold_seconds=threshold_seconds, limit=limit)
+
+
 @app.post("/ains/maintenance/cleanup")
 def cleanup_old_data_endpoint(
     days: int = Query(30, ge=7, le=365),
@@ -1936,12 +2633,21 @@ def get_api_key_usage(
 
 @app.get("/ains/audit-logs")
 def get_audit_logs(
+    response: FastAPIResponse,
     client_id: Optional[str] = None,
     event_type: Optional[str] = None,
     limit: int = 100,
+    cursor: Optional[str] = Query(None),
+    count: str = Query("none", pattern=COUNT_MODE_PATTERN),
     db: Session = Depends(get_db)
 ):
-    """Get security audit logs"""
+    """
+    Get security audit logs.
+    
+    Keyset-paginated on (created_at, id): the next page's cursor is returned
+    in the X-Next-Cursor header and, unless count=none, the total in
+    X-Total-Count, so the body stays a plain list.
+    """
     query = db.query(AuditLog)
     
     if client_id:
@@ -1950,7 +2656,16 @@ def get_audit_logs(
     if event_type:
         query = query.filter(AuditLog.event_type == event_type)
     
-    logs = query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+    try:
+        logs, next_cursor = keyset_page(query, [AuditLog.created_at, AuditLog.id], limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    total = count_rows(db, query, count)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
     
     return [
         {
@@ -1963,7 +2678,7 @@ def get_audit_logs(
             "resource_id": log.resource_id,
             "success": log.success,
             "error_message": log.error_message,
-            "extra_metadata": log.extra_metadata,  # Changed from metadata
+            "extra_metadata": log.extra_task_metadata,  # Changed from metadata
             "created_at": log.created_at.isoformat()
         }
         for log in logs
@@ -2188,6 +2903,10 @@ def list_routing_strategies():
             {
                 "name": "fastest_response",
                 "description": "Route to agent with lowest average completion time"
+            },
+            {
+                "name": "slo_aware",
+                "description": "Route to agent with lowest predicted p99 latency within the task deadline"
             }
         ],
         "default": "round_robin"
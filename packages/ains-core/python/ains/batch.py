@@ -39,6 +39,7 @@ def submit_batch_tasks(
                 task_type=task_spec.get('task_type', 'default'),
                 capability_required=task_spec['capability_required'],
                 input_data=task_spec['input_data'],
+                task_metadata=task_spec.get('metadata'),
                 priority=task_spec.get('priority', 5),
                 status="PENDING",
                 created_at=datetime.now(timezone.utc),
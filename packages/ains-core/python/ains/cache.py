@@ -1,7 +1,17 @@
-"""AINS Redis Caching Layer"""
+"""AINS Redis Caching Layer
 
+Without Redis the cache is kept in process. Entries there expire after the
+same TTL Redis would apply and both in-memory maps are LRU-bounded by
+AINS_CACHE_MAX_ENTRIES, so cached listings cannot grow without limit.
+"""
+
+import hashlib
 import json
-from typing import Optional, Dict
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Dict, List, Tuple
 
 try:
     import redis
@@ -10,23 +20,82 @@ except ImportError:
     REDIS_AVAILABLE = False
 
 
+class _MemoryStore:
+    """In-process stand-in for Redis keys: per-entry expiry plus LRU eviction"""
+    
+    def __init__(self, ttl: float, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: str) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+    
+    def __setitem__(self, key: str, value: Any):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        return default if entry is None else entry[1]
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
 class AgentCache:
     """Redis cache for agent data (falls back to in-memory if Redis unavailable)"""
     
-    def __init__(self, host: str = "localhost", port: int = 6379):
-        if REDIS_AVAILABLE:
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        ttl: float = 300,
+        max_entries: int = 10000,
+        use_redis: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            host: Redis host
+            port: Redis port
+            ttl: Seconds an entry is cached
+            max_entries: Entries kept per in-memory map when Redis is unavailable
+            use_redis: Try Redis before falling back to memory
+            clock: Monotonic clock for in-memory expiry
+        """
+        self.use_redis = False
+        if REDIS_AVAILABLE and use_redis:
             try:
                 self.redis = redis.Redis(host=host, port=port, decode_responses=True)
                 self.redis.ping()  # Test connection
                 self.use_redis = True
             except:
                 self.use_redis = False
-                self.memory_cache = {}
-        else:
-            self.use_redis = False
-            self.memory_cache = {}
         
-        self.ttl = 300  # 5 minutes
+        self.ttl = ttl
+        self.list_generation = 0
+        self.memory_cache = _MemoryStore(ttl, max_entries, clock)
+        self.memory_lists = _MemoryStore(ttl, max_entries, clock)
     
     def get_agent(self, agent_id: str) -> Optional[Dict]:
         """Get agent from cache"""
@@ -46,12 +115,75 @@ class AgentCache:
             self.memory_cache[f"agent:{agent_id}"] = agent_data
     
     def invalidate_agent(self, agent_id: str):
-        """Invalidate agent cache"""
+        """Invalidate agent cache, its cached responses and agent listings"""
+        self.invalidate_agents([agent_id])
+    
+    def invalidate_agents(self, agent_ids: List[str], batch_size: int = 500):
+        """Invalidate many agents with batched deletes and a single listings bump"""
+        if not agent_ids:
+            return
+        keys = [
+            key
+            for agent_id in agent_ids
+            for key in (
+                f"agent:{agent_id}",
+                f"response:{agent_key(agent_id)}",
+                f"response:{capabilities_key(agent_id)}",
+            )
+        ]
         if self.use_redis:
-            key = f"agent:{agent_id}"
-            self.redis.delete(key)
+            for start in range(0, len(keys), batch_size):
+                self.redis.delete(*keys[start:start + batch_size])
         else:
-            self.memory_cache.pop(f"agent:{agent_id}", None)
+            for key in keys:
+                self.memory_cache.pop(key, None)
+        self.invalidate_agent_listings()
+    
+    def get_response(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Get a pre-serialized response body and its ETag"""
+        if self.use_redis:
+            data = self.redis.get(f"response:{key}")
+            if not data:
+                return None
+            etag, body = data.split("\n", 1)
+            return body.encode(), etag
+        elif key.startswith("agents:"):
+            return self.memory_lists.get(key)
+        else:
+            return self.memory_cache.get(f"response:{key}")
+    
+    def set_response(self, key: str, body: bytes) -> str:
+        """Cache a pre-serialized response body and return its ETag"""
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.use_redis:
+            self.redis.setex(f"response:{key}", self.ttl, f"{etag}\n{body.decode()}")
+        elif key.startswith("agents:"):
+            self.memory_lists[key] = (body, etag)
+        else:
+            self.memory_cache[f"response:{key}"] = (body, etag)
+        return etag
+    
+    def invalidate_response(self, key: str):
+        """Invalidate a cached response"""
+        if self.use_redis:
+            self.redis.delete(f"response:{key}")
+        else:
+            self.memory_cache.pop(f"response:{key}", None)
+    
+    def get_list_generation(self) -> int:
+        """Get the current generation of cached agent listings"""
+        if self.use_redis:
+            return int(self.redis.get("agents:generation") or 0)
+        return self.list_generation
+    
+    def invalidate_agent_listings(self):
+        """Invalidate every cached agent listing by moving to a new generation"""
+        if self.use_redis:
+            # Old generations simply expire through the TTL
+            self.redis.incr("agents:generation")
+        else:
+            self.list_generation += 1
+            self.memory_lists.clear()
     
     def get_capability(self, capability_id: str) -> Optional[Dict]:
         """Get capability from cache"""
@@ -79,5 +211,41 @@ class AgentCache:
             self.memory_cache.pop(f"capability:{capability_id}", None)
 
 
+def agent_key(agent_id: str) -> str:
+    """Response cache key for GET /ains/agents/{agent_id}"""
+    return f"agent:{agent_id}"
+
+
+def capabilities_key(agent_id: str) -> str:
+    """Response cache key for GET /ains/agents/{agent_id}/capabilities"""
+    return f"agent_capabilities:{agent_id}"
+
+
+def agent_list_key(
+    generation: int,
+    status: Optional[str],
+    limit: int,
+    offset: int,
+    cursor: Optional[str] = None,
+    count: str = "exact"
+) -> str:
+    """Response cache key for a page of GET /ains/agents"""
+    return f"agents:{generation}:{status or '*'}:{limit}:{offset}:{cursor or ''}:{count}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 # Global cache instance
-cache = AgentCache()
+cache = AgentCache(
+    ttl=float(os.getenv("AINS_CACHE_TTL_SECONDS", "300")),
+    max_entries=int(os.getenv("AINS_CACHE_MAX_ENTRIES", "10000"))
+)
@@ -28,11 +28,22 @@ DATABASE_URL = os.getenv(
     "sqlite:///./ains.db"  # SQLite for local development/testing
 )
 
+# Connection pool sized above the request threadpool (40 threads): a finished
+# sync request keeps its connection until the get_db teardown gets a thread, so
+# a smaller pool deadlocks once every thread is waiting for a connection
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("AINS_DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("AINS_DB_MAX_OVERFLOW", "30")),
+    "pool_timeout": float(os.getenv("AINS_DB_POOL_TIMEOUT", "30"))
+}
+
 # Create engine
 if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    # In-memory SQLite uses a single-connection pool without these options
+    pool_options = {} if ":memory:" in DATABASE_URL else POOL_OPTIONS
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **pool_options)
 else:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -74,11 +85,21 @@ class Agent(Base):
     # Sprint 7: Routing field
     last_assigned_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Concurrent tasks the agent accepts (NULL: AINS_DEFAULT_AGENT_CONCURRENCY)
+    max_concurrency = Column(Integer, nullable=True)
+    
     # Relationships - FIXED
-    assigned_tasks = relationship("Task", back_populates="assigned_agent")
+    # Resolved through AITPTask, not the name "Task": the unified ScheduledTask
+    # below takes over that name, and the registry only holds classes weakly
+    assigned_tasks = relationship(lambda: AITPTask, back_populates="assigned_agent")
     capabilities = relationship("Capability", back_populates="agent")
     trust_records = relationship("TrustRecord", back_populates="agent")
 
+    __table_args__ = (
+        # Stale-agent sweep
+        Index('idx_agents_status_heartbeat', 'status', 'last_heartbeat'),
+    )
+
 class AgentTag(Base):
     """Agent tags for categorization"""
     __tablename__ = "agent_tags"
@@ -174,6 +195,10 @@ class Task(Base):
     # Relationships
     assigned_agent = relationship("Agent", back_populates="assigned_tasks")
 
+
+# Strong reference to the AITP tasks model once Task is rebound to ScheduledTask
+AITPTask = Task
+
 class Webhook(Base):
     __tablename__ = "webhooks"
     
@@ -290,9 +315,28 @@ class AuditLog(Base):
     
     __table_args__ = (
         Index('idx_audit_logs_created', 'created_at'),
+        Index('idx_audit_logs_created_id', 'created_at', 'id'),
         Index('idx_audit_logs_client_event', 'client_id', 'event_type'),
     )
 
+class IdempotencyRecord(Base):
+    """Stored responses of task submissions made with an Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+
+    # SHA-256 of endpoint, client and the client's key
+    record_key = Column(String(64), primary_key=True)
+    endpoint = Column(String(64), nullable=False)
+    client_id = Column(String(64), nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index('idx_idempotency_keys_expires', 'expires_at'),
+    )
+
 class TaskChain(Base):
     """Task chains for sequential workflow execution"""
     __tablename__ = "task_chains"
@@ -344,6 +388,7 @@ class ScheduledTask(Base):
     # Assignment fields
     assigned_agent_id = Column(String, nullable=True, index=True)
     assigned_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # Visibility timeout for pulled tasks
     
     # Execution timing
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -391,6 +436,15 @@ class ScheduledTask(Base):
     # Metadata
     task_metadata = Column(JSON, nullable=True)
 
+    __table_args__ = (
+        # Keyset pagination order for task listings
+        Index('idx_scheduled_tasks_created_task', 'created_at', 'task_id'),
+        # Age-based priority boosts and pending-task scans
+        Index('idx_scheduled_tasks_status_created', 'status', 'created_at'),
+        # Expired-lease reaper
+        Index('idx_scheduled_tasks_status_lease', 'status', 'lease_expires_at'),
+    )
+
     def __repr__(self):
         return f"<Task(task_id='{self.task_id}', status='{self.status}', type='{self.task_type}')>"
 
@@ -465,6 +519,10 @@ class ScheduledTask(Base):
     failed_runs = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
     updated_at = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
+    
+    __table_args__ = (
+        Index("idx_scheduled_tasks_created_schedule", "created_at", "schedule_id"),
+    )
 
 
 class ScheduleExecution(Base):
@@ -543,6 +601,7 @@ class AuditLog(Base):
     
     __table_args__ = (
         Index("idx_audit_logs_created", "created_at"),
+        Index("idx_audit_logs_created_id", "created_at", "id"),
         Index("idx_audit_logs_client_event", "client_id", "event_type"),
     )
 
@@ -0,0 +1,552 @@
+"""AINS Fair Queue Engine
+
+In-memory scheduling structure behind PriorityQueue and task routing.
+Pending tasks are kept per capability in priority bands, and inside each
+band per tenant (client_id):
+
+- bands are served by deficit round robin (DRR) so every band gets a
+  guaranteed share of dequeues;
+- tenants inside a band are served by weighted DRR, so one client's
+  100k-task batch cannot starve other clients, and tenants at their
+  concurrency cap are skipped;
+- tasks within a tenant's queue are ordered by an aged priority so old
+  tasks overtake newer ones, and a task whose aged priority reaches a
+  higher band is promoted into it, so low-priority work is never starved
+  by a steady stream of high-priority work.
+
+The structure is rebuilt from the database on start and kept in sync from
+committed task changes (see task_events). Dequeue is O(log n) and issues no
+queries.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .db import Task
+from . import task_events
+from .observability import metrics
+
+
+# Bands in service order: (name, lowest priority in band)
+BANDS: List[Tuple[str, int]] = [("high", 8), ("medium", 5), ("low", 1)]
+DEFAULT_WEIGHTS = {"high": 6, "medium": 3, "low": 1}
+
+# Statuses that count against a tenant's concurrency cap
+INFLIGHT_STATUSES = ("ASSIGNED", "ACTIVE")
+
+
+def band_for_priority(priority: int) -> str:
+    """Map a 1-10 priority onto its band"""
+    for name, floor in BANDS:
+        if priority >= floor:
+            return name
+    return BANDS[-1][0]
+
+
+def parse_weights(value: Optional[str]) -> Dict[str, int]:
+    """Parse "high,medium,low" weights such as "6,3,1" """
+    if not value:
+        return dict(DEFAULT_WEIGHTS)
+    parts = [int(part) for part in value.split(",")]
+    if len(parts) != len(BANDS) or any(part < 1 for part in parts):
+        raise ValueError(f"Expected {len(BANDS)} positive weights, got {value!r}")
+    return {name: weight for (name, _), weight in zip(BANDS, parts)}
+
+
+def parse_client_settings(value: Optional[str], cast: Callable = float) -> Dict[str, Any]:
+    """Parse "client_a=5,client_b=2" into a dict"""
+    settings = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            client_id, setting = item.split("=", 1)
+            settings[client_id.strip()] = cast(setting)
+    return settings
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def effective_priority(
+    priority: Optional[int],
+    created_at: Optional[datetime],
+    aging_seconds: float,
+    now: Optional[float] = None
+) -> float:
+    """
+    Priority a waiting task is served at: its stated priority plus one level
+    per aging_seconds spent in the queue. The stored priority is never changed.
+
+    Args:
+        priority: Base priority the client submitted (defaults to 5)
+        created_at: When the task was queued
+        aging_seconds: Waiting time worth one priority level
+        now: Unix timestamp to evaluate at (defaults to the current time)
+
+    Returns:
+        Effective (fractional) priority
+    """
+    base = priority if priority is not None else 5
+    if aging_seconds <= 0:
+        return float(base)
+    now = time.time() if now is None else now
+    return base + max(0.0, now - _timestamp(created_at)) / aging_seconds
+
+
+class _Band:
+    """One priority band: per-tenant heaps plus tenant-level DRR state"""
+
+    def __init__(self):
+        self.clients: Dict[str, list] = {}
+        # Entries of the band across tenants, oldest aged key first (for
+        # promotion; not kept for the top band)
+        self.aged: list = []
+        self.sizes: Dict[str, int] = {}
+        self.size = 0
+        self.active: deque = deque()  # tenants with backlog, in service order
+        self.listed: set = set()  # tenants currently in active
+        self.deficits: Dict[str, float] = {}
+        self.fresh_visit = True
+
+
+class _CapabilityQueue:
+    """Per-capability bands plus band-level DRR state"""
+
+    def __init__(self, name: str = ""):
+        self.name = name  # capability as submitted (queues are keyed lowercase)
+        self.bands: Dict[str, _Band] = {name: _Band() for name, _ in BANDS}
+        self.deficits: Dict[str, float] = {name: 0.0 for name, _ in BANDS}
+        self.cursor = 0
+        self.fresh_visit = True
+
+
+class FairQueueEngine:
+    """
+    Hierarchical deficit round robin: priority bands, then tenants.
+
+    A task's effective priority at time t is
+    priority + (t - created_at) / aging_seconds. Ordering by that is the
+    same as ordering by key = created_at - priority * aging_seconds, which
+    does not depend on t, so aging is applied at dequeue time without
+    re-sorting. The same key decides promotion: a task belongs in a band
+    with floor f once key <= t - f * aging_seconds, so each band's oldest
+    key is checked on dequeue and tasks past a higher floor move up.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, int]] = None,
+        aging_seconds: float = 300.0,
+        client_weights: Optional[Dict[str, float]] = None,
+        client_caps: Optional[Dict[str, int]] = None,
+        default_client_weight: float = 1.0,
+        default_client_cap: int = 0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            weights: DRR quantum per band (dequeues per round when backlogged)
+            aging_seconds: Waiting time worth one priority level
+            client_weights: DRR quantum per tenant inside a band
+            client_caps: Max concurrent (ASSIGNED/ACTIVE) tasks per tenant
+            default_client_weight: Quantum for tenants without an explicit weight
+            default_client_cap: Cap for tenants without an explicit cap (0 = unlimited)
+            clock: Source of the current Unix time (the simulator passes a virtual clock)
+        """
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.aging_seconds = aging_seconds
+        self.client_weights = dict(client_weights or {})
+        self.client_caps = dict(client_caps or {})
+        self.default_client_weight = default_client_weight
+        self.default_client_cap = default_client_cap
+        self.clock = clock
+
+        self.lock = threading.RLock()
+        self.queues: Dict[str, _CapabilityQueue] = {}
+        # task_id -> (capability, band, client_id, entry sequence) for lazy deletion
+        self.entries: Dict[str, Tuple[str, str, str, int]] = {}
+        self.sequence = itertools.count()
+        # In-flight tasks per tenant (task_id -> client_id) and their counts
+        self.inflight: Dict[str, str] = {}
+        self.inflight_counts: Dict[str, int] = {}
+        self.client_depth: Dict[str, int] = {}
+        self.wait_stats: Dict[str, Dict[str, float]] = {}
+        self.loaded = False
+
+    # ==================== CONFIGURATION ====================
+
+    def set_client_policy(self, client_id: str, weight: Optional[float] = None, max_concurrency: Optional[int] = None):
+        """Set a tenant's DRR weight and/or concurrency cap (0 = unlimited)"""
+        with self.lock:
+            if weight is not None:
+                if weight <= 0:
+                    raise ValueError("weight must be positive")
+                self.client_weights[client_id] = weight
+            if max_concurrency is not None:
+                if max_concurrency < 0:
+                    raise ValueError("max_concurrency must be >= 0")
+                self.client_caps[client_id] = max_concurrency
+
+    def client_weight(self, client_id: str) -> float:
+        return self.client_weights.get(client_id, self.default_client_weight)
+
+    def client_cap(self, client_id: str) -> int:
+        return self.client_caps.get(client_id, self.default_client_cap)
+
+    def _capped(self, client_id: str) -> bool:
+        cap = self.client_cap(client_id)
+        return bool(cap) and self.inflight_counts.get(client_id, 0) >= cap
+
+    # ==================== LOADING ====================
+
+    def ensure_loaded(self, db: Session):
+        """Rebuild from the database on first use"""
+        if not self.loaded:
+            self.load_from_db(db)
+
+    def load_from_db(self, db: Session):
+        """Rebuild the queues from PENDING tasks and in-flight counts from ASSIGNED/ACTIVE ones"""
+        pending = db.query(
+            Task.task_id, Task.capability_required, Task.priority, Task.created_at, Task.client_id
+        ).filter(
+            Task.status == 'PENDING',
+            Task.is_blocked.isnot(True)
+        ).all()
+        inflight = db.query(Task.task_id, Task.client_id).filter(
+            Task.status.in_(INFLIGHT_STATUSES)
+        ).all()
+
+        with self.lock:
+            self.queues = {}
+            self.entries = {}
+            self.inflight = {}
+            self.inflight_counts = {}
+            self.client_depth = {}
+            for task_id, capability, priority, created_at, client_id in pending:
+                self._push(task_id, capability, priority, created_at, client_id)
+            for task_id, client_id in inflight:
+                self._reserve(task_id, client_id or "")
+            self.loaded = True
+
+        print(f"📥 Fair queue loaded {len(pending)} pending and {len(inflight)} in-flight tasks")
+
+    def effective_priority(self, priority: Optional[int], created_at: Optional[datetime], now: Optional[float] = None) -> float:
+        """Aged priority of a task under this engine's aging rate"""
+        return effective_priority(priority, created_at, self.aging_seconds, now)
+
+    # ==================== MUTATION ====================
+
+    def enqueue(
+        self,
+        task_id: str,
+        capability: str,
+        priority: int = 5,
+        created_at: Optional[datetime] = None,
+        client_id: Optional[str] = None
+    ):
+        """Add (or re-prioritize, or put back) a pending task"""
+        with self.lock:
+            self._push(task_id, capability, priority, created_at, client_id)
+
+    def remove(self, task_id: str):
+        """Drop a queued task; its heap entry is skipped lazily on dequeue"""
+        with self.lock:
+            entry = self.entries.pop(task_id, None)
+            if entry:
+                capability, band_name, client_id, _ = entry
+                band = self.queues[capability].bands[band_name]
+                self._shrink(band, client_id)
+
+    def release(self, task_id: str):
+        """Stop counting a task against its tenant's concurrency cap"""
+        with self.lock:
+            client_id = self.inflight.pop(task_id, None)
+            if client_id is not None:
+                self.inflight_counts[client_id] -= 1
+                self._publish_depth(client_id)
+
+    def _reserve(self, task_id: str, client_id: str):
+        if task_id not in self.inflight:
+            self.inflight[task_id] = client_id
+            self.inflight_counts[client_id] = self.inflight_counts.get(client_id, 0) + 1
+
+    def _push(
+        self,
+        task_id: str,
+        capability: str,
+        priority: Optional[int],
+        created_at: Optional[datetime],
+        client_id: Optional[str]
+    ):
+        if task_id in self.entries:
+            self.remove(task_id)
+        self.release(task_id)
+
+        priority = priority if priority is not None else 5
+        name = capability or ""
+        capability = name.lower()
+        client_id = client_id or ""
+        created_ts = _timestamp(created_at)
+        key = created_ts - priority * self.aging_seconds
+        queue = self.queues.get(capability)
+        if queue is None:
+            queue = self.queues[capability] = _CapabilityQueue(name)
+        self._place(queue, capability, band_for_priority(priority), client_id, task_id, key, created_ts)
+        self.client_depth[client_id] = self.client_depth.get(client_id, 0) + 1
+        self._publish_depth(client_id)
+
+    def _place(
+        self,
+        queue: _CapabilityQueue,
+        capability: str,
+        band_name: str,
+        client_id: str,
+        task_id: str,
+        key: float,
+        created_ts: float
+    ):
+        """Add an entry to a band (lock held)"""
+        band = queue.bands[band_name]
+        heap = band.clients.get(client_id)
+        if heap is None:
+            heap = band.clients[client_id] = []
+        if client_id not in band.listed:
+            band.active.append(client_id)
+            band.listed.add(client_id)
+            band.deficits[client_id] = 0.0
+
+        sequence = next(self.sequence)
+        heapq.heappush(heap, (key, sequence, task_id, created_ts))
+        if band_name != BANDS[0][0]:
+            heapq.heappush(band.aged, (key, sequence, task_id, created_ts))
+        band.sizes[client_id] = band.sizes.get(client_id, 0) + 1
+        band.size += 1
+        self.entries[task_id] = (capability, band_name, client_id, sequence)
+
+    def _shrink(self, band: _Band, client_id: str, publish: bool = True):
+        band.sizes[client_id] -= 1
+        band.size -= 1
+        if band.sizes[client_id] == 0:
+            # Drop the heap so stale entries don't linger; the tenant leaves
+            # band.active lazily on its next visit
+            del band.sizes[client_id]
+            band.clients.pop(client_id, None)
+        if band.size == 0:
+            band.aged = []
+        if publish:
+            self.client_depth[client_id] -= 1
+            self._publish_depth(client_id)
+
+    def _promote(self, queue: _CapabilityQueue, capability: str):
+        """Move tasks whose aged priority has reached a higher band into it (lock held)"""
+        if self.aging_seconds <= 0:
+            return
+        now = self.clock()
+        for index in range(1, len(BANDS)):
+            band_name = BANDS[index][0]
+            band = queue.bands[band_name]
+            # Aged into at least the next band up
+            threshold = now - BANDS[index - 1][1] * self.aging_seconds
+            while band.aged and band.aged[0][0] <= threshold:
+                key, sequence, task_id, created_ts = heapq.heappop(band.aged)
+                entry = self.entries.get(task_id)
+                if not entry or entry[1] != band_name or entry[3] != sequence:
+                    continue  # dequeued, removed or already moved
+                client_id = entry[2]
+                self._shrink(band, client_id, publish=False)
+                # (now - key) / aging_seconds is the task's effective_priority
+                aged = int((now - key) / self.aging_seconds)
+                target = band_for_priority(max(aged, BANDS[index - 1][1]))
+                # The old tenant heap entry is skipped lazily (sequence no longer matches)
+                self._place(queue, capability, target, client_id, task_id, key, created_ts)
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: queue unblocked PENDING tasks, track in-flight ones"""
+        if change.new_status == 'PENDING' and not change.is_blocked:
+            self.enqueue(change.task_id, change.capability, change.priority, change.created_at, change.client_id)
+            return
+
+        with self.lock:
+            self.remove(change.task_id)
+            if change.new_status in INFLIGHT_STATUSES:
+                self._reserve(change.task_id, change.client_id or "")
+                self._publish_depth(change.client_id or "")
+            else:
+                self.release(change.task_id)
+
+    # ==================== DEQUEUE ====================
+
+    def dequeue(self, capability: str) -> Optional[str]:
+        """
+        Pop the next task ID for a capability.
+
+        The task counts against its tenant's concurrency cap until it leaves
+        ASSIGNED/ACTIVE (or is put back with enqueue, or released).
+
+        Returns:
+            Task ID, or None if nothing dispatchable is pending for the capability
+        """
+        with self.lock:
+            capability = (capability or "").lower()
+            queue = self.queues.get(capability)
+            if queue is None:
+                return None
+            self._promote(queue, capability)
+
+            # Bands whose backlogged tenants are all at their cap
+            blocked = set()
+            while True:
+                band_name = self._next_band(queue, blocked)
+                if band_name is None:
+                    return None
+
+                band = queue.bands[band_name]
+                client_id = self._next_client(band)
+                if client_id is None:
+                    queue.deficits[band_name] += 1  # refund the slot
+                    blocked.add(band_name)
+                    continue
+
+                return self._pop(band, band_name, client_id)
+
+    def _next_band(self, queue: _CapabilityQueue, blocked: set) -> Optional[str]:
+        """Band-level DRR: each visit to a backlogged band adds its weight to its deficit"""
+        if not any(queue.bands[name].size for name, _ in BANDS if name not in blocked):
+            return None
+
+        while True:
+            band_name = BANDS[queue.cursor][0]
+            if queue.bands[band_name].size == 0:
+                queue.deficits[band_name] = 0.0
+            elif band_name not in blocked:
+                if queue.fresh_visit:
+                    queue.deficits[band_name] += self.weights[band_name]
+                    queue.fresh_visit = False
+                if queue.deficits[band_name] >= 1:
+                    queue.deficits[band_name] -= 1
+                    return band_name
+            queue.cursor = (queue.cursor + 1) % len(BANDS)
+            queue.fresh_visit = True
+
+    def _next_client(self, band: _Band) -> Optional[str]:
+        """Tenant-level DRR inside a band, skipping tenants at their concurrency cap"""
+        capped_in_a_row = 0
+        while band.active and capped_in_a_row < len(band.active):
+            client_id = band.active[0]
+            if not band.sizes.get(client_id):
+                band.active.popleft()
+                band.listed.discard(client_id)
+                band.deficits.pop(client_id, None)
+                band.fresh_visit = True
+                continue
+
+            if self._capped(client_id):
+                band.active.rotate(-1)
+                band.fresh_visit = True
+                capped_in_a_row += 1
+                continue
+
+            capped_in_a_row = 0
+            if band.fresh_visit:
+                band.deficits[client_id] += self.client_weight(client_id)
+                band.fresh_visit = False
+            if band.deficits[client_id] >= 1:
+                band.deficits[client_id] -= 1
+                return client_id
+            band.active.rotate(-1)
+            band.fresh_visit = True
+        return None
+
+    def _pop(self, band: _Band, band_name: str, client_id: str) -> Optional[str]:
+        heap = band.clients[client_id]
+        while heap:
+            _, sequence, task_id, created_ts = heapq.heappop(heap)
+            entry = self.entries.get(task_id)
+            if entry and entry[1] == band_name and entry[2] == client_id and entry[3] == sequence:
+                del self.entries[task_id]
+                self._reserve(task_id, client_id)
+                self._shrink(band, client_id)
+                self._record_wait(client_id, self.clock() - created_ts)
+                return task_id
+        return None
+
+    # ==================== STATS ====================
+
+    def _record_wait(self, client_id: str, wait_seconds: float):
+        wait_seconds = max(0.0, wait_seconds)
+        stats = self.wait_stats.get(client_id)
+        if stats is None:
+            stats = self.wait_stats[client_id] = {"dequeued": 0, "total": 0.0, "max": 0.0}
+        stats["dequeued"] += 1
+        stats["total"] += wait_seconds
+        stats["max"] = max(stats["max"], wait_seconds)
+        metrics.record_tenant_dequeue(client_id, wait_seconds)
+
+    def _publish_depth(self, client_id: str):
+        metrics.update_tenant_queue(
+            client_id,
+            depth=self.client_depth.get(client_id, 0),
+            inflight=self.inflight_counts.get(client_id, 0)
+        )
+
+    def depth(self, capability: Optional[str] = None) -> Dict[str, int]:
+        """Pending tasks per band, for one capability or overall"""
+        with self.lock:
+            totals = {name: 0 for name, _ in BANDS}
+            queues = [self.queues.get(capability.lower())] if capability else self.queues.values()
+            for queue in queues:
+                if queue is None:
+                    continue
+                for name in totals:
+                    totals[name] += queue.bands[name].size
+            return totals
+
+    def capabilities(self) -> List[str]:
+        """Capabilities with pending tasks, as submitted (dequeue accepts any case)"""
+        with self.lock:
+            return [
+                queue.name for queue in self.queues.values()
+                if any(band.size for band in queue.bands.values())
+            ]
+
+    def tenant_stats(self) -> List[Dict[str, Any]]:
+        """Per-tenant queue depth, in-flight count, policy and dequeue wait times"""
+        with self.lock:
+            clients = set(self.client_depth) | set(self.inflight_counts) | set(self.wait_stats)
+            rows = []
+            for client_id in sorted(clients):
+                waits = self.wait_stats.get(client_id, {"dequeued": 0, "total": 0.0, "max": 0.0})
+                rows.append({
+                    "client_id": client_id,
+                    "queued": self.client_depth.get(client_id, 0),
+                    "inflight": self.inflight_counts.get(client_id, 0),
+                    "weight": self.client_weight(client_id),
+                    "max_concurrency": self.client_cap(client_id),
+                    "dequeued": waits["dequeued"],
+                    "avg_wait_seconds": waits["total"] / waits["dequeued"] if waits["dequeued"] else None,
+                    "max_wait_seconds": waits["max"]
+                })
+            return rows
+
+
+# Global fair queue instance
+fair_queue = FairQueueEngine(
+    weights=parse_weights(os.getenv("AINS_QUEUE_WEIGHTS")),
+    aging_seconds=float(os.getenv("AINS_QUEUE_AGING_SECONDS", "300")),
+    client_weights=parse_client_settings(os.getenv("AINS_CLIENT_WEIGHTS"), float),
+    client_caps=parse_client_settings(os.getenv("AINS_CLIENT_MAX_CONCURRENCY"), int),
+    default_client_cap=int(os.getenv("AINS_DEFAULT_CLIENT_MAX_CONCURRENCY", "0"))
+)
+task_events.subscribe(fair_queue.on_task_change)
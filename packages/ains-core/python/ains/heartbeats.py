@@ -0,0 +1,340 @@
+"""AINS Heartbeat Buffer
+
+Heartbeats are recorded in an in-memory last-seen/status map instead of
+being written one row at a time. A flusher writes the changed rows in one
+batched UPDATE, and the active-agent gauge is kept incrementally. Only
+status transitions touch the database immediately and invalidate cached
+agent responses.
+
+The map is per process. The flush writes only last_heartbeat, never the
+buffered status: another worker (or the sweep, or task assignment) may
+have changed the status since this map last saw it, and a stale copy must
+not overwrite that. A timestamp written late by a slower worker is at
+worst a few seconds old and is corrected by the next heartbeat.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from .db import Agent
+from .cache import cache
+from .observability.metrics import (
+    agents_active, update_agent_metrics, agent_health_sweep_seconds, agents_marked_inactive_total
+)
+
+# Heartbeat status -> agent status
+STATUS_MAPPING = {
+    "ACTIVE": "AVAILABLE",
+    "DEGRADED": "BUSY",
+    "OFFLINE": "INACTIVE"
+}
+
+# Statuses the health sweep may demote to INACTIVE
+LIVE_STATUSES = ("AVAILABLE", "BUSY", "ACTIVE")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class _Seen:
+    status: str
+    last_heartbeat: Optional[datetime]
+    dirty: bool = False
+
+
+class HeartbeatBuffer:
+    """Last-seen/status map with batched persistence"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.agents: Dict[str, _Seen] = {}
+        self.available = 0
+        self.loaded = False
+
+    # ==================== LOADING ====================
+
+    def ensure_loaded(self, db: Session):
+        """Load every agent's status on first use"""
+        if not self.loaded:
+            self.load_from_db(db)
+
+    def load_from_db(self, db: Session):
+        """Rebuild the map (and the active-agent gauge) from the agents table"""
+        rows = db.query(Agent.agent_id, Agent.status, Agent.last_heartbeat).all()
+        with self.lock:
+            self.agents = {
+                agent_id: _Seen(status=status, last_heartbeat=last_heartbeat)
+                for agent_id, status, last_heartbeat in rows
+            }
+            self.available = sum(1 for seen in self.agents.values() if seen.status == "AVAILABLE")
+            self.loaded = True
+        agents_active.set(self.available)
+        print(f"💓 Heartbeat buffer loaded {len(rows)} agents ({self.available} available)")
+
+    def _lookup(self, db: Session, agent_id: str) -> Optional[_Seen]:
+        """Map entry for an agent, reading it once if it registered after the load"""
+        with self.lock:
+            seen = self.agents.get(agent_id)
+        if seen is not None:
+            return seen
+
+        row = db.query(Agent.status, Agent.last_heartbeat).filter(Agent.agent_id == agent_id).first()
+        if row is None:
+            return None
+        self.track(agent_id, row.status, row.last_heartbeat)
+        with self.lock:
+            return self.agents[agent_id]
+
+    # ==================== RECORDING ====================
+
+    def track(self, agent_id: str, status: str, last_heartbeat: Optional[datetime] = None):
+        """
+        Record an agent status changed outside of heartbeats
+        (registration, health sweeps) so the map stays authoritative.
+        Ignored until the map is loaded, since the load picks it up.
+        """
+        with self.lock:
+            if not self.loaded:
+                return
+            seen = self.agents.get(agent_id)
+            if seen is None:
+                seen = self.agents[agent_id] = _Seen(status=status, last_heartbeat=last_heartbeat)
+                previous = None
+            else:
+                previous = seen.status
+                seen.status = status
+                if last_heartbeat is not None:
+                    seen.last_heartbeat = last_heartbeat
+            self._count(previous, status)
+
+    def forget(self, agent_id: str):
+        """Drop an agent that no longer exists"""
+        with self.lock:
+            seen = self.agents.pop(agent_id, None)
+            if seen is not None:
+                self._count(seen.status, None)
+
+    def _count(self, previous: Optional[str], current: Optional[str]):
+        """Adjust the available count for a status change (lock held)"""
+        delta = (current == "AVAILABLE") - (previous == "AVAILABLE")
+        if delta:
+            self.available += delta
+            agents_active.set(self.available)
+
+    def record(self, db: Session, agent_id: str, heartbeat_status: str) -> Optional[Tuple[str, str, datetime]]:
+        """
+        Record a heartbeat.
+
+        A status transition is written straight away (routing reads agent
+        status from the database) and invalidates the agent's cached
+        responses; otherwise only the map changes and the timestamp is
+        persisted by the next flush.
+
+        Args:
+            db: Database session (used only for unknown agents and transitions)
+            agent_id: Agent sending the heartbeat
+            heartbeat_status: ACTIVE, DEGRADED or OFFLINE (others keep the current status)
+
+        Returns:
+            (previous_status, status, last_heartbeat), or None for an unknown agent
+        """
+        self.ensure_loaded(db)
+        seen = self._lookup(db, agent_id)
+        if seen is None:
+            return None
+
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            previous = seen.status
+            status = STATUS_MAPPING.get(heartbeat_status, previous)
+            seen.status = status
+            seen.last_heartbeat = now
+            seen.dirty = previous == status
+            self._count(previous, status)
+
+        if status != previous:
+            db.query(Agent).filter(Agent.agent_id == agent_id).update(
+                {Agent.status: status, Agent.last_heartbeat: now},
+                synchronize_session=False
+            )
+            db.commit()
+            cache.invalidate_agent(agent_id)
+
+            agent = db.query(Agent.display_name, Agent.trust_score).filter(Agent.agent_id == agent_id).first()
+            if agent:
+                update_agent_metrics(agent_id, agent.display_name, float(agent.trust_score or 0))
+
+        return previous, status, now
+
+    # ==================== FLUSHING ====================
+
+    def flush(self, db: Session) -> int:
+        """
+        Write buffered heartbeat timestamps in one batched UPDATE.
+
+        Only last_heartbeat is written; status changes go to the database
+        when they happen (record(), the sweep), so the buffered status is
+        never flushed over a newer one.
+
+        Returns:
+            Number of agents written
+        """
+        with self.lock:
+            batch = [
+                {"b_agent_id": agent_id, "b_last_heartbeat": seen.last_heartbeat}
+                for agent_id, seen in self.agents.items()
+                if seen.dirty
+            ]
+            for row in batch:
+                self.agents[row["b_agent_id"]].dirty = False
+
+        if not batch:
+            return 0
+
+        table = Agent.__table__
+        statement = update(table).where(
+            table.c.agent_id == bindparam("b_agent_id")
+        ).values(last_heartbeat=bindparam("b_last_heartbeat"))
+        try:
+            db.execute(statement, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Keep the rows for the next attempt
+            with self.lock:
+                for row in batch:
+                    seen = self.agents.get(row["b_agent_id"])
+                    if seen is not None:
+                        seen.dirty = True
+            raise
+        return len(batch)
+
+    # ==================== HEALTH SWEEP ====================
+
+    def sweep(self, db: Session, max_silence: timedelta, batch_size: int = 1000) -> List[str]:
+        """
+        Mark agents whose last heartbeat is older than max_silence INACTIVE.
+
+        Each batch is one UPDATE ... RETURNING agent_id over the
+        (status, last_heartbeat) index, followed by one batched cache
+        invalidation, so a mass outage is handled in a few statements
+        instead of an ORM round trip per agent.
+
+        Args:
+            db: Database session
+            max_silence: Heartbeat age after which an agent counts as gone
+            batch_size: Agents demoted per statement
+
+        Returns:
+            IDs of the agents marked INACTIVE
+        """
+        started = time.monotonic()
+        # Buffered heartbeats would otherwise make live agents look stale
+        self.flush(db)
+
+        threshold = datetime.now(timezone.utc) - max_silence
+        table = Agent.__table__
+        stale = (table.c.status.in_(LIVE_STATUSES), table.c.last_heartbeat < threshold)
+        swept: List[str] = []
+
+        while True:
+            candidates = select(table.c.id).where(*stale).limit(batch_size).scalar_subquery()
+            statement = update(table).where(table.c.id.in_(candidates), *stale).values(status="INACTIVE")
+
+            if db.get_bind().dialect.update_returning:
+                agent_ids = list(db.execute(statement.returning(table.c.agent_id)).scalars())
+            else:
+                agent_ids = list(db.execute(select(table.c.agent_id).where(*stale).limit(batch_size)).scalars())
+                if agent_ids:
+                    db.execute(update(table).where(table.c.agent_id.in_(agent_ids), *stale).values(status="INACTIVE"))
+            db.commit()
+
+            if not agent_ids:
+                break
+            demoted, revived = self._mark_swept(agent_ids, threshold)
+            swept.extend(demoted)
+            self._revive(db, revived)
+            if len(agent_ids) < batch_size:
+                break
+
+        cache.invalidate_agents(swept)
+        agents_marked_inactive_total.inc(len(swept))
+        agent_health_sweep_seconds.observe(time.monotonic() - started)
+        if swept:
+            print(f"💤 Marked {len(swept)} agents INACTIVE (no heartbeat since {threshold.isoformat()})")
+        return swept
+
+    def _mark_swept(self, agent_ids: List[str], threshold: datetime) -> Tuple[List[str], List[dict]]:
+        """
+        Apply a sweep to the map.
+
+        Returns:
+            (agents now INACTIVE, rows to restore for agents that
+            heartbeated after the flush and keep their status)
+        """
+        swept = []
+        revived = []
+        with self.lock:
+            for agent_id in agent_ids:
+                seen = self.agents.get(agent_id)
+                if seen is None:
+                    swept.append(agent_id)
+                    continue
+                if seen.last_heartbeat is not None and _as_utc(seen.last_heartbeat) >= threshold:
+                    revived.append({
+                        "b_agent_id": agent_id, "b_status": seen.status, "b_last_heartbeat": seen.last_heartbeat
+                    })
+                    seen.dirty = False
+                    continue
+                self._count(seen.status, "INACTIVE")
+                seen.status = "INACTIVE"
+                swept.append(agent_id)
+        return swept, revived
+
+    def _revive(self, db: Session, revived: List[dict]):
+        """
+        Undo the sweep for agents that heartbeated in the meantime. The
+        status is written only where it is still the INACTIVE the sweep set,
+        so a change made since (by anyone) is left alone.
+        """
+        if not revived:
+            return
+        table = Agent.__table__
+        db.execute(
+            update(table).where(
+                table.c.agent_id == bindparam("b_agent_id"), table.c.status == "INACTIVE"
+            ).values(status=bindparam("b_status"), last_heartbeat=bindparam("b_last_heartbeat")),
+            revived
+        )
+        db.commit()
+
+    def last_seen(self, agent_id: str) -> Optional[datetime]:
+        """Most recent heartbeat (possibly not yet flushed)"""
+        with self.lock:
+            seen = self.agents.get(agent_id)
+            return seen.last_heartbeat if seen else None
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "agents": len(self.agents),
+                "available": self.available,
+                "pending_flush": sum(1 for seen in self.agents.values() if seen.dirty)
+            }
+
+
+# Global heartbeat buffer instance
+heartbeat_buffer = HeartbeatBuffer()
+
+HEARTBEAT_FLUSH_SECONDS = float(os.getenv("AINS_HEARTBEAT_FLUSH_SECONDS", "5"))
+HEALTH_SWEEP_SECONDS = float(os.getenv("AINS_HEALTH_SWEEP_SECONDS", "60"))
+AGENT_STALE_SECONDS = float(os.getenv("AINS_AGENT_STALE_SECONDS", "600"))
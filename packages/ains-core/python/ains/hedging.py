@@ -0,0 +1,464 @@
+"""AINS Hedged Execution
+
+Tail-latency protection for capabilities that opt in: if a task has not
+completed by the capability's observed pXX completion latency, a copy is
+dispatched to a second agent and whichever result arrives first is kept.
+
+- The copy is a task row "<task_id>-hedge" (task_metadata {"hedge_of": ...})
+  assigned straight to the second agent, so leasing, push and the load
+  index treat it like any other task.
+- Results are deduplicated on the original row: a completion must move it
+  out of PENDING/ASSIGNED/ACTIVE with a conditional UPDATE, so exactly one
+  of the two results is accepted. The loser gets a 409; a losing hedge row
+  is cancelled, a losing primary is sent task.cancelled.
+- Extra load is budgeted with a token bucket: every dispatch of a hedgeable
+  task earns AINS_HEDGE_BUDGET_PERCENT / 100 tokens (up to AINS_HEDGE_BURST)
+  and every hedge spends one.
+
+Capabilities opt in with AINS_HEDGE_CAPABILITIES="image-analysis=0.95,..."
+(the quantile to hedge at, "*" for all) or PUT /aitp/hedging/capabilities.
+A single task opts in or out with metadata={"hedge": 0.95} or
+{"hedge": false} at submission, which overrides its capability's policy.
+Until a capability has AINS_SLO_MIN_SAMPLES completions, the primary
+agent's advertised latency_p99_ms is used as the threshold.
+
+When the copy wins, the original row is completed under the copy's agent
+and start time, so latency sketches credit the agent that produced the
+result; the copy row itself is not sampled (see latency_sketch).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .db import Agent, Task
+from .fair_queue import INFLIGHT_STATUSES, parse_client_settings
+from .latency_sketch import HEDGE_SUFFIX, LatencyTracker, latency_tracker
+from .load_index import load_index
+from .push import push_hub
+from . import task_events
+
+# A result can still be accepted while the original is in one of these
+OPEN_STATUSES = ("PENDING",) + INFLIGHT_STATUSES
+
+
+def hedge_task_id(task_id: str) -> str:
+    return f"{task_id}{HEDGE_SUFFIX}"
+
+
+def hedge_original(task_id: str) -> Optional[str]:
+    """Original task id of a hedge copy, or None for other tasks"""
+    if task_id.endswith(HEDGE_SUFFIX):
+        return task_id[:-len(HEDGE_SUFFIX)]
+    return None
+
+
+def claim_result(
+    db: Session,
+    task_id: str,
+    result_data: Optional[Dict[str, Any]],
+    now: Optional[datetime] = None
+) -> bool:
+    """
+    Mark a task COMPLETED with a result unless another result got there first.
+
+    The UPDATE is conditional on the task still being open, so of two
+    concurrent claims exactly one succeeds. Not committed.
+
+    Returns:
+        bool: True if this result was accepted
+    """
+    now = now or datetime.now(timezone.utc)
+    table = Task.__table__
+    result = db.execute(
+        update(table)
+        .where(table.c.task_id == task_id, table.c.status.in_(OPEN_STATUSES))
+        .values(status="COMPLETED", completed_at=now, result_data=result_data,
+                lease_expires_at=None, updated_at=now)
+    )
+    return result.rowcount == 1
+
+
+@dataclass
+class HedgeOutcome:
+    """Result of settling a completion on a hedged task"""
+    original_id: str
+    won: bool
+    # Agent still working on the original after a hedge won
+    loser_agent_id: Optional[str] = None
+    loser_status: Optional[str] = None
+
+
+@dataclass
+class _Watch:
+    capability: str
+    agent_id: Optional[str]
+    since: float
+    quantile: float
+
+
+def task_quantile(metadata: Optional[Dict[str, Any]]) -> Union[float, bool, None]:
+    """
+    Per-task hedging request from task metadata.
+
+    Returns:
+        The quantile for {"hedge": q} with 0 < q < 1, False for
+        {"hedge": false}, None when the task defers to its capability
+    """
+    value = (metadata or {}).get("hedge") if isinstance(metadata, dict) else None
+    if value is False:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and 0 < value < 1:
+        return float(value)
+    return None
+
+
+class HedgeManager:
+    """Watches in-flight tasks of hedged capabilities and dispatches copies"""
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, float]] = None,
+        budget_percent: float = 5.0,
+        burst: float = 10.0,
+        check_seconds: float = 1.0,
+        tracker: Optional[LatencyTracker] = None,
+        clock: Callable[[], float] = time.monotonic,
+        history_size: int = 10000
+    ):
+        """
+        Args:
+            policies: Capability (lowercase, or "*") -> quantile to hedge at
+            budget_percent: Hedges allowed per 100 dispatches of hedgeable tasks
+            burst: Most hedge tokens that can be saved up
+            check_seconds: Interval of the hedge worker
+            tracker: Latency sketches (defaults to the global tracker)
+            clock: Monotonic clock in seconds
+            history_size: Hedged task ids remembered for rejecting late results
+        """
+        self.policies = {k.lower(): v for k, v in (policies or {}).items()}
+        self.budget_percent = budget_percent
+        self.burst = burst
+        self.check_seconds = check_seconds
+        self.tracker = tracker or latency_tracker
+        self.clock = clock
+        self.history_size = history_size
+        self.lock = threading.Lock()
+
+        self.tokens = 0.0
+        self.watching: Dict[str, _Watch] = {}
+        self.hedges: Dict[str, str] = {}       # original task_id -> hedge task_id
+        self.losers: List[str] = []            # hedge rows to cancel
+        self.settled: "OrderedDict[str, None]" = OrderedDict()
+        self.counters = {
+            "dispatched": 0, "hedge_wins": 0, "primary_wins": 0,
+            "rejected": 0, "cancelled": 0, "skipped_budget": 0
+        }
+
+    # ==================== POLICY ====================
+
+    def set_policy(self, capability: str, quantile: Optional[float]):
+        """Hedge a capability at a latency quantile (None stops hedging it)"""
+        with self.lock:
+            if quantile is None:
+                self.policies.pop(capability.lower(), None)
+            else:
+                self.policies[capability.lower()] = quantile
+
+    def quantile_for(
+        self,
+        capability: Optional[str],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Optional[float]:
+        """Quantile a task is hedged at: its own request first, then its capability's policy"""
+        requested = task_quantile(metadata)
+        if requested is False:
+            return None
+        if requested is not None:
+            return requested
+        if not capability:
+            return None
+        return self.policies.get(capability.lower(), self.policies.get("*"))
+
+    def threshold_ms(
+        self,
+        capability: str,
+        agent_id: Optional[str],
+        quantile: Optional[float] = None
+    ) -> Optional[float]:
+        """How long a task may run before it is hedged, or None if unknown"""
+        if quantile is None:
+            quantile = self.quantile_for(capability)
+        if quantile is None:
+            return None
+        threshold = self.tracker.capability_quantile(capability, quantile)
+        if threshold is None and agent_id:
+            threshold = self.tracker.predict_p99_ms(agent_id, capability)
+        return threshold
+
+    # ==================== TASK EVENTS ====================
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: track hedgeable in-flight tasks and their copies"""
+        original_id = hedge_original(change.task_id)
+        with self.lock:
+            if original_id is not None:
+                if change.new_status not in INFLIGHT_STATUSES and self.hedges.get(original_id) == change.task_id:
+                    del self.hedges[original_id]
+                return
+
+            quantile = self.quantile_for(change.capability, change.metadata)
+            if change.new_status in INFLIGHT_STATUSES and quantile is not None:
+                watch = self.watching.get(change.task_id)
+                if watch is None or watch.agent_id != change.assigned_agent_id:
+                    self.watching[change.task_id] = _Watch(
+                        change.capability, change.assigned_agent_id, self.clock(), quantile
+                    )
+                    self.tokens = min(self.burst, self.tokens + self.budget_percent / 100.0)
+            elif change.new_status not in INFLIGHT_STATUSES:
+                self.watching.pop(change.task_id, None)
+                # A finished original makes its outstanding copy redundant
+                if change.new_status != "PENDING" and change.task_id in self.hedges:
+                    self.losers.append(self.hedges.pop(change.task_id))
+
+    def due(self) -> List[Tuple[str, _Watch]]:
+        """In-flight tasks past their hedging threshold and not hedged yet"""
+        now = self.clock()
+        with self.lock:
+            watching = [(task_id, watch) for task_id, watch in self.watching.items() if task_id not in self.hedges]
+        due = []
+        for task_id, watch in watching:
+            threshold = self.threshold_ms(watch.capability, watch.agent_id, watch.quantile)
+            if threshold is not None and (now - watch.since) * 1000 >= threshold:
+                due.append((task_id, watch))
+        return due
+
+    # ==================== DISPATCH ====================
+
+    def _second_agent(self, db: Session, capability: str, exclude: Optional[str]) -> Optional[str]:
+        table = Agent.__table__
+        load_index.ensure_loaded(db)
+        capable = [
+            agent_id for agent_id, tags in db.execute(select(table.c.agent_id, table.c.tags)).all()
+            if agent_id != exclude and capability in (tags or []) and load_index.free_slots(agent_id) > 0
+        ]
+        return self.tracker.choose(capability, capable)
+
+    def dispatch_due(self, db: Session) -> int:
+        """
+        Dispatch copies of overdue tasks while the budget allows.
+
+        Returns:
+            Number of hedges dispatched
+        """
+        dispatched = 0
+        for task_id, watch in self.due():
+            with self.lock:
+                if self.tokens < 1:
+                    self.counters["skipped_budget"] += 1
+                    break
+            original = db.query(Task).filter(
+                Task.task_id == task_id, Task.status.in_(INFLIGHT_STATUSES)
+            ).first()
+            if original is None:
+                with self.lock:
+                    self.watching.pop(task_id, None)
+                continue
+            agent_id = self._second_agent(db, watch.capability, exclude=original.assigned_agent_id)
+            if agent_id is None:
+                continue
+
+            now = datetime.now(timezone.utc)
+            hedge_id = hedge_task_id(task_id)
+            db.add(Task(
+                task_id=hedge_id,
+                client_id=original.client_id,
+                task_type=original.task_type,
+                capability_required=original.capability_required,
+                input_data=original.input_data,
+                task_metadata={"hedge_of": task_id},
+                priority=original.priority,
+                status="ASSIGNED",
+                assigned_agent_id=agent_id,
+                assigned_at=now,
+                created_at=now,
+                updated_at=now,
+                expires_at=original.expires_at,
+                timeout_seconds=original.timeout_seconds,
+                max_retries=0,
+                retry_count=0,
+                routing_strategy=original.routing_strategy
+            ))
+            with self.lock:
+                self.hedges[task_id] = hedge_id
+                self._remember(task_id)
+                self._remember(hedge_id)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Hedged before a restart; the existing copy stays outstanding
+                db.rollback()
+                continue
+            with self.lock:
+                self.tokens -= 1
+                self.counters["dispatched"] += 1
+            dispatched += 1
+            print(f"🪞 Hedged task {task_id} on agent {agent_id}")
+        return dispatched
+
+    def _remember(self, task_id: str):
+        self.settled[task_id] = None
+        self.settled.move_to_end(task_id)
+        while len(self.settled) > self.history_size:
+            self.settled.popitem(last=False)
+
+    def was_hedged(self, task_id: str) -> bool:
+        """True for hedge copies and for originals that had a copy dispatched"""
+        return hedge_original(task_id) is not None or task_id in self.settled
+
+    # ==================== RESULTS ====================
+
+    def settle(
+        self,
+        db: Session,
+        task: Task,
+        result_data: Optional[Dict[str, Any]],
+        now: Optional[datetime] = None
+    ) -> Optional[HedgeOutcome]:
+        """
+        Claim the original task for a completion of a hedged task or its copy.
+
+        On a win by the copy the original row is completed with its result
+        in the same transaction and attributed to the copy's agent and start
+        time; the caller completes its own task row and commits. On a loss
+        nothing is written.
+
+        Args:
+            db: Database session
+            task: ACTIVE task being completed
+            result_data: Result reported by the agent
+            now: Completion time
+
+        Returns:
+            HedgeOutcome, or None if the task is not hedged
+        """
+        original_id = hedge_original(task.task_id)
+        if original_id is None:
+            if not self.was_hedged(task.task_id):
+                return None
+            original = task
+            original_id = task.task_id
+        else:
+            original = db.query(Task).filter(Task.task_id == original_id).first()
+
+        now = now or datetime.now(timezone.utc)
+        if original is None:
+            # The original was deleted; the copy's result stands alone
+            return HedgeOutcome(original_id, won=True)
+        previous_status, primary_agent_id = original.status, original.assigned_agent_id
+        won = claim_result(db, original_id, result_data, now)
+
+        outcome = HedgeOutcome(original_id, won)
+        if won and original is not task:
+            # Mirror the claim on the loaded row so task events see the transition
+            original.status = "COMPLETED"
+            original.completed_at = now
+            original.result_data = result_data
+            original.lease_expires_at = None
+            original.updated_at = now
+            # The copy produced the result: its agent gets the latency sample
+            original.assigned_agent_id = task.assigned_agent_id
+            original.started_at = task.started_at
+            if previous_status in INFLIGHT_STATUSES:
+                outcome.loser_agent_id, outcome.loser_status = primary_agent_id, previous_status
+
+        with self.lock:
+            if not won:
+                self.counters["rejected"] += 1
+            elif original is task:
+                self.counters["primary_wins"] += 1
+            else:
+                self.counters["hedge_wins"] += 1
+        return outcome
+
+    def reject(self, db: Session, task: Task, now: Optional[datetime] = None):
+        """Cancel a copy whose result lost to the original"""
+        now = now or datetime.now(timezone.utc)
+        task.status = "CANCELLED"
+        task.cancelled_at = now
+        task.cancellation_reason = "Another agent completed the task first"
+        task.lease_expires_at = None
+        task.updated_at = now
+        db.commit()
+
+    def finish(self, db: Session, outcome: HedgeOutcome):
+        """After a committed win: stop the losing primary and cancel redundant copies"""
+        if outcome.won and outcome.loser_agent_id:
+            push_hub.publish(outcome.loser_agent_id, "task.cancelled", {
+                "task_id": outcome.original_id,
+                "previous_status": outcome.loser_status,
+                "reason": "hedge_won"
+            })
+        self.cancel_losers(db)
+
+    def cancel_losers(self, db: Session) -> int:
+        """
+        Cancel copies whose original already finished.
+
+        Returns:
+            Number of copies cancelled
+        """
+        with self.lock:
+            task_ids, self.losers = self.losers, []
+        if not task_ids:
+            return 0
+        tasks = db.query(Task).filter(Task.task_id.in_(task_ids), Task.status.in_(OPEN_STATUSES)).all()
+        now = datetime.now(timezone.utc)
+        for task in tasks:
+            task.status = "CANCELLED"
+            task.cancelled_at = now
+            task.cancellation_reason = "Original task finished first"
+            task.lease_expires_at = None
+            task.updated_at = now
+        db.commit()
+        with self.lock:
+            self.counters["cancelled"] += len(tasks)
+        return len(tasks)
+
+    def run(self, db: Session) -> int:
+        """One worker pass: cancel redundant copies, then dispatch due hedges"""
+        self.cancel_losers(db)
+        with self.lock:
+            idle = not self.watching
+        if idle:
+            return 0
+        return self.dispatch_due(db)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "policies": dict(self.policies),
+                "budget_percent": self.budget_percent,
+                "tokens": round(self.tokens, 3),
+                "watching": len(self.watching),
+                "outstanding": len(self.hedges),
+                **self.counters
+            }
+
+
+# Global hedge manager instance
+hedge_manager = HedgeManager(
+    policies=parse_client_settings(os.getenv("AINS_HEDGE_CAPABILITIES")),
+    budget_percent=float(os.getenv("AINS_HEDGE_BUDGET_PERCENT", "5")),
+    burst=float(os.getenv("AINS_HEDGE_BURST", "10")),
+    check_seconds=float(os.getenv("AINS_HEDGE_CHECK_SECONDS", "1"))
+)
+task_events.subscribe(hedge_manager.on_task_change)
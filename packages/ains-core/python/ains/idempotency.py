@@ -0,0 +1,270 @@
+"""AINS Idempotency Keys
+
+Clients retrying POST /aitp/tasks or /aitp/tasks/batch after a network
+timeout send the same Idempotency-Key header; the first successful
+response is stored and replayed to retries instead of creating the tasks
+again. Keys are scoped to the endpoint and client_id.
+
+Responses are kept for AINS_IDEMPOTENCY_TTL_SECONDS in an in-memory LRU
+(AINS_IDEMPOTENCY_MAX_ENTRIES) backed by the idempotency_keys table, so a
+replay usually costs no query and survives restarts and other workers.
+Each stored response carries a fingerprint of the request body: reusing
+a key for a different request is rejected, as is a retry that arrives
+while the original request is still being processed by this process.
+Only successful responses are stored, so a request that failed validation
+can be retried with the same key once fixed.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .db import IdempotencyRecord
+from .result_cache import canonical_hash
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """Base class for idempotency key errors"""
+
+
+class IdempotencyKeyReused(IdempotencyError):
+    """The key was already used for a different request"""
+
+
+class IdempotencyInProgress(IdempotencyError):
+    """The original request with this key has not finished yet"""
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: Any
+    expires_at: datetime
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class IdempotencyStore:
+    """Stored responses by (endpoint, client, key): memory LRU over the database"""
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 10000, purge_seconds: float = 300):
+        """
+        Args:
+            ttl_seconds: How long a response is replayed
+            max_entries: Responses kept in memory
+            purge_seconds: Minimum interval between deletes of expired rows
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.purge_seconds = purge_seconds
+        self.lock = threading.Lock()
+        self.responses: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self.in_progress: Set[str] = set()
+        self.last_purge: Optional[datetime] = None
+        self.counters = {"stored": 0, "replayed_memory": 0, "replayed_db": 0, "rejected": 0}
+
+    @staticmethod
+    def record_key(endpoint: str, client_id: str, key: str) -> str:
+        return hashlib.sha256(f"{endpoint}\x00{client_id}\x00{key}".encode("utf-8")).hexdigest()
+
+    # ==================== LOOKUP ====================
+
+    def _remember(self, record_key: str, stored: StoredResponse):
+        with self.lock:
+            self.responses[record_key] = stored
+            self.responses.move_to_end(record_key)
+            while len(self.responses) > self.max_entries:
+                self.responses.popitem(last=False)
+
+    def _cached(self, record_key: str, now: datetime) -> Optional[StoredResponse]:
+        with self.lock:
+            stored = self.responses.get(record_key)
+            if stored is None:
+                return None
+            if stored.expires_at <= now:
+                del self.responses[record_key]
+                return None
+            self.responses.move_to_end(record_key)
+            return stored
+
+    def _load(self, db: Session, record_key: str, now: datetime) -> Optional[StoredResponse]:
+        table = IdempotencyRecord.__table__
+        row = db.execute(
+            select(table.c.fingerprint, table.c.status_code, table.c.response, table.c.expires_at)
+            .where(table.c.record_key == record_key)
+        ).first()
+        if row is None or _utc(row.expires_at) <= now:
+            return None
+        stored = StoredResponse(row.fingerprint, row.status_code, row.response, _utc(row.expires_at))
+        self._remember(record_key, stored)
+        return stored
+
+    def lookup(self, db: Session, record_key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """
+        Stored response for a key, checked against the request's fingerprint.
+
+        Returns:
+            StoredResponse, or None if the key is new (it is then marked in
+            progress until save() or release())
+
+        Raises:
+            IdempotencyKeyReused: The key belongs to a different request
+            IdempotencyInProgress: The original request is still running
+        """
+        now = datetime.now(timezone.utc)
+        stored = self._cached(record_key, now)
+        source = "replayed_memory"
+        if stored is None:
+            with self.lock:
+                if record_key in self.in_progress:
+                    self.counters["rejected"] += 1
+                    raise IdempotencyInProgress("A request with this Idempotency-Key is still being processed")
+            stored = self._load(db, record_key, now)
+            source = "replayed_db"
+
+        with self.lock:
+            if stored is None:
+                if record_key in self.in_progress:
+                    self.counters["rejected"] += 1
+                    raise IdempotencyInProgress("A request with this Idempotency-Key is still being processed")
+                self.in_progress.add(record_key)
+                return None
+            if stored.fingerprint != fingerprint:
+                self.counters["rejected"] += 1
+                raise IdempotencyKeyReused("Idempotency-Key was already used for a different request")
+            self.counters[source] += 1
+            return stored
+
+    # ==================== STORAGE ====================
+
+    def save(
+        self,
+        db: Session,
+        record_key: str,
+        endpoint: str,
+        client_id: str,
+        fingerprint: str,
+        status_code: int,
+        body: Any
+    ):
+        """Store a successful response for replay and release the key"""
+        now = datetime.now(timezone.utc)
+        stored = StoredResponse(fingerprint, status_code, body, now + timedelta(seconds=self.ttl_seconds))
+        values = dict(
+            record_key=record_key, endpoint=endpoint, client_id=client_id, fingerprint=fingerprint,
+            status_code=status_code, response=body, created_at=now, expires_at=stored.expires_at
+        )
+        table = IdempotencyRecord.__table__
+        try:
+            try:
+                db.execute(insert(table).values(**values))
+                db.commit()
+            except IntegrityError:
+                # An expired row for the key is still there, or another worker stored it first
+                db.rollback()
+                db.execute(delete(table).where(table.c.record_key == record_key, table.c.expires_at <= now))
+                db.execute(insert(table).values(**values))
+                db.commit()
+        except SQLAlchemyError as e:
+            # The tasks exist; replay from memory rather than fail the request
+            db.rollback()
+            print(f"⚠️  Idempotency response not persisted: {e}")
+        finally:
+            self.release(record_key)
+        self._remember(record_key, stored)
+        with self.lock:
+            self.counters["stored"] += 1
+        try:
+            self.maybe_purge(db, now)
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"⚠️  Expired idempotency keys not purged: {e}")
+
+    def release(self, record_key: str):
+        """Let the key be used again after the request failed"""
+        with self.lock:
+            self.in_progress.discard(record_key)
+
+    def maybe_purge(self, db: Session, now: Optional[datetime] = None) -> Optional[int]:
+        """
+        Delete expired rows at most once per purge_seconds.
+
+        Returns:
+            Rows deleted, or None if skipped
+        """
+        now = now or datetime.now(timezone.utc)
+        if self.last_purge is not None and (now - self.last_purge).total_seconds() < self.purge_seconds:
+            return None
+        self.last_purge = now
+        table = IdempotencyRecord.__table__
+        deleted = db.execute(delete(table).where(table.c.expires_at <= now)).rowcount
+        db.commit()
+        return deleted
+
+    def run(
+        self,
+        db: Session,
+        endpoint: str,
+        client_id: str,
+        key: str,
+        request_body: Dict[str, Any],
+        handler: Callable[[], Any],
+        encode: Callable[[Any], Any],
+        store_if: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Run a request once per key.
+
+        Args:
+            db: Database session
+            endpoint: Endpoint scope of the key
+            client_id: Client scope of the key
+            key: Idempotency-Key header value
+            request_body: Request payload (fingerprinted)
+            handler: Produces the response when the key is new
+            encode: Turns the response into JSON-compatible data
+            store_if: Whether a response counts as successful (default: any)
+
+        Returns:
+            (response body, True if it was replayed)
+        """
+        record_key = self.record_key(endpoint, client_id, key)
+        fingerprint = canonical_hash(request_body)
+        stored = self.lookup(db, record_key, fingerprint)
+        if stored is not None:
+            return stored.body, True
+        try:
+            body = encode(handler())
+        except BaseException:
+            self.release(record_key)
+            raise
+        if store_if is not None and not store_if(body):
+            self.release(record_key)
+            return body, False
+        self.save(db, record_key, endpoint, client_id, fingerprint, 200, body)
+        return body, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"entries": len(self.responses), "in_progress": len(self.in_progress), **self.counters}
+
+
+# Global idempotency store instance
+idempotency_store = IdempotencyStore(
+    ttl_seconds=float(os.getenv("AINS_IDEMPOTENCY_TTL_SECONDS", "86400")),
+    max_entries=int(os.getenv("AINS_IDEMPOTENCY_MAX_ENTRIES", "10000")),
+    purge_seconds=float(os.getenv("AINS_IDEMPOTENCY_PURGE_SECONDS", "300"))
+)
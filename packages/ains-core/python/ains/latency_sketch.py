@@ -0,0 +1,331 @@
+"""AINS Latency Sketches
+
+Streaming completion-latency quantiles per agent and capability (and per
+capability across agents, for hedging thresholds), kept in
+DDSketches (log-bucketed histograms with a bounded relative error), fed
+from committed task completions. route_slo_aware uses them to predict
+each capable agent's p99 and pick the lowest that meets the task's
+deadline. Agents with too few completions fall back to the
+latency_p99_ms they advertised when publishing the capability.
+
+Sketches are in memory; load_from_db() rebuilds them from the last
+AINS_SLO_HISTORY_HOURS of completed tasks at startup.
+
+Hedge copies are not sampled: when a copy wins, the original row is
+completed under the copy's agent and start time and carries the sample,
+so each result is counted once and the stalled primary is not credited.
+"""
+
+import math
+import os
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import Capability, Task
+from . import task_events
+
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+# Task id suffix of hedge copies (ains.hedging imports this module)
+HEDGE_SUFFIX = "-hedge"
+
+
+class DDSketch:
+    """Quantile sketch with relative accuracy: a quantile estimate is within
+    relative_accuracy of a value of that rank"""
+
+    # Latencies at or below this (ms) are counted as zero
+    MIN_VALUE = 1e-3
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Args:
+            relative_accuracy: Relative error bound of quantile estimates
+            max_buckets: Bucket limit; beyond it the lowest buckets are merged
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._keys: Optional[List[int]] = None
+
+    def add(self, value: float):
+        """Record one latency (ms)"""
+        if value <= self.MIN_VALUE:
+            self.zero_count += 1
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            if key not in self.buckets:
+                self.buckets[key] = 0
+                self._keys = None
+            self.buckets[key] += 1
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def _collapse(self):
+        # High quantiles matter for SLOs; lose resolution at the low end
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets + 1
+        merged = sum(self.buckets.pop(key) for key in keys[:excess])
+        self.buckets[keys[excess]] += merged
+        self._keys = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimated value at quantile q (0..1).
+
+        Returns:
+            Latency in ms, or None if nothing was recorded
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        if self._keys is None:
+            self._keys = sorted(self.buckets)
+        seen = self.zero_count
+        for key in self._keys:
+            seen += self.buckets[key]
+            if seen > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        summary = {
+            "count": self.count,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "mean_ms": self.sum / self.count if self.count else None,
+        }
+        for q in SUMMARY_QUANTILES:
+            value = self.quantile(q)
+            summary[f"p{round(q * 100)}_ms"] = round(value, 3) if value is not None else None
+        summary["relative_accuracy"] = self.relative_accuracy
+        return summary
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def completion_latency_ms(started_at: Optional[datetime], completed_at: Optional[datetime]) -> Optional[float]:
+    """Milliseconds from start to completion, or None if either is missing"""
+    if started_at is None or completed_at is None:
+        return None
+    return max(0.0, (_utc(completed_at) - _utc(started_at)).total_seconds() * 1000)
+
+
+class LatencyTracker:
+    """Latency sketches per agent x capability plus advertised SLOs"""
+
+    def __init__(
+        self,
+        min_samples: int = 20,
+        history_hours: float = 24.0,
+        relative_accuracy: float = 0.01,
+        explore_rate: float = 0.05
+    ):
+        """
+        Args:
+            min_samples: Completions before an agent's own p99 replaces its advertised one
+            history_hours: Completed tasks replayed by load_from_db
+            relative_accuracy: Sketch accuracy
+            explore_rate: Share of decisions sent to an agent with no latency data
+        """
+        self.min_samples = min_samples
+        self.history_hours = history_hours
+        self.relative_accuracy = relative_accuracy
+        self.explore_rate = explore_rate
+        self.lock = threading.Lock()
+        self.sketches: Dict[Tuple[str, str], DDSketch] = {}
+        self.capability_sketches: Dict[str, DDSketch] = {}
+        # (agent_id, capability) -> (latency_p99_ms, availability_percent)
+        self.advertised: Dict[Tuple[str, str], Tuple[Optional[float], Optional[float]]] = {}
+
+    # ==================== RECORDING ====================
+
+    def record(self, agent_id: str, capability: str, latency_ms: float):
+        with self.lock:
+            sketch = self.sketches.get((agent_id, capability))
+            if sketch is None:
+                sketch = self.sketches[(agent_id, capability)] = DDSketch(self.relative_accuracy)
+            sketch.add(latency_ms)
+            sketch = self.capability_sketches.get(capability)
+            if sketch is None:
+                sketch = self.capability_sketches[capability] = DDSketch(self.relative_accuracy)
+            sketch.add(latency_ms)
+
+    def advertise(
+        self,
+        agent_id: str,
+        capability: str,
+        latency_p99_ms: Optional[float],
+        availability_percent: Optional[float] = None
+    ):
+        """Remember the SLO an agent published for a capability"""
+        with self.lock:
+            self.advertised[(agent_id, capability)] = (
+                float(latency_p99_ms) if latency_p99_ms is not None else None,
+                float(availability_percent) if availability_percent is not None else None
+            )
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: feed completion latencies into the sketches"""
+        if change.new_status != "COMPLETED" or change.old_status == "COMPLETED":
+            return
+        if change.task_id.endswith(HEDGE_SUFFIX):
+            return
+        latency = completion_latency_ms(change.started_at, change.completed_at)
+        if change.assigned_agent_id and change.capability and latency is not None:
+            self.record(change.assigned_agent_id, change.capability, latency)
+
+    def load_from_db(self, db: Session):
+        """Rebuild sketches from recent completions and advertised SLOs from capabilities"""
+        since = datetime.now(timezone.utc) - timedelta(hours=self.history_hours)
+        tasks = Task.__table__
+        rows = db.execute(
+            select(tasks.c.assigned_agent_id, tasks.c.capability_required, tasks.c.started_at, tasks.c.completed_at)
+            .where(
+                tasks.c.status == "COMPLETED",
+                tasks.c.assigned_agent_id.isnot(None),
+                tasks.c.started_at.isnot(None),
+                tasks.c.completed_at >= since.replace(tzinfo=None),
+                tasks.c.task_id.notlike(f"%{HEDGE_SUFFIX}")
+            )
+        ).all()
+        capabilities = Capability.__table__
+        advertised = db.execute(
+            select(capabilities.c.agent_id, capabilities.c.name,
+                   capabilities.c.latency_p99_ms, capabilities.c.availability_percent)
+            .where(capabilities.c.deprecated.isnot(True))
+            .order_by(capabilities.c.created_at)
+        ).all()
+
+        with self.lock:
+            self.sketches = {}
+            self.capability_sketches = {}
+            self.advertised = {}
+        for agent_id, capability, started_at, completed_at in rows:
+            self.record(agent_id, capability, completion_latency_ms(started_at, completed_at))
+        # Ordered by creation: the latest publication of a capability wins
+        for agent_id, name, latency_p99_ms, availability_percent in advertised:
+            self.advertise(agent_id, name, latency_p99_ms, availability_percent)
+        print(f"⏱️  Latency sketches loaded {len(rows)} completions, {len(advertised)} advertised SLOs")
+
+    # ==================== PREDICTION ====================
+
+    def predict_p99_ms(self, agent_id: str, capability: str) -> Optional[float]:
+        """
+        Expected p99 completion latency of an agent for a capability.
+
+        Returns:
+            The sketch's p99 once it has min_samples completions, else the
+            advertised latency_p99_ms, else None
+        """
+        with self.lock:
+            sketch = self.sketches.get((agent_id, capability))
+            if sketch is not None and sketch.count >= self.min_samples:
+                return sketch.quantile(0.99)
+            return self.advertised.get((agent_id, capability), (None, None))[0]
+
+    def capability_quantile(self, capability: str, q: float) -> Optional[float]:
+        """
+        Completion latency at quantile q across all agents serving a capability.
+
+        Returns:
+            Latency in ms, or None before min_samples completions
+        """
+        with self.lock:
+            sketch = self.capability_sketches.get(capability)
+            if sketch is None or sketch.count < self.min_samples:
+                return None
+            return sketch.quantile(q)
+
+    def choose(
+        self,
+        capability: str,
+        agent_ids: Iterable[str],
+        deadline_ms: Optional[float] = None,
+        rng=random
+    ) -> Optional[str]:
+        """
+        Agent with the lowest predicted p99 that meets the deadline.
+
+        If no agent is predicted to meet it, the fastest one is chosen anyway.
+        Agents without any latency data get explore_rate of decisions (all
+        of them when no agent has data), so they can warm up.
+
+        Returns:
+            agent_id, or None if agent_ids is empty
+        """
+        predicted: Dict[str, float] = {}
+        cold: List[str] = []
+        for agent_id in agent_ids:
+            p99 = self.predict_p99_ms(agent_id, capability)
+            if p99 is None:
+                cold.append(agent_id)
+            else:
+                predicted[agent_id] = p99
+
+        if cold and (not predicted or rng.random() < self.explore_rate):
+            return rng.choice(cold)
+        if not predicted:
+            return None
+
+        meeting = [a for a, p99 in predicted.items() if deadline_ms is None or p99 <= deadline_ms]
+        candidates = meeting or list(predicted)
+
+        def availability(agent_id: str) -> float:
+            value = self.advertised.get((agent_id, capability), (None, None))[1]
+            return 100.0 if value is None else value
+
+        return min(candidates, key=lambda a: (predicted[a], -availability(a)))
+
+    def agent_summary(self, agent_id: str) -> Dict[str, Dict]:
+        """Per-capability sketch summaries and advertised SLOs for an agent"""
+        with self.lock:
+            capabilities = {c for a, c in self.sketches if a == agent_id}
+            capabilities |= {c for a, c in self.advertised if a == agent_id}
+            summary = {}
+            for capability in sorted(capabilities):
+                sketch = self.sketches.get((agent_id, capability))
+                p99, availability = self.advertised.get((agent_id, capability), (None, None))
+                summary[capability] = {
+                    "observed": sketch.summary() if sketch else None,
+                    "advertised_p99_ms": p99,
+                    "advertised_availability_percent": availability,
+                    "warm": sketch is not None and sketch.count >= self.min_samples,
+                }
+            return summary
+
+
+# Global latency tracker instance
+latency_tracker = LatencyTracker(
+    min_samples=int(os.getenv("AINS_SLO_MIN_SAMPLES", "20")),
+    history_hours=float(os.getenv("AINS_SLO_HISTORY_HOURS", "24")),
+    relative_accuracy=float(os.getenv("AINS_SLO_SKETCH_ACCURACY", "0.01")),
+    explore_rate=float(os.getenv("AINS_SLO_EXPLORE_RATE", "0.05"))
+)
+task_events.subscribe(latency_tracker.on_task_change)
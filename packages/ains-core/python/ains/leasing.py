@@ -0,0 +1,382 @@
+"""AINS Task Leasing
+
+Agents pull work with a long-poll: the request waits on a per-capability
+asyncio waiter until a matching task is queued (or the wait times out), then
+atomically leases up to N tasks with a visibility timeout. The agent extends
+the lease while it works and acks it with the outcome; leases that expire
+are reaped and their tasks go back to PENDING for another agent.
+
+Claims are conditional UPDATEs (WHERE status = 'PENDING'), so two agents
+racing for the same task cannot both win.
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .db import Task, Capability
+from .fair_queue import fair_queue
+from .load_index import load_index
+from . import task_events
+
+LEASED_STATUSES = ('ASSIGNED', 'ACTIVE')
+
+
+def _capability_key(capability: str) -> str:
+    return f"cap:{(capability or '').lower()}"
+
+
+def _agent_key(agent_id: str) -> str:
+    return f"agent:{agent_id}"
+
+
+class LeaseManager:
+    """Long-poll waiters plus lease claim/extend/reap operations"""
+
+    def __init__(self, visibility_timeout: int = 60, max_visibility_timeout: int = 3600):
+        """
+        Args:
+            visibility_timeout: Default lease length in seconds
+            max_visibility_timeout: Upper bound for requested lease lengths
+        """
+        self.visibility_timeout = visibility_timeout
+        self.max_visibility_timeout = max_visibility_timeout
+        self.lock = threading.Lock()
+        # waiter key -> futures of parked long-polls
+        self.waiters: Dict[str, Set[asyncio.Future]] = {}
+
+    # ==================== WAITERS ====================
+
+    def _register(self, keys: Iterable[str]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        with self.lock:
+            for key in keys:
+                self.waiters.setdefault(key, set()).add(future)
+        return future
+
+    def _unregister(self, keys: Iterable[str], future: asyncio.Future):
+        with self.lock:
+            for key in keys:
+                futures = self.waiters.get(key)
+                if futures is not None:
+                    futures.discard(future)
+                    if not futures:
+                        del self.waiters[key]
+
+    def notify(self, key: str):
+        """Wake every long-poll parked on key (safe to call from any thread)"""
+        with self.lock:
+            futures = self.waiters.pop(key, None)
+        for future in futures or ():
+            loop = future.get_loop()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def waiting(self) -> Dict[str, int]:
+        """Number of parked long-polls per waiter key"""
+        with self.lock:
+            return {key: len(futures) for key, futures in self.waiters.items()}
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: wake agents when work they can take appears"""
+        if change.new_status == 'PENDING' and not change.is_blocked:
+            self.notify(_capability_key(change.capability))
+        elif change.new_status == 'ASSIGNED' and change.assigned_agent_id:
+            # Pushed by the routing worker; the agent picks it up as a lease
+            self.notify(_agent_key(change.assigned_agent_id))
+
+    # ==================== LEASING ====================
+
+    def agent_capabilities(self, db: Session, agent_id: str) -> List[str]:
+        """Capabilities the agent has published"""
+        rows = db.query(Capability.name).filter(
+            Capability.agent_id == agent_id,
+            Capability.deprecated.isnot(True)
+        ).all()
+        return sorted({name.lower() for name, in rows})
+
+    def lease(
+        self,
+        db: Session,
+        agent_id: str,
+        capabilities: List[str],
+        max_tasks: int = 1,
+        visibility_timeout: Optional[int] = None
+    ) -> List[Task]:
+        """
+        Lease up to max_tasks tasks without waiting.
+
+        Tasks already ASSIGNED to the agent without a lease (pushed by the
+        routing worker) are claimed first, then PENDING tasks are taken from
+        the fair queue for each capability, up to the agent's free
+        concurrency slots.
+
+        Args:
+            db: Database session
+            agent_id: Agent taking the leases
+            capabilities: Capabilities the agent will serve
+            max_tasks: Maximum number of tasks to lease
+            visibility_timeout: Lease length in seconds (defaults to the manager's)
+
+        Returns:
+            Leased tasks (possibly empty)
+        """
+        seconds = min(visibility_timeout or self.visibility_timeout, self.max_visibility_timeout)
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=seconds)
+
+        try:
+            # Claim pushed assignments first
+            pushed = [task_id for task_id, in db.query(Task.task_id).filter(
+                Task.assigned_agent_id == agent_id,
+                Task.status == 'ASSIGNED',
+                Task.lease_expires_at.is_(None)
+            ).limit(max_tasks).all()]
+            pushed_ids = [task_id for task_id in pushed if db.execute(update(Task).where(
+                Task.task_id == task_id,
+                Task.assigned_agent_id == agent_id,
+                Task.status == 'ASSIGNED',
+                Task.lease_expires_at.is_(None)
+            ).values(lease_expires_at=expires_at, updated_at=now).execution_options(
+                synchronize_session=False
+            )).rowcount == 1]
+            leased_ids = list(pushed_ids)
+
+            # Free slots from the load index (pushed assignments already count as load)
+            load_index.ensure_loaded(db)
+            budget = min(max_tasks - len(leased_ids), load_index.free_slots(agent_id))
+
+            fair_queue.ensure_loaded(db)
+            for capability in capabilities:
+                while budget > 0:
+                    task_id = fair_queue.dequeue(capability)
+                    if task_id is None:
+                        break
+                    if self._claim(db, task_id, agent_id, now, expires_at):
+                        leased_ids.append(task_id)
+                        budget -= 1
+                    else:
+                        # Taken, cancelled or blocked since it was queued
+                        fair_queue.release(task_id)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        # Claims are bulk UPDATEs: count the newly assigned tasks by hand
+        load_index.adjust(agent_id, len(leased_ids) - len(pushed_ids))
+
+        if not leased_ids:
+            return []
+        return db.query(Task).filter(Task.task_id.in_(leased_ids)).order_by(
+            Task.priority.desc(), Task.created_at.asc()
+        ).all()
+
+    def _claim(self, db: Session, task_id: str, agent_id: str, now: datetime, expires_at: datetime) -> bool:
+        """Conditional UPDATE; only one claimant can move a task out of PENDING"""
+        result = db.execute(update(Task).where(
+            Task.task_id == task_id,
+            Task.status == 'PENDING',
+            Task.is_blocked.isnot(True)
+        ).values(
+            status='ASSIGNED',
+            assigned_agent_id=agent_id,
+            assigned_at=now,
+            updated_at=now,
+            lease_expires_at=expires_at
+        ).execution_options(synchronize_session=False))
+        return result.rowcount == 1
+
+    async def wait_for_tasks(
+        self,
+        db: Session,
+        agent_id: str,
+        capabilities: List[str],
+        max_tasks: int = 1,
+        wait_seconds: float = 20.0,
+        visibility_timeout: Optional[int] = None
+    ) -> List[Task]:
+        """
+        Long-poll: lease tasks, parking on capability waiters until work
+        arrives or wait_seconds elapses.
+
+        The database work runs in the threadpool; while parked the request
+        holds no transaction and makes no queries.
+
+        Returns:
+            Leased tasks, or an empty list on timeout
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        keys = [_capability_key(capability) for capability in capabilities] + [_agent_key(agent_id)]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+
+        while True:
+            # Register before looking so a task queued in between still wakes us
+            future = self._register(keys)
+            try:
+                tasks = await run_in_threadpool(
+                    self.lease, db, agent_id, capabilities, max_tasks, visibility_timeout
+                )
+                remaining = deadline - loop.time()
+                if tasks or remaining <= 0:
+                    return tasks
+                try:
+                    await asyncio.wait_for(future, timeout=remaining)
+                except asyncio.TimeoutError:
+                    return []
+            finally:
+                self._unregister(keys, future)
+
+    def extend(self, db: Session, agent_id: str, task_id: str, seconds: Optional[int] = None) -> Optional[datetime]:
+        """
+        Push a held lease's expiry to now + seconds.
+
+        Returns:
+            New expiry, or None if the agent does not hold a live lease on the task
+        """
+        seconds = min(seconds or self.visibility_timeout, self.max_visibility_timeout)
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=seconds)
+
+        result = db.execute(update(Task).where(
+            Task.task_id == task_id,
+            Task.assigned_agent_id == agent_id,
+            Task.status.in_(LEASED_STATUSES),
+            Task.lease_expires_at > now
+        ).values(lease_expires_at=expires_at, updated_at=now).execution_options(synchronize_session=False))
+        db.commit()
+        return expires_at if result.rowcount == 1 else None
+
+    def holds_lease(self, db: Session, agent_id: str, task_id: str) -> bool:
+        """True if the agent holds an unexpired lease on the task"""
+        return db.query(Task.task_id).filter(
+            Task.task_id == task_id,
+            Task.assigned_agent_id == agent_id,
+            Task.status.in_(LEASED_STATUSES),
+            Task.lease_expires_at > datetime.now(timezone.utc)
+        ).first() is not None
+
+    def reap_expired(self, db: Session) -> int:
+        """
+        Return tasks whose lease expired to PENDING (counting a retry) and
+        wake agents waiting for their capabilities. Tasks that have used up
+        max_retries are FAILED instead, as update_task_status does for a
+        reported failure, so a task that keeps crashing its agents is not
+        re-queued forever.
+
+        Returns:
+            Number of tasks re-queued or failed
+        """
+        now = datetime.now(timezone.utc)
+        table = Task.__table__
+        expired = (table.c.status.in_(LEASED_STATUSES), table.c.lease_expires_at < now)
+        retries_left = func.coalesce(table.c.retry_count, 0) < func.coalesce(table.c.max_retries, 3)
+        rows = {row.task_id: row for row in db.execute(
+            select(table.c.task_id, table.c.status, table.c.assigned_agent_id, table.c.capability_required,
+                   table.c.priority, table.c.created_at, table.c.client_id, table.c.is_blocked,
+                   table.c.started_at, table.c.retry_count, table.c.max_retries)
+            .where(*expired)
+        ).all()}
+        if not rows:
+            return 0
+
+        def has_retries(row) -> bool:
+            return (row.retry_count or 0) < (row.max_retries if row.max_retries is not None else 3)
+
+        requeue_ids = [task_id for task_id, row in rows.items() if has_retries(row)]
+        fail_ids = [task_id for task_id, row in rows.items() if not has_retries(row)]
+        requeue = update(table).where(table.c.task_id.in_(requeue_ids), *expired, retries_left).values(
+            status='PENDING',
+            assigned_agent_id=None,
+            assigned_at=None,
+            started_at=None,
+            lease_expires_at=None,
+            retry_count=func.coalesce(table.c.retry_count, 0) + 1,
+            updated_at=now
+        )
+        fail = update(table).where(table.c.task_id.in_(fail_ids), *expired, ~retries_left).values(
+            status='FAILED',
+            completed_at=now,
+            lease_expires_at=None,
+            error_message="Lease expired and no retries are left",
+            updated_at=now
+        )
+
+        # The bulk UPDATEs bypass task events, so publish them by hand
+        if db.get_bind().dialect.update_returning:
+            requeued = [task_id for (task_id,) in db.execute(requeue.returning(table.c.task_id)).all()] \
+                if requeue_ids else []
+            failed = [task_id for (task_id,) in db.execute(fail.returning(table.c.task_id)).all()] \
+                if fail_ids else []
+            db.commit()
+            for task_id in requeued:
+                row = rows[task_id]
+                task_events.publish(task_events.TaskChange(
+                    task_id=task_id, old_status=row.status, new_status='PENDING',
+                    capability=row.capability_required, priority=row.priority if row.priority is not None else 5,
+                    created_at=row.created_at, client_id=row.client_id,
+                    assigned_agent_id=None, old_assigned_agent_id=row.assigned_agent_id,
+                    is_blocked=bool(row.is_blocked)
+                ))
+            for task_id in failed:
+                row = rows[task_id]
+                task_events.publish(task_events.TaskChange(
+                    task_id=task_id, old_status=row.status, new_status='FAILED',
+                    capability=row.capability_required, priority=row.priority if row.priority is not None else 5,
+                    created_at=row.created_at, client_id=row.client_id,
+                    assigned_agent_id=row.assigned_agent_id, old_assigned_agent_id=row.assigned_agent_id,
+                    is_blocked=bool(row.is_blocked), started_at=row.started_at, completed_at=now
+                ))
+            reaped, failed_count = len(requeued) + len(failed), len(failed)
+        else:
+            requeued_count = db.execute(requeue).rowcount if requeue_ids else 0
+            failed_count = db.execute(fail).rowcount if fail_ids else 0
+            db.commit()
+            reaped = requeued_count + failed_count
+            if reaped:
+                fair_queue.load_from_db(db)
+                for capability in fair_queue.capabilities():
+                    self.notify(_capability_key(capability))
+                if load_index.loaded:
+                    load_index.reconcile(db)
+
+        if reaped:
+            print(f"⏰ Reaped {reaped} expired task leases ({failed_count} out of retries)")
+        return reaped
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+def lease_payload(task: Task) -> Dict[str, Any]:
+    """JSON body for a leased task"""
+    return {
+        "task_id": task.task_id,
+        "client_id": task.client_id,
+        "task_type": task.task_type,
+        "capability_required": task.capability_required,
+        "input_data": task.input_data,
+        "priority": task.priority,
+        "status": task.status,
+        "assigned_at": task.assigned_at.isoformat() if task.assigned_at else None,
+        "lease_expires_at": task.lease_expires_at.isoformat() if task.lease_expires_at else None,
+        "timeout_seconds": task.timeout_seconds
+    }
+
+
+# Global lease manager instance
+lease_manager = LeaseManager(
+    visibility_timeout=int(os.getenv("AINS_LEASE_SECONDS", "60")),
+    max_visibility_timeout=int(os.getenv("AINS_MAX_LEASE_SECONDS", "3600"))
+)
+task_events.subscribe(lease_manager.on_task_change)
@@ -0,0 +1,277 @@
+"""AINS Agent Load Index
+
+In-flight task counts per agent (tasks ASSIGNED or ACTIVE on it), kept in
+memory from committed task changes instead of one count() per agent per
+routing decision. Agents are bucketed by load for every capability they
+are tagged with, so least-loaded selection costs the same for ten agents
+or a hundred thousand.
+
+Each agent has concurrency slots: the max_concurrency it declared at
+registration or in a heartbeat, else AINS_DEFAULT_AGENT_CONCURRENCY.
+Agents with no free slot leave the buckets until a task finishes, and
+dispatchers ask free_slots() how much work an agent can take.
+
+Writes that bypass task events (lease claims, bulk updates, other
+processes) make the counters drift; reconcile() replaces them with the
+result of a single GROUP BY assigned_agent_id query and is run
+periodically and after lease reaping.
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .db import Agent, Task
+from . import task_events
+from .fair_queue import INFLIGHT_STATUSES
+
+# Slots of agents that have not declared max_concurrency
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AINS_DEFAULT_AGENT_CONCURRENCY", "5"))
+
+
+class _LoadBuckets:
+    """Bucket queue of one capability's agents, keyed by load"""
+
+    def __init__(self):
+        # load -> agent IDs in rotation order (dicts keep insertion order)
+        self.buckets: Dict[int, Dict[str, None]] = {}
+        # Never above the lowest non-empty load
+        self.min_load = 0
+
+    def add(self, agent_id: str, load: int):
+        bucket = self.buckets.get(load)
+        if bucket is None:
+            bucket = self.buckets[load] = {}
+        bucket[agent_id] = None
+        if load < self.min_load:
+            self.min_load = load
+
+    def remove(self, agent_id: str, load: int):
+        bucket = self.buckets.get(load)
+        if bucket is not None:
+            bucket.pop(agent_id, None)
+            if not bucket:
+                del self.buckets[load]
+
+    def least_loaded(self) -> Optional[str]:
+        """First agent at the lowest load; it moves to the back of its bucket"""
+        if not self.buckets:
+            return None
+        # Loads are bounded by agent concurrency, so this walk is short
+        while self.min_load not in self.buckets:
+            self.min_load += 1
+        bucket = self.buckets[self.min_load]
+        agent_id = next(iter(bucket))
+        # Rotate so equally loaded agents take turns between load updates
+        del bucket[agent_id]
+        bucket[agent_id] = None
+        return agent_id
+
+
+class LoadIndex:
+    """Per-agent in-flight counts with per-capability least-loaded lookup"""
+
+    def __init__(self, reconcile_seconds: float = 60.0, default_max_concurrency: Optional[int] = DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            reconcile_seconds: Interval between reconciliations against the database
+            default_max_concurrency: Slots of agents without a declared limit (None: unlimited)
+        """
+        self.reconcile_seconds = reconcile_seconds
+        self.default_max_concurrency = default_max_concurrency
+        self.lock = threading.Lock()
+        self.loads: Dict[str, int] = {}
+        self.tags: Dict[str, Tuple[str, ...]] = {}
+        self.max_concurrency: Dict[str, Optional[int]] = {}
+        self.capabilities: Dict[str, _LoadBuckets] = {}
+        self.loaded = False
+        self.reconciled_at: Optional[float] = None
+
+    # ==================== LOADING ====================
+
+    def ensure_loaded(self, db: Session):
+        """Load agents and their loads on first use"""
+        if not self.loaded:
+            self.load_from_db(db)
+
+    def load_from_db(self, db: Session):
+        """Rebuild the index from the agents table and in-flight tasks"""
+        table = Agent.__table__
+        rows = db.execute(select(table.c.agent_id, table.c.tags, table.c.max_concurrency)).all()
+        with self.lock:
+            self.loads = {}
+            self.tags = {}
+            self.max_concurrency = {}
+            self.capabilities = {}
+            for agent_id, tags, max_concurrency in rows:
+                self._track(agent_id, tags or [], max_concurrency)
+            self.loaded = True
+        self.reconcile(db)
+        print(f"⚖️  Load index loaded {len(rows)} agents")
+
+    def reconcile(self, db: Session) -> int:
+        """
+        Replace the counters with in-flight counts from the database.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of agents whose count was corrected
+        """
+        table = Task.__table__
+        counts = dict(db.execute(
+            select(table.c.assigned_agent_id, func.count())
+            .where(table.c.assigned_agent_id.isnot(None), table.c.status.in_(INFLIGHT_STATUSES))
+            .group_by(table.c.assigned_agent_id)
+        ).all())
+
+        corrected = 0
+        with self.lock:
+            for agent_id in set(self.loads) | set(counts):
+                if self.loads.get(agent_id, 0) != counts.get(agent_id, 0):
+                    self._set(agent_id, counts.get(agent_id, 0))
+                    corrected += 1
+            self.reconciled_at = time.monotonic()
+
+        if corrected:
+            print(f"⚖️  Load index corrected {corrected} agent loads")
+        return corrected
+
+    def maybe_reconcile(self, db: Session) -> Optional[int]:
+        """Reconcile if the last reconciliation is older than reconcile_seconds"""
+        if self.reconciled_at is not None and time.monotonic() - self.reconciled_at < self.reconcile_seconds:
+            return None
+        return self.reconcile(db)
+
+    # ==================== AGENTS ====================
+
+    def track_agent(self, agent_id: str, tags: Iterable[str], max_concurrency: Optional[int] = None):
+        """Add an agent (or update its tags and declared slots)"""
+        with self.lock:
+            self._track(agent_id, tags, max_concurrency)
+
+    def set_max_concurrency(self, agent_id: str, max_concurrency: Optional[int]) -> bool:
+        """
+        Change the slots an agent declared (None: back to the default).
+
+        Returns:
+            True if the value differs from the indexed one (or the agent is not indexed)
+        """
+        with self.lock:
+            if agent_id not in self.tags:
+                return True
+            if self.max_concurrency.get(agent_id) == max_concurrency:
+                return False
+            self._unplace(agent_id)
+            self.max_concurrency[agent_id] = max_concurrency
+            self._place(agent_id)
+            return True
+
+    def forget_agent(self, agent_id: str):
+        with self.lock:
+            self._unplace(agent_id)
+            self.loads.pop(agent_id, None)
+            self.tags.pop(agent_id, None)
+            self.max_concurrency.pop(agent_id, None)
+
+    def _track(self, agent_id: str, tags: Iterable[str], max_concurrency: Optional[int] = None):
+        self._unplace(agent_id)
+        self.tags[agent_id] = tuple(dict.fromkeys(tags))
+        self.loads[agent_id] = self.loads.get(agent_id, 0)
+        self.max_concurrency[agent_id] = max_concurrency
+        for tag in self.tags[agent_id]:
+            if tag not in self.capabilities:
+                self.capabilities[tag] = _LoadBuckets()
+        self._place(agent_id)
+
+    def _unplace(self, agent_id: str):
+        load = self.loads.get(agent_id, 0)
+        for tag in self.tags.get(agent_id, ()):
+            self.capabilities[tag].remove(agent_id, load)
+
+    def _place(self, agent_id: str):
+        # Only agents with a free slot can be picked
+        load = self.loads.get(agent_id, 0)
+        if self._free(agent_id, load) <= 0:
+            return
+        for tag in self.tags.get(agent_id, ()):
+            self.capabilities[tag].add(agent_id, load)
+
+    def _free(self, agent_id: str, load: int) -> float:
+        limit = self.max_concurrency.get(agent_id) or self.default_max_concurrency
+        return float("inf") if limit is None else limit - load
+
+    # ==================== LOADS ====================
+
+    def _set(self, agent_id: str, load: int):
+        load = max(0, load)
+        if self.loads.get(agent_id, 0) == load:
+            return
+        self._unplace(agent_id)
+        self.loads[agent_id] = load
+        self._place(agent_id)
+
+    def adjust(self, agent_id: Optional[str], delta: int):
+        """Change an agent's in-flight count (for writes that bypass task events)"""
+        if not self.loaded or agent_id is None or not delta:
+            return
+        with self.lock:
+            self._set(agent_id, self.loads.get(agent_id, 0) + delta)
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: move in-flight counts on assign/complete/fail/cancel"""
+        if change.old_status in INFLIGHT_STATUSES:
+            self.adjust(change.old_assigned_agent_id, -1)
+        if change.new_status in INFLIGHT_STATUSES:
+            self.adjust(change.assigned_agent_id, 1)
+
+    # ==================== QUERIES ====================
+
+    def least_loaded(self, capability: str) -> Optional[str]:
+        """
+        Agent tagged with a capability that has the fewest in-flight tasks.
+
+        Agents without a free slot are skipped; ties are served in rotation.
+        O(1) in the number of agents.
+
+        Returns:
+            agent_id, or None if no agent with the capability has a free slot
+        """
+        with self.lock:
+            buckets = self.capabilities.get(capability)
+            return buckets.least_loaded() if buckets else None
+
+    def load(self, agent_id: str) -> int:
+        """In-flight tasks on an agent"""
+        return self.loads.get(agent_id, 0)
+
+    def free_slots(self, agent_id: str) -> int:
+        """
+        Tasks an agent can take before reaching its max_concurrency.
+
+        Unknown agents get the default slots; with no default the count is
+        effectively unlimited (sys.maxsize).
+        """
+        with self.lock:
+            free = self._free(agent_id, self.loads.get(agent_id, 0))
+        return sys.maxsize if free == float("inf") else max(0, int(free))
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "agents": len(self.loads),
+                "capabilities": len(self.capabilities),
+                "inflight": sum(self.loads.values()),
+                "saturated": sum(1 for agent_id, load in self.loads.items() if self._free(agent_id, load) <= 0)
+            }
+
+
+# Global load index instance
+load_index = LoadIndex(reconcile_seconds=float(os.getenv("AINS_LOAD_RECONCILE_SECONDS", "60")))
+task_events.subscribe(load_index.on_task_change)
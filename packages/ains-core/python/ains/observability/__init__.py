@@ -16,6 +16,7 @@ from .metrics import (
     record_task_failed,
     update_agent_metrics,
     update_queue_depth,
+    agent_detail,
     initialize_app_info,
     get_metrics,
 )
@@ -39,6 +40,7 @@ __all__ = [
     'record_task_failed',
     'update_agent_metrics',
     'update_queue_depth',
+    'agent_detail',
     'initialize_app_info',
     'get_metrics',
     
@@ -0,0 +1,286 @@
+"""Bounded-cardinality metrics
+
+Per-agent and per-client series grow with the fleet: every agent_id or
+client_id label value is a new time series held in memory and written on
+every scrape. The metrics here keep exact per-key values in process but
+expose only the top-K keys (by task volume) as labelled series, folding
+everything else into a single "other" series per remaining label set.
+
+Top-K membership is recomputed at most every refresh_seconds, so series
+rarely appear or disappear between scrapes. When a key enters the top-K its
+volume moves out of "other", which Prometheus sees as a counter reset on
+the "other" series; sum() over all series is always exact.
+
+Per-key detail for every agent is served as paginated JSON instead
+(see metrics.agent_detail).
+"""
+
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.registry import Collector
+
+OTHER_LABEL = "other"
+
+
+class TopKSelector:
+    """Ranks keys (agent or client IDs) by volume and caches the top K"""
+
+    def __init__(self, limit: int, refresh_seconds: float = 60.0):
+        """
+        Args:
+            limit: Keys exposed as their own series (0 folds everything into "other")
+            refresh_seconds: Minimum time between top-K recomputations
+        """
+        self.limit = limit
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.volume: Dict[str, float] = {}
+        self._members: Set[str] = set()
+        self._computed_at: Optional[float] = None
+
+    def observe(self, key: str, weight: float = 1.0):
+        """Add volume to a key (registering it if new)"""
+        with self.lock:
+            self.volume[key] = self.volume.get(key, 0.0) + weight
+            # Fill free slots straight away so small fleets are fully labelled
+            if len(self._members) < self.limit:
+                self._members.add(key)
+
+    def touch(self, key: str):
+        """Register a key without adding volume"""
+        self.observe(key, 0.0)
+
+    def forget(self, key: str):
+        with self.lock:
+            self.volume.pop(key, None)
+            self._members.discard(key)
+
+    def members(self, now: Optional[float] = None) -> Set[str]:
+        """Keys currently exposed as their own series"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self._computed_at is None or now - self._computed_at >= self.refresh_seconds:
+                self._members = {
+                    key for key, _ in heapq.nlargest(self.limit, self.volume.items(), key=lambda item: item[1])
+                }
+                self._computed_at = now
+            return set(self._members)
+
+    def refresh(self):
+        """Force a recomputation on the next members() call"""
+        with self.lock:
+            self._computed_at = None
+
+
+class _Child:
+    """Label-bound handle mirroring prometheus_client's child API"""
+
+    __slots__ = ("metric", "labels")
+
+    def __init__(self, metric: "_BoundedMetric", labels: Tuple[str, ...]):
+        self.metric = metric
+        self.labels = labels
+
+    def inc(self, amount: float = 1.0):
+        self.metric._inc(self.labels, amount)
+
+    def set(self, value: float):
+        self.metric._set(self.labels, value)
+
+    def observe(self, value: float):
+        self.metric._observe(self.labels, value)
+
+
+class _BoundedMetric(Collector):
+    """
+    A metric whose key label (agent_id or client_id) is limited to the
+    selector's top K. Values are kept per full label set; collect() folds
+    non-members into key_label="other".
+    """
+
+    # Label names that are attributes of the key rather than dimensions
+    key_attributes: Tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str],
+        key_label: str,
+        selector: TopKSelector,
+        ranks: bool = True,
+        registry=REGISTRY
+    ):
+        """
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: All label names, including key_label
+            key_label: The high-cardinality label to bound
+            selector: Shared top-K ranking for key_label values
+            ranks: Whether increments count as volume for the ranking
+            registry: Registry to register with (None to skip)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.key_index = self.labelnames.index(key_label)
+        self.selector = selector
+        self.ranks = ranks
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], float] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, **labels) -> _Child:
+        return _Child(self, tuple(str(labels[name]) for name in self.labelnames))
+
+    def _inc(self, labels: Tuple[str, ...], amount: float):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+        if self.ranks:
+            self.selector.observe(labels[self.key_index], amount)
+        else:
+            self.selector.touch(labels[self.key_index])
+
+    def _set(self, labels: Tuple[str, ...], value: float):
+        raise NotImplementedError
+
+    def _observe(self, labels: Tuple[str, ...], value: float):
+        raise NotImplementedError
+
+    def forget(self, key: str):
+        """Drop every series of a key"""
+        with self.lock:
+            for labels in [labels for labels in self.values if labels[self.key_index] == key]:
+                del self.values[labels]
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        """Exposed (labels, value) pairs: top-K keys plus the folded "other" series"""
+        members = self.selector.members()
+        with self.lock:
+            items = list(self.values.items())
+
+        exposed: List[Tuple[Tuple[str, ...], float]] = []
+        folded: Dict[Tuple[str, ...], List[float]] = defaultdict(list)
+        for labels, value in items:
+            if labels[self.key_index] in members:
+                exposed.append((labels, value))
+            else:
+                # Labels that only describe the key (display_name) are folded too
+                other = tuple(
+                    OTHER_LABEL if i == self.key_index or name in self.key_attributes else label
+                    for i, (name, label) in enumerate(zip(self.labelnames, labels))
+                )
+                folded[other].append(value)
+        exposed.extend((labels, self._fold(values)) for labels, values in folded.items())
+        return exposed
+
+    @staticmethod
+    def _fold(values: List[float]) -> float:
+        return sum(values)
+
+    def collect(self):
+        family = self.family_class(self.name, self.documentation, labels=self.labelnames)
+        for labels, value in self.samples():
+            family.add_metric(labels, value)
+        yield family
+
+
+class BoundedCounter(_BoundedMetric):
+    """Counter with a bounded key label; "other" is the sum of folded keys"""
+
+    family_class = CounterMetricFamily
+
+
+class BoundedGauge(_BoundedMetric):
+    """
+    Gauge with a bounded key label; "other" is the mean of folded keys,
+    or their sum for counts (fold_sum=True) so sum() stays exact
+    """
+
+    family_class = GaugeMetricFamily
+
+    def __init__(self, *args, key_attributes: Tuple[str, ...] = (), fold_sum: bool = False, **kwargs):
+        kwargs.setdefault("ranks", False)
+        super().__init__(*args, **kwargs)
+        self.key_attributes = key_attributes
+        self.fold_sum = fold_sum
+
+    def _set(self, labels: Tuple[str, ...], value: float):
+        key = labels[self.key_index]
+        with self.lock:
+            # One series per key: a renamed agent replaces its old display_name
+            for stale in [l for l in self.values if l[self.key_index] == key and l != labels]:
+                del self.values[stale]
+            self.values[labels] = value
+        self.selector.touch(key)
+
+    def _fold(self, values: List[float]) -> float:
+        return sum(values) if self.fold_sum else sum(values) / len(values)
+
+
+class BoundedHistogram(_BoundedMetric):
+    """
+    Histogram with a bounded key label: each key keeps its own buckets, and
+    "other" is the bucket-wise sum of folded keys. Observations do not rank.
+    """
+
+    family_class = HistogramMetricFamily
+
+    def __init__(self, *args, buckets: Iterable[float], **kwargs):
+        kwargs.setdefault("ranks", False)
+        # Set before registering, which calls collect()
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(*args, **kwargs)
+        # labels -> [count per bucket (+Inf last)..., sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def _observe(self, labels: Tuple[str, ...], value: float):
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+        self.selector.touch(labels[self.key_index])
+
+    @staticmethod
+    def _fold(values: List[List[float]]) -> List[float]:
+        return [sum(column) for column in zip(*values)]
+
+    def collect(self):
+        family = self.family_class(self.name, self.documentation, labels=self.labelnames)
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, state in self.samples():
+            cumulative, total = [], 0.0
+            for bound, count in zip(bounds, state[:-1]):
+                total += count
+                cumulative.append((bound, total))
+            family.add_metric(labels, cumulative, state[-1])
+        yield family
+
+
+# ============================================================================
+# SELECTORS
+# ============================================================================
+
+METRICS_MAX_AGENTS = int(os.getenv("AINS_METRICS_MAX_AGENTS", "50"))
+METRICS_MAX_CLIENTS = int(os.getenv("AINS_METRICS_MAX_CLIENTS", "50"))
+METRICS_TOPK_REFRESH_SECONDS = float(os.getenv("AINS_METRICS_TOPK_REFRESH_SECONDS", "60"))
+
+# Agents ranked by tasks completed + failed, clients by tasks created
+agent_selector = TopKSelector(METRICS_MAX_AGENTS, METRICS_TOPK_REFRESH_SECONDS)
+client_selector = TopKSelector(METRICS_MAX_CLIENTS, METRICS_TOPK_REFRESH_SECONDS)
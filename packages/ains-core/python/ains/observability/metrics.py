@@ -2,7 +2,9 @@
 from prometheus_client import Counter, Histogram, Gauge, Info, generate_latest
 from prometheus_client import REGISTRY
 import time
-from typing import Callable
+from typing import Any, Callable, Dict, List
+
+from .cardinality import BoundedCounter, BoundedGauge, BoundedHistogram, agent_selector, client_selector
 
 # Clear any existing metrics to avoid duplicates
 try:
@@ -48,16 +50,22 @@ app_info = Info(
 # TASK METRICS
 # ============================================================================
 
-tasks_created_total = Counter(
+# client_id / agent_id labels are bounded to the top-K keys (see cardinality.py)
+tasks_created_total = BoundedCounter(
     'ains_tasks_created_total',
     'Total tasks created',
-    ['task_type', 'client_id']
+    ['task_type', 'client_id'],
+    key_label='client_id',
+    selector=client_selector
 )
 
-tasks_completed_total = Counter(
+tasks_completed_total = BoundedCounter(
     'ains_tasks_completed_total',
     'Total tasks completed successfully',
-    ['task_type', 'agent_id']
+    ['task_type', 'agent_id'],
+    key_label='agent_id',
+    selector=agent_selector,
+    ranks=False
 )
 
 tasks_failed_total = Counter(
@@ -91,6 +99,39 @@ task_timeouts_total = Counter(
     ['task_type']
 )
 
+# ============================================================================
+# TENANT METRICS
+# ============================================================================
+
+# Bounded to the top-K clients like the task metrics; every tenant is in
+# GET /aitp/queue/tenants
+tenant_queue_depth = BoundedGauge(
+    'ains_tenant_queue_depth',
+    'Pending tasks queued per tenant',
+    ['client_id'],
+    key_label='client_id',
+    selector=client_selector,
+    fold_sum=True
+)
+
+tenant_tasks_inflight = BoundedGauge(
+    'ains_tenant_tasks_inflight',
+    'Assigned or active tasks per tenant',
+    ['client_id'],
+    key_label='client_id',
+    selector=client_selector,
+    fold_sum=True
+)
+
+tenant_queue_wait_seconds = BoundedHistogram(
+    'ains_tenant_queue_wait_seconds',
+    'Time tasks wait in the queue before dispatch, per tenant',
+    ['client_id'],
+    key_label='client_id',
+    selector=client_selector,
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, 14400)
+)
+
 # ============================================================================
 # AGENT METRICS
 # ============================================================================
@@ -105,22 +146,40 @@ agents_active = Gauge(
     'Number of currently active agents'
 )
 
-agent_trust_score = Gauge(
+agent_health_sweep_seconds = Histogram(
+    'ains_agent_health_sweep_seconds',
+    'Duration of stale-agent health sweeps',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+agents_marked_inactive_total = Counter(
+    'ains_agents_marked_inactive_total',
+    'Agents marked INACTIVE by the health sweep after missing heartbeats'
+)
+
+agent_trust_score = BoundedGauge(
     'ains_agent_trust_score',
-    'Agent trust score',
-    ['agent_id', 'display_name']
+    'Agent trust score ("other" is the mean of agents outside the top K)',
+    ['agent_id', 'display_name'],
+    key_label='agent_id',
+    selector=agent_selector,
+    key_attributes=('display_name',)
 )
 
-agent_tasks_completed_total = Counter(
+agent_tasks_completed_total = BoundedCounter(
     'ains_agent_tasks_completed_total',
     'Total tasks completed by agent',
-    ['agent_id']
+    ['agent_id'],
+    key_label='agent_id',
+    selector=agent_selector
 )
 
-agent_tasks_failed_total = Counter(
+agent_tasks_failed_total = BoundedCounter(
     'ains_agent_tasks_failed_total',
     'Total tasks failed by agent',
-    ['agent_id']
+    ['agent_id'],
+    key_label='agent_id',
+    selector=agent_selector
 )
 
 # ============================================================================
@@ -173,6 +232,26 @@ db_query_duration_seconds = Histogram(
     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
 )
 
+# ============================================================================
+# RESULT CACHE METRICS
+# ============================================================================
+
+result_cache_lookups_total = Counter(
+    'ains_result_cache_lookups_total',
+    'Task submissions checked against the result cache, by outcome (hit, coalesced, miss)',
+    ['outcome']
+)
+
+result_cache_entries = Gauge(
+    'ains_result_cache_entries',
+    'Results held in the result cache'
+)
+
+result_cache_bytes = Gauge(
+    'ains_result_cache_bytes',
+    'Serialized size of results held in the result cache'
+)
+
 # ============================================================================
 # WEBHOOK METRICS
 # ============================================================================
@@ -219,6 +298,22 @@ def record_task_retry(task_type: str, retry_count: int):
     """Record task retry"""
     task_retries_total.labels(task_type=task_type, retry_count=str(retry_count)).inc()
 
+def update_tenant_queue(client_id: str, depth: int, inflight: int):
+    """Update per-tenant queue depth and in-flight gauges"""
+    client_id = client_id or "unknown"
+    tenant_queue_depth.labels(client_id=client_id).set(depth)
+    tenant_tasks_inflight.labels(client_id=client_id).set(inflight)
+
+def record_tenant_dequeue(client_id: str, wait_seconds: float):
+    """Record how long a tenant's task waited before dispatch"""
+    tenant_queue_wait_seconds.labels(client_id=client_id or "unknown").observe(wait_seconds)
+
+def record_result_cache_lookup(outcome: str, entries: int, size_bytes: int):
+    """Record a result cache lookup and the cache's current size"""
+    result_cache_lookups_total.labels(outcome=outcome).inc()
+    result_cache_entries.set(entries)
+    result_cache_bytes.set(size_bytes)
+
 def update_agent_metrics(agent_id: str, display_name: str, trust_score: float):
     """Update agent metrics"""
     agent_trust_score.labels(agent_id=agent_id, display_name=display_name).set(trust_score)
@@ -257,6 +352,53 @@ def initialize_app_info(version: str, environment: str):
         'name': 'DukeNet-AINS'
     })
 
+def agent_detail(limit: int = 50, offset: int = 0, sort: str = "tasks_completed") -> Dict[str, Any]:
+    """
+    Per-agent metric values for every agent this process has seen,
+    including those folded into "other" on /metrics.
+
+    Args:
+        limit: Page size
+        offset: Agents to skip
+        sort: tasks_completed, tasks_failed or trust_score (descending)
+
+    Returns:
+        Page of agents with total count and the configured label limit
+    """
+    agents: Dict[str, Dict[str, Any]] = {}
+
+    def entry(agent_id: str) -> Dict[str, Any]:
+        return agents.setdefault(agent_id, {
+            "agent_id": agent_id, "display_name": None, "trust_score": None,
+            "tasks_completed": 0, "tasks_failed": 0
+        })
+
+    with agent_trust_score.lock:
+        for (agent_id, display_name), value in agent_trust_score.values.items():
+            entry(agent_id).update(display_name=display_name, trust_score=value)
+    with agent_tasks_completed_total.lock:
+        for (agent_id,), value in agent_tasks_completed_total.values.items():
+            entry(agent_id)["tasks_completed"] = int(value)
+    with agent_tasks_failed_total.lock:
+        for (agent_id,), value in agent_tasks_failed_total.values.items():
+            entry(agent_id)["tasks_failed"] = int(value)
+
+    members = agent_selector.members()
+    rows: List[Dict[str, Any]] = sorted(
+        agents.values(), key=lambda row: (-(row[sort] or 0), row["agent_id"])
+    )
+    page = rows[offset:offset + limit]
+    for row in page:
+        row["labelled"] = row["agent_id"] in members
+
+    return {
+        "agents": page,
+        "total": len(rows),
+        "limit": limit,
+        "offset": offset,
+        "max_labelled_agents": agent_selector.limit
+    }
+
 def get_metrics() -> bytes:
     """Get Prometheus metrics in text format"""
     return generate_latest(REGISTRY)
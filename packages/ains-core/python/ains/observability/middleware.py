@@ -1,68 +1,167 @@
-"""FastAPI middleware for automatic metrics collection"""
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+"""ASGI middleware for automatic metrics collection"""
+import os
+import re
 import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from starlette.routing import WebSocketRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from .metrics import (
     http_requests_total,
     http_request_duration_seconds,
     http_requests_in_progress
 )
+from .query_stats import query_stats
+
+# Label for paths that match no route once the unknown-path budget is spent
+UNMATCHED_LABEL = "<unmatched>"
+
+
+class RouteTemplates:
+    """
+    Resolves request paths to route templates ("/aitp/tasks/{task_id}").
+
+    Static paths are a dict lookup; parameterised routes are bucketed by
+    their leading literal segments so only a few regexes are tried.
+    """
+
+    def __init__(self, routes: List):
+        self.route_count = len(routes)
+        self.static: Dict[str, str] = {}
+        self.dynamic: Dict[Tuple[str, ...], List[Tuple[re.Pattern, str]]] = {}
+        self.templates: Set[str] = set()
+        self.methods: List[Tuple[str, str]] = []
+
+        for route in routes:
+            regex = getattr(route, "path_regex", None)
+            template = getattr(route, "path_format", None) or getattr(route, "path", None)
+            if regex is None or template is None or isinstance(route, WebSocketRoute):
+                continue
+            self.templates.add(template)
+            self.methods.extend((method, template) for method in getattr(route, "methods", None) or ())
+            if "{" not in template:
+                self.static.setdefault(template, template)
+                continue
+            key = self._literal_prefix(template)
+            self.dynamic.setdefault(key, []).append((regex, template))
+
+    @staticmethod
+    def _literal_prefix(template: str) -> Tuple[str, ...]:
+        prefix = []
+        for segment in template.strip("/").split("/")[:2]:
+            if "{" in segment:
+                break
+            prefix.append(segment)
+        return tuple(prefix)
+
+    def resolve(self, path: str) -> Optional[str]:
+        """Template of the route matching path, or None"""
+        template = self.static.get(path)
+        if template is not None:
+            return template
+
+        segments = path.strip("/").split("/")[:2]
+        for size in (2, 1, 0):
+            for regex, template in self.dynamic.get(tuple(segments[:size]), ()):
+                if regex.match(path):
+                    return template
+        return None
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware tracking HTTP request metrics.
+
+    Requests are labelled by route template, never by the raw path, so
+    /aitp/tasks/<id> is one time series. Label children for each
+    (method, template) are bound once and reused. Paths matching no route
+    keep their own label only up to max_unmatched_paths distinct values.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_unmatched_paths: Optional[int] = None,
+        skip_paths: Tuple[str, ...] = ("/metrics",)
+    ):
+        self.app = app
+        self.max_unmatched_paths = max_unmatched_paths if max_unmatched_paths is not None else int(
+            os.getenv("AINS_METRICS_MAX_UNMATCHED_PATHS", "50")
+        )
+        self.skip_paths = set(skip_paths)
+        self.routes: Optional[RouteTemplates] = None
+        self.unmatched: Set[str] = set()
+        # (method, template) -> (duration histogram child, in-progress gauge child)
+        self.children: Dict[Tuple[str, str], Tuple] = {}
+        # (method, template, status) -> request counter child
+        self.counters: Dict[Tuple[str, str, int], object] = {}
+
+    def _templates(self, scope: Scope) -> RouteTemplates:
+        app = scope.get("app")
+        routes = getattr(getattr(app, "router", None), "routes", None) or []
+        # Rebuilt if routes were added after the first request
+        if self.routes is None or self.routes.route_count != len(routes):
+            self.routes = RouteTemplates(routes)
+            # Pre-bind label children for every known route
+            for method, template in self.routes.methods:
+                self._children(method, template)
+        return self.routes
+
+    def _label(self, scope: Scope) -> str:
+        path = scope["path"]
+        template = self._templates(scope).resolve(path)
+        if template is not None:
+            return template
+        if path in self.unmatched:
+            return path
+        if len(self.unmatched) < self.max_unmatched_paths:
+            self.unmatched.add(path)
+            return path
+        return UNMATCHED_LABEL
+
+    def _children(self, method: str, endpoint: str) -> Tuple:
+        children = self.children.get((method, endpoint))
+        if children is None:
+            children = self.children[(method, endpoint)] = (
+                http_request_duration_seconds.labels(method=method, endpoint=endpoint),
+                http_requests_in_progress.labels(method=method, endpoint=endpoint)
+            )
+        return children
+
+    def _counter(self, method: str, endpoint: str, status_code: int):
+        counter = self.counters.get((method, endpoint, status_code))
+        if counter is None:
+            counter = self.counters[(method, endpoint, status_code)] = http_requests_total.labels(
+                method=method, endpoint=endpoint, status_code=status_code
+            )
+        return counter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip non-HTTP traffic and the metrics endpoint itself
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        endpoint = self._label(scope)
+        duration, in_progress = self._children(method, endpoint)
+        status_code = 500
 
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-class PrometheusMiddleware(BaseHTTPMiddleware):
-    """Middleware to automatically track HTTP request metrics"""
-    
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next):
-        # Skip metrics endpoint to avoid infinite loop
-        if request.url.path == "/metrics":
-            return await call_next(request)
-        
-        method = request.method
-        endpoint = request.url.path
-        
-        # Track in-progress requests
-        http_requests_in_progress.labels(method=method, endpoint=endpoint).inc()
-        
-        # Start timer
-        start_time = time.time()
-        
+        in_progress.inc()
+        # Statements issued while serving the request are counted against the query budget
+        queries = query_stats.begin_request(endpoint)
+        start_time = time.perf_counter()
         try:
-            # Process request
-            response = await call_next(request)
-            status_code = response.status_code
-            
-            # Record metrics
-            duration = time.time() - start_time
-            http_requests_total.labels(
-                method=method,
-                endpoint=endpoint,
-                status_code=status_code
-            ).inc()
-            http_request_duration_seconds.labels(
-                method=method,
-                endpoint=endpoint
-            ).observe(duration)
-            
-            return response
-            
-        except Exception as e:
-            # Record failed request
-            duration = time.time() - start_time
-            http_requests_total.labels(
-                method=method,
-                endpoint=endpoint,
-                status_code=500
-            ).inc()
-            http_request_duration_seconds.labels(
-                method=method,
-                endpoint=endpoint
-            ).observe(duration)
-            raise
-            
+            await self.app(scope, receive, send_wrapper)
         finally:
-            # Decrement in-progress counter
-            http_requests_in_progress.labels(method=method, endpoint=endpoint).dec()
+            duration.observe(time.perf_counter() - start_time)
+            self._counter(method, endpoint, status_code).inc()
+            in_progress.dec()
+            query_stats.end_request(queries, method)
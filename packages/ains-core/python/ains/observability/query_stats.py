@@ -0,0 +1,298 @@
+"""SQLAlchemy query instrumentation
+
+Cursor-execute hooks time every statement and:
+
+- feed db_queries_total / db_query_duration_seconds (by statement type and table)
+- accumulate time per normalized statement fingerprint, exposed as bounded
+  top-K series (see cardinality.py)
+- keep a ring buffer of statements slower than AINS_SLOW_QUERY_MS, with
+  parameter values redacted, served by /ains/stats/slow-queries
+- count statements per HTTP request and warn when an endpoint exceeds
+  AINS_QUERY_BUDGET, which is how N+1 regressions show up
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .cardinality import BoundedCounter, TopKSelector, METRICS_TOPK_REFRESH_SECONDS
+from .metrics import db_queries_total, db_query_duration_seconds
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"(?:%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?)")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+["`]?(\w+)', re.IGNORECASE)
+
+MAX_STATEMENT_LENGTH = 2000
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """A statement with literals and bind markers normalized"""
+    id: str
+    text: str
+    query_type: str
+    table: str
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> Fingerprint:
+    """
+    Normalize a statement so executions differing only in values (or in
+    the length of an IN list) share a fingerprint.
+
+    Args:
+        statement: SQL as sent to the driver
+
+    Returns:
+        Fingerprint with a short stable id
+    """
+    text = _WHITESPACE.sub(" ", statement).strip()
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _IN_LIST.sub("(?+)", text)[:MAX_STATEMENT_LENGTH]
+
+    query_type = text.split(" ", 1)[0].upper() if text else "UNKNOWN"
+    table = _TABLE.search(text)
+    return Fingerprint(
+        id=hashlib.sha1(text.encode()).hexdigest()[:12],
+        text=text,
+        query_type=query_type,
+        table=table.group(1).lower() if table else "none"
+    )
+
+
+def redact(parameters: Any) -> Any:
+    """Replace bound values with their type names"""
+    if isinstance(parameters, dict):
+        return {key: f"<{type(value).__name__}>" for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: describe the first row and the batch size
+            return {"rows": len(parameters), "first": redact(parameters[0])}
+        return [f"<{type(value).__name__}>" for value in parameters]
+    return None if parameters is None else f"<{type(parameters).__name__}>"
+
+
+@dataclass
+class SlowQuery:
+    fingerprint_id: str
+    statement: str
+    duration_ms: float
+    parameters: Any
+    endpoint: Optional[str]
+    executemany: bool
+    at: str
+
+
+@dataclass
+class _FingerprintStats:
+    text: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclass
+class RequestQueries:
+    """Statements issued while serving one request"""
+    endpoint: str
+    count: int = 0
+    seconds: float = 0.0
+    fingerprints: Dict[str, int] = field(default_factory=dict)
+
+
+_current_request: ContextVar[Optional[RequestQueries]] = ContextVar("ains_request_queries", default=None)
+
+
+class QueryStats:
+    """Collects timings from instrumented engines"""
+
+    def __init__(
+        self,
+        slow_threshold_ms: float = 100.0,
+        ring_size: int = 200,
+        query_budget: int = 50,
+        max_fingerprints: int = 1000
+    ):
+        """
+        Args:
+            slow_threshold_ms: Statements at least this slow enter the ring buffer
+            ring_size: Slow statements kept
+            query_budget: Statements per request before a warning is logged (0 disables)
+            max_fingerprints: Distinct fingerprints tracked before new ones are ignored
+        """
+        self.slow_threshold = slow_threshold_ms / 1000.0
+        self.query_budget = query_budget
+        self.max_fingerprints = max_fingerprints
+        self.lock = threading.Lock()
+        self.slow: Deque[SlowQuery] = deque(maxlen=ring_size)
+        self.fingerprints: Dict[str, _FingerprintStats] = {}
+        self.budget_warnings = 0
+        # fingerprint id -> bound metric children, so each statement skips label lookups
+        self.children: Dict[str, tuple] = {}
+
+    # ==================== ENGINE HOOKS ====================
+
+    def instrument(self, engine: Engine):
+        """Attach timing hooks to an engine (idempotent)"""
+        if event.contains(engine, "before_cursor_execute", self._before):
+            return
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    # The start time lives on the execution context, so a statement that
+    # raises (and never reaches _after) leaves nothing behind on the connection
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._ains_query_start = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = context._ains_query_start
+        self.record(statement, parameters, time.perf_counter() - started, executemany)
+
+    def record(self, statement: str, parameters: Any, seconds: float, executemany: bool = False):
+        """Account for one executed statement"""
+        fp = fingerprint(statement)
+        children = self.children.get(fp.id)
+        if children is None:
+            children = (
+                db_queries_total.labels(query_type=fp.query_type, table=fp.table),
+                db_query_duration_seconds.labels(query_type=fp.query_type),
+                db_query_time_seconds_total.labels(fingerprint=fp.id, query_type=fp.query_type)
+            )
+            if len(self.children) < self.max_fingerprints:
+                self.children[fp.id] = children
+        total, duration, fingerprint_time = children
+        total.inc()
+        duration.observe(seconds)
+        fingerprint_time.inc(seconds)
+
+        request = _current_request.get()
+        if request is not None:
+            request.count += 1
+            request.seconds += seconds
+            request.fingerprints[fp.id] = request.fingerprints.get(fp.id, 0) + 1
+
+        with self.lock:
+            stats = self.fingerprints.get(fp.id)
+            if stats is None and len(self.fingerprints) < self.max_fingerprints:
+                stats = self.fingerprints[fp.id] = _FingerprintStats(text=fp.text)
+            if stats is not None:
+                stats.count += 1
+                stats.total_seconds += seconds
+                stats.max_seconds = max(stats.max_seconds, seconds)
+
+            if seconds >= self.slow_threshold:
+                self.slow.append(SlowQuery(
+                    fingerprint_id=fp.id,
+                    statement=fp.text,
+                    duration_ms=round(seconds * 1000, 3),
+                    parameters=redact(parameters),
+                    endpoint=request.endpoint if request else None,
+                    executemany=executemany,
+                    at=datetime.now(timezone.utc).isoformat()
+                ))
+
+    # ==================== PER-REQUEST BUDGET ====================
+
+    def begin_request(self, endpoint: str):
+        """Start counting statements for the current request context"""
+        return _current_request.set(RequestQueries(endpoint=endpoint))
+
+    def end_request(self, token, method: str = "") -> Optional[RequestQueries]:
+        """Stop counting and warn if the request went over budget"""
+        request = _current_request.get()
+        _current_request.reset(token)
+        if request is None:
+            return None
+        if self.query_budget and request.count > self.query_budget:
+            with self.lock:
+                self.budget_warnings += 1
+                top = sorted(request.fingerprints.items(), key=lambda item: -item[1])[:3]
+                repeated = ", ".join(
+                    f"{count}x {self.fingerprints[fp_id].text[:80] if fp_id in self.fingerprints else fp_id}"
+                    for fp_id, count in top
+                )
+            db_query_budget_exceeded_total.labels(endpoint=request.endpoint).inc()
+            print(f"⚠️  {method} {request.endpoint} ran {request.count} queries "
+                  f"(budget {self.query_budget}, {request.seconds * 1000:.1f}ms): {repeated}")
+        return request
+
+    # ==================== REPORTING ====================
+
+    def slow_queries(self, limit: int = 50, threshold_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Slowest statements in the ring buffer, slowest first"""
+        with self.lock:
+            entries = list(self.slow)
+        if threshold_ms is not None:
+            entries = [entry for entry in entries if entry.duration_ms >= threshold_ms]
+        entries.sort(key=lambda entry: -entry.duration_ms)
+        return [entry.__dict__.copy() for entry in entries[:limit]]
+
+    def top_fingerprints(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Fingerprints by total time spent"""
+        with self.lock:
+            items = sorted(self.fingerprints.items(), key=lambda item: -item[1].total_seconds)[:limit]
+            return [
+                {
+                    "fingerprint_id": fp_id,
+                    "statement": stats.text,
+                    "count": stats.count,
+                    "total_ms": round(stats.total_seconds * 1000, 3),
+                    "mean_ms": round(stats.total_seconds * 1000 / stats.count, 3),
+                    "max_ms": round(stats.max_seconds * 1000, 3)
+                }
+                for fp_id, stats in items
+            ]
+
+    def reset(self):
+        with self.lock:
+            self.slow.clear()
+            self.fingerprints.clear()
+            self.budget_warnings = 0
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+fingerprint_selector = TopKSelector(
+    int(os.getenv("AINS_METRICS_MAX_QUERY_FINGERPRINTS", "50")), METRICS_TOPK_REFRESH_SECONDS
+)
+
+db_query_time_seconds_total = BoundedCounter(
+    'ains_db_query_time_seconds_total',
+    'Time spent executing statements, per normalized statement fingerprint',
+    ['fingerprint', 'query_type'],
+    key_label='fingerprint',
+    selector=fingerprint_selector
+)
+
+db_query_budget_exceeded_total = BoundedCounter(
+    'ains_db_query_budget_exceeded_total',
+    'Requests that issued more statements than AINS_QUERY_BUDGET',
+    ['endpoint'],
+    key_label='endpoint',
+    selector=TopKSelector(100, METRICS_TOPK_REFRESH_SECONDS)
+)
+
+# Global query stats instance
+query_stats = QueryStats(
+    slow_threshold_ms=float(os.getenv("AINS_SLOW_QUERY_MS", "100")),
+    ring_size=int(os.getenv("AINS_SLOW_QUERY_BUFFER", "200")),
+    query_budget=int(os.getenv("AINS_QUERY_BUDGET", "50"))
+)
@@ -0,0 +1,146 @@
+"""AINS Keyset Pagination
+
+Opaque cursors over indexed sort keys (e.g. (created_at, task_id)) so deep
+pages cost the same as the first one, plus optional exact/estimated totals.
+Offset pagination keeps working for older clients.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query, Session
+
+
+COUNT_MODE_PATTERN = "^(exact|estimated|none)$"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode sort-key values into an opaque, URL-safe cursor"""
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or has the wrong number of keys
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError("Invalid cursor: sort key mismatch")
+
+    values = []
+    for value in payload:
+        if isinstance(value, dict):
+            try:
+                value = datetime.fromisoformat(value["dt"])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid cursor: bad datetime key ({e})")
+        elif isinstance(value, list):
+            raise ValueError("Invalid cursor: sort keys must be scalars")
+        values.append(value)
+    return values
+
+
+def keyset_page(
+    query: Query,
+    columns: List[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    descending: bool = True
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page ordered by columns, resuming after cursor.
+
+    The last column must be unique (typically the primary key) so the order
+    is total. When no cursor is given, offset is honoured for backward
+    compatibility.
+
+    Args:
+        query: Filtered query (without ORDER BY/LIMIT/OFFSET)
+        columns: Sort key columns, e.g. [Task.created_at, Task.task_id]
+        limit: Page size
+        cursor: Cursor returned with the previous page
+        offset: Legacy offset, ignored when cursor is given
+        descending: Sort direction for every key column
+
+    Returns:
+        (rows, next_cursor) - next_cursor is None on the last page
+    """
+    order = [column.desc() if descending else column.asc() for column in columns]
+
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        query = query.filter(_after(columns, values, descending)).order_by(*order)
+    else:
+        query = query.order_by(*order).offset(offset)
+
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    return rows, next_cursor
+
+
+def _after(columns: List[Any], values: List[Any], descending: bool):
+    """Expanded row-value comparison: (a, b) < (x, y) as a < x OR (a = x AND b < y)"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def count_rows(db: Session, query: Query, mode: str = "exact") -> Optional[int]:
+    """
+    Count rows matching query.
+
+    Args:
+        db: Database session
+        query: Filtered query
+        mode: exact (COUNT(*)), estimated (planner estimate where the
+              database offers one, otherwise exact) or none
+
+    Returns:
+        Row count, or None when mode is none
+    """
+    if mode == "none":
+        return None
+    if mode == "estimated":
+        estimate = estimate_rows(db, query)
+        if estimate is not None:
+            return estimate
+    return query.order_by(None).count()
+
+
+def estimate_rows(db: Session, query: Query) -> Optional[int]:
+    """Planner row estimate via EXPLAIN (PostgreSQL only)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+
+    compiled = query.order_by(None).statement.compile(dialect=db.get_bind().dialect)
+    result = db.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return int(plan[0]["Plan"]["Plan Rows"])
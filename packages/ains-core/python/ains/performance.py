@@ -1,71 +1,95 @@
 """Performance monitoring and optimization utilities"""
+import os
+import time
+import threading
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from sqlalchemy import func, text, case, and_
 
 from .db import Task, Agent, Capability
+from .retention import RetentionEngine, get_retention_engine
+from .observability.query_stats import QueryStats, query_stats
+
+
+def duration_seconds(db: Session, start, end):
+    """
+    Portable SQL expression for (end - start) in seconds.
+    
+    Args:
+        db: Database session (used to pick the dialect)
+        start: Start timestamp column
+        end: End timestamp column
+    
+    Returns:
+        SQL expression evaluating to seconds
+    """
+    dialect = db.get_bind().dialect.name
+    
+    if dialect == "postgresql":
+        return func.extract("epoch", end - start)
+    if dialect in ("mysql", "mariadb"):
+        return func.timestampdiff(text("SECOND"), start, end)
+    # SQLite stores timestamps as text; julianday() returns fractional days
+    return (func.julianday(end) - func.julianday(start)) * 86400
 
 
 def get_system_stats(db: Session) -> Dict[str, Any]:
     """
     Get system-wide performance statistics.
     
+    Task counters come from a single GROUP BY status query with conditional
+    aggregates instead of one COUNT per metric.
+    
     Returns:
         Dict with various performance metrics
     """
     now = datetime.now(timezone.utc)
     one_hour_ago = now - timedelta(hours=1)
     
-    # Task statistics
-    total_tasks = db.query(func.count(Task.task_id)).scalar()
-    pending_tasks = db.query(func.count(Task.task_id)).filter(
-        Task.status == 'PENDING'
-    ).scalar()
-    active_tasks = db.query(func.count(Task.task_id)).filter(
-        Task.status.in_(['ASSIGNED', 'ACTIVE'])
-    ).scalar()
-    completed_tasks = db.query(func.count(Task.task_id)).filter(
-        Task.status == 'COMPLETED'
-    ).scalar()
-    
-    # Recent task throughput (last hour)
-    tasks_last_hour = db.query(func.count(Task.task_id)).filter(
-        Task.created_at >= one_hour_ago
-    ).scalar()
-    
-    completed_last_hour = db.query(func.count(Task.task_id)).filter(
-        Task.completed_at >= one_hour_ago,
-        Task.status == 'COMPLETED'
-    ).scalar()
-    
-    # Average task completion time (last 100 completed tasks)
-    avg_completion_time = db.query(
-        func.avg(
-            func.julianday(Task.completed_at) - func.julianday(Task.created_at)
-        ) * 86400  # Convert days to seconds
-    ).filter(
-        Task.status == 'COMPLETED',
-        Task.completed_at.isnot(None)
-    ).limit(100).scalar()
+    completed = Task.status == 'COMPLETED'
+    finished = and_(completed, Task.completed_at.isnot(None))
+    
+    rows = db.query(
+        Task.status,
+        func.count(Task.task_id),
+        func.sum(case((Task.created_at >= one_hour_ago, 1), else_=0)),
+        func.sum(case((and_(completed, Task.completed_at >= one_hour_ago), 1), else_=0)),
+        func.sum(case((finished, duration_seconds(db, Task.created_at, Task.completed_at)), else_=None)),
+        func.sum(case((finished, 1), else_=0)),
+    ).group_by(Task.status).all()
+    
+    by_status = {}
+    tasks_last_hour = completed_last_hour = 0
+    duration_total = 0.0
+    duration_count = 0
+    for status, count, created_recent, completed_recent, durations, finished_count in rows:
+        by_status[status] = count
+        tasks_last_hour += created_recent or 0
+        completed_last_hour += completed_recent or 0
+        duration_total += float(durations or 0)
+        duration_count += finished_count or 0
+    
+    avg_completion_time = duration_total / duration_count if duration_count else None
     
     # Agent statistics
-    total_agents = db.query(func.count(Agent.agent_id)).scalar()
-    active_agents = db.query(func.count(Agent.agent_id)).scalar()
- 
+    total_agents, active_agents = db.query(
+        func.count(Agent.agent_id),
+        func.sum(case((Agent.status != 'INACTIVE', 1), else_=0))
+    ).one()
     
     # Capability statistics
     total_capabilities = db.query(func.count(Capability.capability_id)).scalar()
     
     return {
         "tasks": {
-            "total": total_tasks or 0,
-            "pending": pending_tasks or 0,
-            "active": active_tasks or 0,
-            "completed": completed_tasks or 0,
-            "throughput_last_hour": tasks_last_hour or 0,
-            "completed_last_hour": completed_last_hour or 0,
-            "avg_completion_time_seconds": float(avg_completion_time) if avg_completion_time else None
+            "total": sum(by_status.values()),
+            "pending": by_status.get('PENDING', 0),
+            "active": by_status.get('ASSIGNED', 0) + by_status.get('ACTIVE', 0),
+            "completed": by_status.get('COMPLETED', 0),
+            "throughput_last_hour": tasks_last_hour,
+            "completed_last_hour": completed_last_hour,
+            "avg_completion_time_seconds": avg_completion_time
         },
         "agents": {
             "total": total_agents or 0,
@@ -78,23 +102,73 @@ def get_system_stats(db: Session) -> Dict[str, Any]:
     }
 
 
-def get_slow_queries(db: Session, threshold_seconds: float = 1.0) -> list:
+class StatsSnapshot:
+    """
+    Short-TTL snapshot of get_system_stats.
+    
+    Concurrent callers share one computation: whoever finds the snapshot
+    stale recomputes it while holding the lock, and everyone queued behind
+    them reuses the fresh result.
+    """
+    
+    def __init__(self, ttl_seconds: float = 2.0):
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.stats: Optional[Dict[str, Any]] = None
+        self.computed_at = 0.0
+    
+    def _fresh(self) -> bool:
+        return self.stats is not None and time.monotonic() - self.computed_at < self.ttl_seconds
+    
+    def get(self, db: Session) -> Dict[str, Any]:
+        """Return the current snapshot, recomputing it if it has expired"""
+        if self._fresh():
+            return self.stats
+        
+        with self.lock:
+            if not self._fresh():
+                self.stats = get_system_stats(db)
+                self.computed_at = time.monotonic()
+            return self.stats
+    
+    def invalidate(self):
+        """Force the next caller to recompute"""
+        self.stats = None
+
+
+# Global stats snapshot instance
+stats_snapshot = StatsSnapshot(ttl_seconds=float(os.getenv("AINS_STATS_TTL_SECONDS", "2")))
+
+
+def get_slow_queries(
+    threshold_seconds: Optional[float] = None,
+    limit: int = 50,
+    stats: Optional[QueryStats] = None
+) -> Dict[str, Any]:
     """
-    Identify slow queries (for monitoring).
+    Slowest recent statements and the most expensive statement fingerprints.
     
-    This is a placeholder - in production you'd use query logging
-    and analysis tools.
+    Statements are timed by the cursor-execute hooks on the engine; the
+    slow log is a ring buffer of statements over AINS_SLOW_QUERY_MS, with
+    bound parameters redacted to their types.
     
     Args:
-        db: Database session
-        threshold_seconds: Threshold for slow queries
+        threshold_seconds: Only return entries at least this slow
+        limit: Maximum entries per list
+        stats: Query stats to read (defaults to the global instance)
     
     Returns:
-        List of slow query info
+        Dict with slow_queries, top_fingerprints and the active thresholds
     """
-    # In production, this would analyze query logs
-    # For now, return empty list
-    return []
+    stats = stats or query_stats
+    threshold_ms = threshold_seconds * 1000 if threshold_seconds is not None else None
+    return {
+        "slow_queries": stats.slow_queries(limit=limit, threshold_ms=threshold_ms),
+        "top_fingerprints": stats.top_fingerprints(limit=limit),
+        "slow_threshold_ms": stats.slow_threshold * 1000,
+        "query_budget": stats.query_budget,
+        "budget_warnings": stats.budget_warnings
+    }
 
 
 def get_database_size(db: Session) -> Dict[str, Any]:
@@ -117,35 +191,47 @@ def get_database_size(db: Session) -> Dict[str, Any]:
     return stats
 
 
-def cleanup_old_data(db: Session, days: int = 30) -> Dict[str, int]:
+def cleanup_old_data(db: Session, days: int = 30, engine: Optional[RetentionEngine] = None) -> Dict[str, Any]:
     """
     Clean up old completed/failed tasks and deliveries.
     
+    Rows are deleted in bounded chunks (optionally archived first) by the
+    retention engine, so cleanup never holds long locks.
+    
     Args:
         db: Database session
         days: Delete data older than this many days
+        engine: Retention engine (defaults to one configured from the environment)
     
     Returns:
-        Dict with deletion counts
+        Dict with deletion counts and per-job retention reports
     """
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    # Delete old completed/failed tasks
-    deleted_tasks = db.query(Task).filter(
-        Task.status.in_(['COMPLETED', 'FAILED', 'CANCELLED']),
-        Task.completed_at < cutoff_date
-    ).delete()
-    
-    # Delete old successful webhook deliveries
     from .db import WebhookDelivery
-    deleted_deliveries = db.query(WebhookDelivery).filter(
-        WebhookDelivery.status == 'success',
-        WebhookDelivery.delivered_at < cutoff_date
-    ).delete()
     
-    db.commit()
+    engine = engine or get_retention_engine()
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+    
+    # Old completed/failed tasks
+    tasks = engine.purge(
+        db, "tasks", Task, cutoff_date,
+        lambda cutoff: [
+            Task.status.in_(['COMPLETED', 'FAILED', 'CANCELLED']),
+            Task.completed_at < cutoff
+        ]
+    )
+    
+    # Old successful webhook deliveries
+    deliveries = engine.purge(
+        db, "webhook_deliveries", WebhookDelivery, cutoff_date,
+        lambda cutoff: [
+            WebhookDelivery.status == 'success',
+            WebhookDelivery.delivered_at < cutoff
+        ]
+    )
     
     return {
-        "deleted_tasks": deleted_tasks,
-        "deleted_deliveries": deleted_deliveries
+        "deleted_tasks": tasks["deleted"],
+        "deleted_deliveries": deliveries["deleted"],
+        "tasks": tasks,
+        "deliveries": deliveries
     }
@@ -0,0 +1,232 @@
+"""AINS Agent Push Channel
+
+Server-to-agent events (task assignments, cancellations, timeout changes,
+heartbeat acks) delivered over a WebSocket per agent, with Server-Sent
+Events as a fallback for clients that can't hold a socket.
+
+Every agent has a stream of numbered events and keeps a bounded replay
+buffer, so a client that reconnects with its last sequence number (and the
+hub epoch it saw in the hello message) receives what it missed. Each
+connection has its own bounded send queue: a consumer that falls behind is
+disconnected rather than buffered without limit, and catches up by resuming.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from . import task_events
+
+
+@dataclass
+class PushEvent:
+    """One event on an agent's stream (seq is None for connection-local messages)"""
+    type: str
+    data: Dict[str, Any]
+    seq: Optional[int] = None
+    ts: float = field(default_factory=time.time)
+
+    def to_dict(self, epoch: str) -> Dict[str, Any]:
+        return {"type": self.type, "seq": self.seq, "epoch": epoch, "ts": self.ts, "data": self.data}
+
+    def to_sse(self, epoch: str) -> str:
+        lines = []
+        if self.seq is not None:
+            lines.append(f"id: {epoch}:{self.seq}")
+        lines.append(f"event: {self.type}")
+        lines.append(f"data: {json.dumps(self.to_dict(epoch), default=str)}")
+        return "\n".join(lines) + "\n\n"
+
+
+class PushConnection:
+    """A connected client: bounded send queue owned by the event loop that serves it"""
+
+    def __init__(self, agent_id: str, max_queue: int):
+        self.agent_id = agent_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, event: PushEvent):
+        """Enqueue an event (loop thread only); a full queue drops the connection"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: stop sending and let it resume from its last seq
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def next_event(self, timeout: Optional[float] = None) -> Optional[PushEvent]:
+        """
+        Wait for the next event.
+
+        Returns:
+            The event, None when the connection overflowed
+
+        Raises:
+            asyncio.TimeoutError: If nothing arrived within timeout
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+
+
+class _AgentStream:
+    """Sequence counter, replay buffer and live connections of one agent"""
+
+    def __init__(self, buffer_size: int):
+        self.seq = 0
+        self.buffer: Deque[PushEvent] = deque(maxlen=buffer_size)
+        self.connections: Set[PushConnection] = set()
+
+
+class PushHub:
+    """Per-agent event streams with resumable delivery"""
+
+    def __init__(self, buffer_size: int = 256, max_queue: int = 100):
+        """
+        Args:
+            buffer_size: Events kept per agent for replay on reconnect
+            max_queue: Undelivered events a connection may hold before it is dropped
+        """
+        self.buffer_size = buffer_size
+        self.max_queue = max_queue
+        # Changes on restart so clients know old sequence numbers are void
+        self.epoch = uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+        self.streams: Dict[str, _AgentStream] = {}
+
+    def _stream(self, agent_id: str) -> _AgentStream:
+        stream = self.streams.get(agent_id)
+        if stream is None:
+            stream = self.streams[agent_id] = _AgentStream(self.buffer_size)
+        return stream
+
+    # ==================== PUBLISHING ====================
+
+    def publish(self, agent_id: str, event_type: str, data: Dict[str, Any]) -> PushEvent:
+        """
+        Append an event to the agent's stream and hand it to live connections.
+
+        Safe to call from any thread.
+        """
+        with self.lock:
+            stream = self._stream(agent_id)
+            stream.seq += 1
+            event = PushEvent(type=event_type, data=data, seq=stream.seq)
+            stream.buffer.append(event)
+            connections = list(stream.connections)
+
+        for connection in connections:
+            if not connection.loop.is_closed():
+                connection.loop.call_soon_threadsafe(connection.offer, event)
+        return event
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: push assignments and cancellations to the agent"""
+        if change.new_status == 'ASSIGNED' and change.assigned_agent_id and \
+                change.assigned_agent_id != change.old_assigned_agent_id:
+            self.publish(change.assigned_agent_id, "task.assigned", {
+                "task_id": change.task_id,
+                "capability": change.capability,
+                "priority": change.priority,
+                "client_id": change.client_id
+            })
+        elif change.new_status == 'CANCELLED' and change.old_status != 'CANCELLED':
+            agent_id = change.assigned_agent_id or change.old_assigned_agent_id
+            if agent_id:
+                self.publish(agent_id, "task.cancelled", {
+                    "task_id": change.task_id,
+                    "previous_status": change.old_status
+                })
+
+    # ==================== CONNECTIONS ====================
+
+    def connect(
+        self,
+        agent_id: str,
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None
+    ) -> Tuple[PushConnection, List[PushEvent], bool]:
+        """
+        Register a connection (from inside its event loop).
+
+        Args:
+            agent_id: Connecting agent
+            last_seq: Last sequence number the client processed
+            epoch: Hub epoch that sequence number belongs to
+
+        Returns:
+            (connection, events to replay, resync) - resync is True when
+            events were lost (buffer overrun or server restart) and the
+            agent should re-read its state, e.g. by leasing
+        """
+        connection = PushConnection(agent_id, self.max_queue)
+        with self.lock:
+            stream = self._stream(agent_id)
+            replay: List[PushEvent] = []
+            resync = False
+            if last_seq is not None:
+                if epoch is not None and epoch != self.epoch:
+                    resync = True
+                else:
+                    replay = [event for event in stream.buffer if event.seq > last_seq]
+                    oldest = stream.buffer[0].seq if stream.buffer else stream.seq + 1
+                    resync = last_seq > stream.seq or last_seq + 1 < oldest
+            # Registered under the lock, so nothing published is missed or repeated
+            stream.connections.add(connection)
+        return connection, replay, resync
+
+    def disconnect(self, connection: PushConnection):
+        with self.lock:
+            stream = self.streams.get(connection.agent_id)
+            if stream is not None:
+                stream.connections.discard(connection)
+
+    def is_connected(self, agent_id: str) -> bool:
+        with self.lock:
+            stream = self.streams.get(agent_id)
+            return bool(stream and stream.connections)
+
+    def hello(self, agent_id: str, resync: bool) -> PushEvent:
+        """Connection-local greeting carrying the epoch and current sequence"""
+        with self.lock:
+            seq = self._stream(agent_id).seq
+        return PushEvent(type="hello", data={"epoch": self.epoch, "seq": seq, "resync": resync})
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection and buffer counts"""
+        with self.lock:
+            return {
+                "epoch": self.epoch,
+                "agents_connected": sum(1 for s in self.streams.values() if s.connections),
+                "connections": sum(len(s.connections) for s in self.streams.values()),
+                "buffered_events": sum(len(s.buffer) for s in self.streams.values())
+            }
+
+
+def parse_last_event_id(value: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    """Split an SSE Last-Event-ID of the form "<epoch>:<seq>" """
+    if not value or ":" not in value:
+        return None, None
+    epoch, seq = value.rsplit(":", 1)
+    try:
+        return epoch, int(seq)
+    except ValueError:
+        return None, None
+
+
+# Global push hub instance
+push_hub = PushHub(
+    buffer_size=int(os.getenv("AINS_PUSH_BUFFER_SIZE", "256")),
+    max_queue=int(os.getenv("AINS_PUSH_QUEUE_SIZE", "100"))
+)
+task_events.subscribe(push_hub.on_task_change)
@@ -0,0 +1,219 @@
+"""AINS Result Cache
+
+Content-addressed results for deterministic capabilities (embeddings, OCR
+of the same file, the same report). Capabilities opt in with a TTL:
+AINS_RESULT_CACHE_CAPABILITIES="embedding=3600,ocr=86400" or
+PUT /aitp/result-cache/capabilities/{capability}.
+
+Submissions are keyed on (capability, client_id, published capability
+versions, SHA-256 of the canonical JSON of input_data), so a client only
+ever gets back its own tasks and results:
+
+- hit: a result completed within the TTL is returned at once, as the task
+  that produced it, without queueing new work
+- coalesced: an identical task of the same client still running is
+  returned instead of a copy
+- miss: the task is queued as usual and its result cached on completion
+
+Entries are in memory, bounded by AINS_RESULT_CACHE_MAX_ENTRIES and
+AINS_RESULT_CACHE_MAX_BYTES (serialized result size) with LRU eviction.
+A submission with metadata {"result_cache": false} skips the cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .fair_queue import INFLIGHT_STATUSES, parse_client_settings
+from . import task_events
+
+OPEN_STATUSES = ("PENDING",) + INFLIGHT_STATUSES
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def canonical_hash(data: Any) -> str:
+    """SHA-256 of data as canonical JSON (sorted keys, no whitespace)"""
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def capability_version(versions: Iterable[Optional[str]]) -> str:
+    """Versions a capability is published at, as one stable string"""
+    return ",".join(sorted({version or "" for version in versions}))
+
+
+@dataclass
+class _Entry:
+    response: Dict[str, Any]
+    size: int
+    expires_at: float
+
+
+class ResultCache:
+    """LRU of completed results plus the in-flight task for each key"""
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, float]] = None,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            policies: Capability (lowercase) -> TTL in seconds
+            max_entries: Most cached results
+            max_bytes: Most serialized result bytes
+            clock: Monotonic clock in seconds
+        """
+        self.policies = {k.lower(): v for k, v in (policies or {}).items()}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self.size = 0
+        # key -> running task, task_id -> (key, response template)
+        self.inflight: Dict[CacheKey, str] = {}
+        self.pending: Dict[str, Tuple[CacheKey, Dict[str, Any]]] = {}
+        self.counters = {"hit": 0, "coalesced": 0, "miss": 0, "stored": 0, "evicted": 0, "expired": 0}
+
+    # ==================== POLICY ====================
+
+    def set_policy(self, capability: str, ttl_seconds: Optional[float]):
+        """Cache a capability's results for ttl_seconds (None stops caching it)"""
+        with self.lock:
+            if ttl_seconds is None:
+                self.policies.pop(capability.lower(), None)
+            else:
+                self.policies[capability.lower()] = ttl_seconds
+
+    def ttl_for(self, capability: Optional[str]) -> Optional[float]:
+        return self.policies.get(capability.lower()) if capability else None
+
+    def key(self, capability: str, client_id: str, version: str, input_data: Any) -> CacheKey:
+        return (capability.lower(), client_id, version, canonical_hash(input_data))
+
+    # ==================== LOOKUP ====================
+
+    def lookup(self, key: CacheKey) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Find a cached result or a running task for a key.
+
+        Returns:
+            (cached response, None) on a hit, (None, task_id) if an identical
+            task is running, else (None, None)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires_at > self.clock():
+                    self.entries.move_to_end(key)
+                    return dict(entry.response), None
+                self._drop(key)
+                self.counters["expired"] += 1
+            return None, self.inflight.get(key)
+
+    def record(self, outcome: str):
+        """Count a lookup outcome: hit, coalesced or miss"""
+        with self.lock:
+            self.counters[outcome] += 1
+
+    def track(self, key: CacheKey, task_id: str, response: Dict[str, Any]):
+        """Remember a newly queued task so identical submissions coalesce onto it"""
+        with self.lock:
+            previous = self.inflight.get(key)
+            if previous is not None:
+                self.pending.pop(previous, None)
+            self.inflight[key] = task_id
+            self.pending[task_id] = (key, response)
+            # Tasks that finish outside update_task_status never complete(); stay bounded
+            while len(self.pending) > self.max_entries:
+                stale_id = next(iter(self.pending))
+                stale_key, _ = self.pending.pop(stale_id)
+                if self.inflight.get(stale_key) == stale_id:
+                    del self.inflight[stale_key]
+
+    def forget(self, task_id: str):
+        """Stop coalescing onto a task (it failed, was cancelled or deleted)"""
+        with self.lock:
+            key, _ = self.pending.pop(task_id, (None, None))
+            if key is not None and self.inflight.get(key) == task_id:
+                del self.inflight[key]
+
+    # ==================== STORAGE ====================
+
+    def complete(self, task_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Cache the result of a tracked task.
+
+        Args:
+            task_id: Completed task
+            fields: Response fields that changed on completion (status, result_data, ...)
+
+        Returns:
+            bool: True if a result was cached
+        """
+        with self.lock:
+            key, response = self.pending.pop(task_id, (None, None))
+            if key is None:
+                return False
+            if self.inflight.get(key) == task_id:
+                del self.inflight[key]
+        self.store(key, {**response, **fields})
+        return True
+
+    def store(self, key: CacheKey, response: Dict[str, Any]):
+        """Cache a completed task's response under a key"""
+        ttl = self.ttl_for(key[0])
+        if ttl is None:
+            return
+        size = len(json.dumps(response.get("result_data"), default=str))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self._drop(key)
+            self.entries[key] = _Entry(response, size, self.clock() + ttl)
+            self.size += size
+            self.counters["stored"] += 1
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.counters["evicted"] += 1
+
+    def _drop(self, key: CacheKey):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def on_task_change(self, change: task_events.TaskChange):
+        """task_events subscriber: stop coalescing onto tasks that ended without a result"""
+        if change.new_status not in OPEN_STATUSES and change.new_status != "COMPLETED":
+            self.forget(change.task_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.counters["hit"] + self.counters["coalesced"] + self.counters["miss"]
+            return {
+                "policies": dict(self.policies),
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "inflight": len(self.inflight),
+                "hit_rate": round(self.counters["hit"] / lookups, 4) if lookups else None,
+                **self.counters
+            }
+
+
+# Global result cache instance
+result_cache = ResultCache(
+    policies=parse_client_settings(os.getenv("AINS_RESULT_CACHE_CAPABILITIES")),
+    max_entries=int(os.getenv("AINS_RESULT_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("AINS_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+task_events.subscribe(result_cache.on_task_change)
@@ -0,0 +1,224 @@
+"""AINS Retention Engine
+
+Deletes expired rows in bounded chunks with pauses between them, optionally
+archiving each chunk to compressed NDJSON first. Progress is checkpointed so
+an interrupted run resumes with the same cutoff instead of starting over.
+"""
+
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Checkpoint file when neither AINS_RETENTION_CHECKPOINT nor AINS_ARCHIVE_DIR is set
+DEFAULT_CHECKPOINT_PATH = "./ains_retention_checkpoint.json"
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class RetentionEngine:
+    """Chunked, resumable, archiving deletes for retention jobs"""
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        pause_seconds: float = 0.05,
+        archive_dir: Optional[str] = None,
+        compression: str = "gzip",
+        checkpoint_path: Optional[str] = None
+    ):
+        """
+        Args:
+            chunk_size: Rows deleted per transaction
+            pause_seconds: Sleep between chunks so foreground queries get the locks
+            archive_dir: Write each chunk to NDJSON here before deleting (None disables)
+            compression: gzip or zstd (zstd needs the zstandard package)
+            checkpoint_path: JSON file recording in-flight jobs for resumption
+        """
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            print("⚠️  zstandard not installed, archiving with gzip")
+            compression = "gzip"
+
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.archive_dir = archive_dir
+        self.compression = compression
+        self.checkpoint_path = checkpoint_path or (
+            os.path.join(archive_dir, "retention_checkpoint.json") if archive_dir else None
+        )
+
+    # ==================== CHECKPOINTS ====================
+
+    def _load_checkpoints(self) -> Dict[str, Dict[str, Any]]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, job: str, state: Optional[Dict[str, Any]]):
+        if not self.checkpoint_path:
+            return
+        checkpoints = self._load_checkpoints()
+        if state is None:
+            checkpoints.pop(job, None)
+        else:
+            checkpoints[job] = state
+
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoints, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ==================== ARCHIVING ====================
+
+    def _archive_chunk(self, job: str, rows: List[Any], columns: List[str], key: str) -> str:
+        """Write rows to <archive_dir>/<job>/<first>-<last>.ndjson.<ext> atomically"""
+        directory = os.path.join(self.archive_dir, job)
+        os.makedirs(directory, exist_ok=True)
+
+        extension = "zst" if self.compression == "zstd" else "gz"
+        first, last = getattr(rows[0], key), getattr(rows[-1], key)
+        path = os.path.join(directory, f"{first}-{last}.ndjson.{extension}")
+
+        body = "".join(
+            json.dumps({column: getattr(row, column) for column in columns}, default=_json_default) + "\n"
+            for row in rows
+        ).encode()
+
+        if self.compression == "zstd":
+            data = zstandard.ZstdCompressor().compress(body)
+        else:
+            data = gzip.compress(body)
+
+        # Re-running a chunk after a crash rewrites the same file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    # ==================== PURGE ====================
+
+    def purge(
+        self,
+        db: Session,
+        job: str,
+        model,
+        cutoff: datetime,
+        filters,
+        max_chunks: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Delete rows of model matching filters(cutoff), chunk by chunk.
+
+        Args:
+            db: Database session
+            job: Job name (checkpoint key and archive subdirectory)
+            model: ORM model with a single-column primary key
+            cutoff: Retention cutoff; a resumed job keeps its original cutoff
+            filters: Callable returning filter clauses for a cutoff
+            max_chunks: Stop after this many chunks (None runs to completion)
+
+        Returns:
+            Dict with deleted/archived counts, chunks, seconds and rows_per_second
+        """
+        key_column = model.__mapper__.primary_key[0]
+        key = key_column.key
+        columns = [column.key for column in model.__mapper__.column_attrs]
+
+        state = self._load_checkpoints().get(job)
+        if state:
+            cutoff = datetime.fromisoformat(state["cutoff"])
+            print(f"♻️  Resuming retention job {job} ({state['deleted']} rows already deleted)")
+        else:
+            state = {"cutoff": cutoff.isoformat(), "last_key": None, "deleted": 0, "archived": 0}
+
+        clauses = filters(cutoff)
+        started = time.monotonic()
+        deleted = archived = chunks = 0
+
+        while max_chunks is None or chunks < max_chunks:
+            query = db.query(model).filter(*clauses)
+            if state["last_key"] is not None:
+                query = query.filter(key_column > state["last_key"])
+            rows = query.order_by(key_column).limit(self.chunk_size).all()
+            if not rows:
+                break
+
+            if self.archive_dir:
+                self._archive_chunk(job, rows, columns, key)
+                archived += len(rows)
+
+            ids = [getattr(row, key) for row in rows]
+            count = db.query(model).filter(key_column.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+
+            deleted += count
+            chunks += 1
+            state["last_key"] = ids[-1]
+            state["deleted"] += count
+            state["archived"] += len(rows) if self.archive_dir else 0
+            self._save_checkpoint(job, state)
+
+            if len(rows) < self.chunk_size:
+                break
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+        else:
+            # Stopped by max_chunks: leave the checkpoint for the next run
+            return self._report(job, deleted, archived, chunks, started, complete=False)
+
+        self._save_checkpoint(job, None)
+        return self._report(job, deleted, archived, chunks, started, complete=True)
+
+    def _report(self, job: str, deleted: int, archived: int, chunks: int, started: float, complete: bool) -> Dict[str, Any]:
+        seconds = time.monotonic() - started
+        rows_per_second = deleted / seconds if seconds > 0 else float(deleted)
+        if deleted:
+            print(f"🧹 {job}: deleted {deleted} rows in {chunks} chunks ({rows_per_second:.0f} rows/sec)")
+        return {
+            "deleted": deleted,
+            "archived": archived,
+            "chunks": chunks,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows_per_second, 1),
+            "complete": complete
+        }
+
+
+def get_retention_engine() -> RetentionEngine:
+    """
+    Retention engine configured from the environment.
+    
+    The checkpoint goes to AINS_RETENTION_CHECKPOINT, else next to the
+    archives in AINS_ARCHIVE_DIR, else DEFAULT_CHECKPOINT_PATH, so runs
+    that do not archive can resume too.
+    """
+    archive_dir = os.getenv("AINS_ARCHIVE_DIR") or None
+    checkpoint_path = os.getenv("AINS_RETENTION_CHECKPOINT") or (
+        os.path.join(archive_dir, "retention_checkpoint.json") if archive_dir else DEFAULT_CHECKPOINT_PATH
+    )
+    return RetentionEngine(
+        chunk_size=int(os.getenv("AINS_RETENTION_CHUNK_SIZE", "1000")),
+        pause_seconds=float(os.getenv("AINS_RETENTION_PAUSE_SECONDS", "0.05")),
+        archive_dir=archive_dir,
+        compression=os.getenv("AINS_ARCHIVE_COMPRESSION", "gzip"),
+        checkpoint_path=checkpoint_path
+    )
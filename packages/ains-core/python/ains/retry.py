@@ -6,15 +6,15 @@ from sqlalchemy.orm import Session
 from .db import Task
 
 
-def calculate_next_retry(retry_count: int, policy: str = "exponential") -> datetime:
-    """Calculate next retry time based on policy
+def retry_delay_seconds(retry_count: int, policy: str = "exponential") -> float:
+    """Backoff before a retry attempt
     
     Args:
         retry_count: Current retry attempt number (0-indexed)
         policy: Retry policy - "exponential", "linear", or "fixed"
     
     Returns:
-        datetime: When to retry next
+        float: Seconds to wait
     """
     if policy == "exponential":
         # 1s, 2s, 4s, 8s, 16s, 32s (capped at 60s)
@@ -29,7 +29,20 @@ def calculate_next_retry(retry_count: int, policy: str = "exponential") -> datet
         # Default to exponential
         delay_seconds = min(2 ** retry_count, 60)
     
-    return datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+    return float(delay_seconds)
+
+
+def calculate_next_retry(retry_count: int, policy: str = "exponential") -> datetime:
+    """Calculate next retry time based on policy
+    
+    Args:
+        retry_count: Current retry attempt number (0-indexed)
+        policy: Retry policy - "exponential", "linear", or "fixed"
+    
+    Returns:
+        datetime: When to retry next
+    """
+    return datetime.now(timezone.utc) + timedelta(seconds=retry_delay_seconds(retry_count, policy))
 
 
 def should_retry(task: Task, error_message: str) -> bool:
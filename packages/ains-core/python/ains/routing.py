@@ -5,6 +5,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
 from .db import Task, Agent, Capability, TrustRecord
+from .fair_queue import fair_queue
+from .load_index import load_index
+
+# Agent statuses that can take new tasks (heartbeats map to AVAILABLE/BUSY)
+ROUTABLE_STATUSES = ("AVAILABLE", "BUSY")
 
 
 def find_best_agent_for_task(
@@ -15,6 +20,8 @@ def find_best_agent_for_task(
     """
     Find the best agent to handle a task based on capability and trust score.
     
+    Agents without a free concurrency slot are skipped.
+    
     Args:
         db: Database session
         capability_required: Capability name required for the task
@@ -23,15 +30,14 @@ def find_best_agent_for_task(
     Returns:
         agent_id of the best agent, or None if no suitable agent found
     """
-    # Query agents that have the required capability and are ACTIVE
+    # Query agents that have the required capability and are online
     agents_with_capability = (
-        db.query(Agent.agent_id, TrustRecord.trust_score)
+        db.query(Agent.agent_id, Agent.trust_score)
         .join(Capability, Capability.agent_id == Agent.agent_id)
-        .outerjoin(TrustRecord, TrustRecord.agent_id == Agent.agent_id)
         .filter(
             and_(
                 Capability.name == capability_required,
-                Agent.status == "ACTIVE"
+                Agent.status.in_(ROUTABLE_STATUSES)
             )
         )
         .all()
@@ -40,11 +46,12 @@ def find_best_agent_for_task(
     if not agents_with_capability:
         return None
     
-    # Filter by minimum trust score and sort by trust score descending
+    # Filter by minimum trust score and free slots, sort by trust score descending
+    load_index.ensure_loaded(db)
     eligible_agents = [
-        (agent_id, trust_score or 0.0)  # Default to 0.0 if no trust record
+        (agent_id, trust_score or 0.0)  # Default to 0.0 if no trust score
         for agent_id, trust_score in agents_with_capability
-        if (trust_score or 0.0) >= min_trust_score
+        if (trust_score or 0.0) >= min_trust_score and load_index.free_slots(agent_id) > 0
     ]
     
     if not eligible_agents:
@@ -77,24 +84,75 @@ def assign_task_to_agent(
     if not task:
         return False
     
-    # Get trust score snapshot
-    trust_record = db.query(TrustRecord).filter(TrustRecord.agent_id == agent_id).first()
-    trust_score = trust_record.trust_score if trust_record else 0.0
+    assign_tasks_to_agent(db, [task], agent_id)
+    return True
+
+
+def assign_tasks_to_agent(db: Session, tasks: List[Task], agent_id: str) -> int:
+    """
+    Assign a batch of tasks to one agent in a single commit.
+    
+    Args:
+        db: Database session
+        tasks: Tasks to assign
+        agent_id: ID of the agent to assign to
     
-    # Update task
-    task.assigned_agent_id = agent_id
-    task.status = "ASSIGNED"
-    task.assigned_at = datetime.now(timezone.utc)
-    task.updated_at = datetime.now(timezone.utc)
+    Returns:
+        Number of tasks assigned
+    """
+    now = datetime.now(timezone.utc)
+    for task in tasks:
+        task.assigned_agent_id = agent_id
+        task.status = "ASSIGNED"
+        task.assigned_at = now
+        task.updated_at = now
     
     db.commit()
-    return True
+    return len(tasks)
+
+
+def _next_dispatchable(db: Session, capability: str, now: datetime) -> Optional[Task]:
+    """
+    Dequeue the next task of a capability that can still be dispatched.
+    
+    Expired tasks met on the way are marked FAILED ("Task expired"); the
+    caller commits them.
+    """
+    while True:
+        task_id = fair_queue.dequeue(capability)
+        if task_id is None:
+            return None
+        
+        task = db.get(Task, task_id)
+        if not task or task.status != "PENDING" or task.is_blocked:
+            fair_queue.release(task_id)
+            continue
+        
+        # Expired tasks are dropped from dispatch and failed, not left PENDING
+        if task.expires_at and _as_utc(task.expires_at) <= now:
+            fair_queue.release(task_id)
+            task.status = "FAILED"
+            task.error_message = "Task expired"
+            task.completed_at = now
+            task.updated_at = now
+            continue
+        
+        return task
 
 
 def route_pending_tasks(db: Session, limit: int = 10) -> int:
     """
     Route pending tasks to available agents.
     
+    Tasks are pulled from the fair queue engine, so priority bands and
+    tenants (client_id) get their weighted share of dispatch instead of
+    plain priority/created_at order. The chosen agent is given up to its
+    free concurrency slots of the capability's tasks in one commit.
+    
+    The agent is picked before anything is dequeued: a capability with no
+    agent available is skipped without charging its tenants' DRR deficits
+    or recording dispatch waits.
+    
     Args:
         db: Database session
         limit: Maximum number of tasks to route in one batch
@@ -102,38 +160,45 @@ def route_pending_tasks(db: Session, limit: int = 10) -> int:
     Returns:
         Number of tasks successfully routed
     """
-    # Get pending tasks that haven't expired
-    pending_tasks = (
-        db.query(Task)
-        .filter(
-            and_(
-                Task.status == "PENDING",
-                (Task.expires_at.is_(None) | (Task.expires_at > datetime.now(timezone.utc)))
-            )
-        )
-        .order_by(Task.priority.desc(), Task.created_at.asc())
-        .limit(limit)
-        .all()
-    )
-    
+    fair_queue.ensure_loaded(db)
+    now = datetime.now(timezone.utc)
     routed_count = 0
     
-    for task in pending_tasks:
-        # Find best agent for this task
-        best_agent = find_best_agent_for_task(
-            db,
-            capability_required=task.capability_required,
-            min_trust_score=0.5
-        )
+    for capability in fair_queue.capabilities():
+        while routed_count < limit:
+            # Find best agent for this capability
+            best_agent = find_best_agent_for_task(
+                db,
+                capability_required=capability,
+                min_trust_score=0.5
+            )
+            if not best_agent:
+                # No suitable agent right now - its tasks stay queued untouched
+                break
+            
+            # Fill the agent's free slots from the same capability
+            batch = []
+            slots = min(load_index.free_slots(best_agent), limit - routed_count)
+            while len(batch) < slots:
+                task = _next_dispatchable(db, capability, now)
+                if task is None:
+                    break
+                batch.append(task)
+            if not batch:
+                break
+            
+            routed_count += assign_tasks_to_agent(db, batch, best_agent)
         
-        if best_agent:
-            # Assign task to agent
-            success = assign_task_to_agent(db, task.task_id, best_agent)
-            if success:
-                routed_count += 1
-        else:
-            # No suitable agent found - could mark as FAILED or leave PENDING
-            # For now, leave as PENDING for retry
-            pass
+        if routed_count >= limit:
+            break
+    
+    # Expired tasks failed by _next_dispatchable outside an assignment
+    if db.dirty:
+        db.commit()
     
     return routed_count
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive timestamps (SQLite) as UTC"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
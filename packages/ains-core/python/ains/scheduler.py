@@ -6,6 +6,7 @@ from typing import Optional, Dict, List, Any
 from croniter import croniter
 from sqlalchemy.orm import Session
 
+from .pagination import keyset_page, count_rows
 from .db import (
     ScheduledTask, 
     ScheduleExecution, 
@@ -147,19 +148,26 @@ class TaskScheduler:
         client_id: Optional[str] = None,
         status: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        count: str = "exact"
     ) -> Dict[str, Any]:
         """
-        List scheduled tasks
+        List scheduled tasks, newest first
         
         Args:
             client_id: Filter by client ID
             status: Filter by status (ACTIVE, PAUSED, COMPLETED, FAILED)
             limit: Results limit
-            offset: Results offset
+            offset: Results offset (ignored when cursor is given)
+            cursor: Keyset cursor from a previous page's next_cursor
+            count: Total count mode (exact, estimated, none)
         
         Returns:
-            Dictionary with schedules list and total count
+            Dictionary with schedules list, total count and next_cursor
+        
+        Raises:
+            ValueError: If the cursor is invalid
         """
         query = self.db.query(ScheduledTask)
         
@@ -168,8 +176,13 @@ class TaskScheduler:
         if status:
             query = query.filter(ScheduledTask.status == status)
         
-        total = query.count()
-        schedules = query.offset(offset).limit(limit).all()
+        schedules, next_cursor = keyset_page(
+            query,
+            [ScheduledTask.created_at, ScheduledTask.schedule_id],
+            limit,
+            cursor=cursor,
+            offset=offset
+        )
         
         return {
             "schedules": [
@@ -186,9 +199,10 @@ class TaskScheduler:
                 }
                 for s in schedules
             ],
-            "total": total,
+            "total": count_rows(self.db, query, count),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
     
     def get_due_schedules(self) -> List[ScheduledTask]:
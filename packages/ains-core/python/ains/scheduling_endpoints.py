@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 
 from .db import get_db, ScheduledTask, ScheduleExecution
 from .scheduler import TaskScheduler, validate_cron_expression, get_next_run_time
+from .pagination import COUNT_MODE_PATTERN
 
 # Create router for scheduling endpoints
 router = APIRouter(prefix="/aitp/tasks", tags=["scheduling"])
@@ -46,17 +47,23 @@ def list_schedules(
     status: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """List scheduled tasks"""
+    """List scheduled tasks (keyset-paginated via cursor/next_cursor)"""
     try:
         scheduler = TaskScheduler(db)
         return scheduler.list_schedules(
             client_id=client_id,
             status=status,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor,
+            count=count
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list schedules: {str(e)}")
 
@@ -15,6 +15,7 @@ class AgentRegistration(BaseModel):
     public_key: str = Field(..., max_length=256)
     signature: str = Field(..., max_length=512)
     tags: Optional[List[str]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, le=1024, description="Concurrent tasks the agent accepts")
 
 
 class AgentResponse(BaseModel):
@@ -26,6 +27,7 @@ class AgentResponse(BaseModel):
     created_at: str
     trust_score: float
     tags: List[str] = []
+    max_concurrency: Optional[int] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -0,0 +1,422 @@
+"""AINS Agent Search Index
+
+In-memory inverted index over capability names, descriptions and tags.
+Replaces LIKE '%...%' scans on agent_capabilities with set intersections
+over token postings, sorted-vocabulary prefix lookups and trigram-based
+fuzzy matching.
+"""
+
+import heapq
+import os
+import re
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Optional, Dict, List, Set, Any, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from .db import Agent, Capability
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase alphanumeric tokens"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token: str) -> Set[str]:
+    """Padded character trigrams of a token"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AgentSearchIndex:
+    """
+    Inverted index for agent discovery.
+
+    Documents are agents; postings map tokens (from capability names,
+    descriptions and tags) to agent IDs. Each agent keeps its capability
+    name/price/latency tuples so results come back without touching the
+    database again.
+
+    Like the agent/capability join the index replaced, only agents with at
+    least one capability are returned. Tags come from the Agent.tags JSON
+    column, which registration writes (agent_tags rows are not).
+    """
+
+    def __init__(self, rebuild_seconds: Optional[float] = None, fuzzy_threshold: float = 0.4):
+        self.lock = threading.RLock()
+        self.rebuild_seconds = rebuild_seconds if rebuild_seconds is not None else float(
+            os.getenv("AINS_SEARCH_REBUILD_SECONDS", "300")
+        )
+        self.fuzzy_threshold = fuzzy_threshold
+        self.loaded_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self):
+        self.agents: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.vocab: List[str] = []
+        self.trigram_postings: Dict[str, Set[str]] = {}
+        self.tag_postings: Dict[str, Set[str]] = {}
+        self.capability_names: Dict[str, Set[str]] = {}
+        # (-trust_score, agent_id) ascending, i.e. most trusted first; agents
+        # without capabilities are indexed but not listed
+        self.trust_order: List[Tuple[float, str]] = []
+
+    # ==================== LOADING ====================
+
+    def ensure_loaded(self, db: Session):
+        """Build the index on first use and periodically thereafter"""
+        if self.loaded_at is not None and (
+            self.rebuild_seconds <= 0 or time.monotonic() - self.loaded_at < self.rebuild_seconds
+        ):
+            return
+        self.rebuild(db)
+
+    def rebuild(self, db: Session):
+        """Rebuild the index from the database in one pass"""
+        agents = db.query(Agent).options(selectinload(Agent.capabilities)).all()
+        self.load(agents)
+        print(f"🔎 Search index built: {len(self.agents)} agents, {len(self.postings)} tokens")
+
+    def load(self, agents: List[Agent]):
+        """Replace the index contents with agents whose capabilities are loaded"""
+        with self.lock:
+            self._reset()
+            for agent in agents:
+                self._add_agent(agent, agent.capabilities)
+            self.loaded_at = time.monotonic()
+
+    def refresh_agent(self, db: Session, agent_id: str):
+        """Reload a single agent (and its capabilities) from the database"""
+        if self.loaded_at is None:
+            return
+        agent = (
+            db.query(Agent)
+            .options(selectinload(Agent.capabilities))
+            .filter(Agent.agent_id == agent_id)
+            .first()
+        )
+        with self.lock:
+            self._remove_agent(agent_id)
+            if agent:
+                self._add_agent(agent, agent.capabilities)
+
+    # ==================== WRITES ====================
+
+    def add_agent(self, agent: Agent, capabilities: Optional[List[Capability]] = None):
+        """Index (or re-index) an agent"""
+        if self.loaded_at is None:
+            return
+        with self.lock:
+            self._remove_agent(agent.agent_id)
+            self._add_agent(agent, capabilities or [])
+
+    def add_capability(self, capability: Capability):
+        """Index a newly published capability"""
+        if self.loaded_at is None:
+            return
+        with self.lock:
+            doc = self.agents.get(capability.agent_id)
+            if doc is None:
+                return
+            self._index_capability(capability.agent_id, doc, capability)
+
+    def update_trust(self, agent_id: str, trust_score: float):
+        """Update an agent's trust score"""
+        with self.lock:
+            doc = self.agents.get(agent_id)
+            if doc is not None:
+                self._unlink_trust(doc)
+                doc["trust_score"] = float(trust_score)
+                if doc["capabilities"]:
+                    insort(self.trust_order, (-doc["trust_score"], agent_id))
+
+    def remove_agent(self, agent_id: str):
+        """Drop an agent from the index"""
+        with self.lock:
+            self._remove_agent(agent_id)
+
+    def _add_agent(self, agent: Agent, capabilities: List[Capability]):
+        doc = {
+            "agent_id": agent.agent_id,
+            "display_name": agent.display_name,
+            "trust_score": float(agent.trust_score or 0.0),
+            "tags": set(agent.tags or []),
+            "capabilities": [],
+            "tokens": set(),
+        }
+        self.agents[agent.agent_id] = doc
+
+        for tag in doc["tags"]:
+            self.tag_postings.setdefault(tag, set()).add(agent.agent_id)
+            for token in tokenize(tag):
+                self._add_token(agent.agent_id, doc, token)
+
+        for capability in capabilities:
+            self._index_capability(agent.agent_id, doc, capability)
+
+    def _index_capability(self, agent_id: str, doc: Dict[str, Any], capability: Capability):
+        name = capability.name.lower()
+        price = float(capability.price) if capability.price is not None else None
+        latency = capability.latency_p99_ms
+        if not doc["capabilities"]:
+            insort(self.trust_order, (-doc["trust_score"], agent_id))
+        doc["capabilities"].append((capability.name, price, latency))
+        self.capability_names.setdefault(name, set()).add(agent_id)
+
+        for token in tokenize(capability.name) + tokenize(capability.description):
+            self._add_token(agent_id, doc, token)
+
+    def _add_token(self, agent_id: str, doc: Dict[str, Any], token: str):
+        if token in doc["tokens"]:
+            return
+        doc["tokens"].add(token)
+
+        agents = self.postings.get(token)
+        if agents is None:
+            agents = self.postings[token] = set()
+            insort(self.vocab, token)
+            for gram in trigrams(token):
+                self.trigram_postings.setdefault(gram, set()).add(token)
+        agents.add(agent_id)
+
+    def _remove_agent(self, agent_id: str):
+        doc = self.agents.pop(agent_id, None)
+        if doc is None:
+            return
+        self._unlink_trust(doc)
+
+        for tag in doc["tags"]:
+            self._discard(self.tag_postings, tag, agent_id)
+        for name, _, _ in doc["capabilities"]:
+            self._discard(self.capability_names, name.lower(), agent_id)
+
+        for token in doc["tokens"]:
+            agents = self.postings.get(token)
+            if agents is None:
+                continue
+            agents.discard(agent_id)
+            if not agents:
+                del self.postings[token]
+                del self.vocab[bisect_left(self.vocab, token)]
+                for gram in trigrams(token):
+                    self._discard(self.trigram_postings, gram, token)
+
+    def _unlink_trust(self, doc: Dict[str, Any]):
+        entry = (-doc["trust_score"], doc["agent_id"])
+        position = bisect_left(self.trust_order, entry)
+        if position < len(self.trust_order) and self.trust_order[position] == entry:
+            del self.trust_order[position]
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[str]], key: str, value: str):
+        values = postings.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del postings[key]
+
+    # ==================== QUERIES ====================
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocab, prefix)
+        end = bisect_left(self.vocab, prefix + "\uffff")
+        return self.vocab[start:end]
+
+    def _fuzzy_tokens(self, token: str) -> List[str]:
+        grams = trigrams(token)
+        overlap: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.trigram_postings.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        matches = []
+        for candidate, shared in overlap.items():
+            similarity = shared / (len(grams) + len(trigrams(candidate)) - shared)
+            if similarity >= self.fuzzy_threshold:
+                matches.append(candidate)
+        return matches
+
+    def _term_postings(self, term: str, fuzzy: bool) -> List[Set[str]]:
+        tokens = self._prefix_tokens(term)
+        if fuzzy:
+            tokens = tokens + self._fuzzy_tokens(term)
+        return [self.postings[token] for token in tokens]
+
+    @staticmethod
+    def _intersect(groups: List[List[Set[str]]]) -> Set[str]:
+        """AND together OR-groups, starting from the most selective"""
+        sized = sorted(groups, key=lambda group: sum(len(agents) for agents in group))
+        candidates: Set[str] = set().union(*sized[0])
+        for group in sized[1:]:
+            if not candidates:
+                break
+            if len(candidates) < sum(len(agents) for agents in group):
+                # Probe the small candidate set instead of materializing a large union
+                candidates = {
+                    agent_id for agent_id in candidates
+                    if any(agent_id in agents for agents in group)
+                }
+            else:
+                candidates &= set().union(*group)
+        return candidates
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        capability: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        min_trust: Optional[float] = None,
+        max_price: Optional[float] = None,
+        max_latency_ms: Optional[int] = None,
+        fuzzy: bool = False,
+        sort_by: str = "trust_score",
+        limit: int = 10,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Search indexed agents.
+
+        Args:
+            q: Free text; every term must prefix-match (or fuzzily match) a
+               token from the agent's capabilities or tags
+            capability: Substring of a capability name
+            tags: Agent must carry at least one of these tags
+            min_trust: Minimum trust score
+            max_price: Agent must offer a (matching) capability at or below this price
+            max_latency_ms: Agent must offer a (matching) capability at or below this p99 latency
+            fuzzy: Also match terms by trigram similarity
+            sort_by: trust_score, price or latency
+            limit: Page size
+            offset: Page offset
+
+        Returns:
+            (results, total)
+        """
+        with self.lock:
+            # Each group is an OR of posting sets; groups are ANDed together
+            groups: List[List[Set[str]]] = []
+
+            needle = capability.lower() if capability else None
+            if needle:
+                groups.append([
+                    agents for name, agents in self.capability_names.items() if needle in name
+                ])
+            if tags:
+                groups.append([self.tag_postings[tag] for tag in tags if tag in self.tag_postings])
+            for term in tokenize(q):
+                groups.append(self._term_postings(term, fuzzy))
+
+            candidates = self._intersect(groups) if groups else None
+            if candidates is not None:
+                candidates = {agent_id for agent_id in candidates if self.agents[agent_id]["capabilities"]}
+            cap_filtered = needle or max_price is not None or max_latency_ms is not None
+
+            if not cap_filtered and sort_by not in ("price", "latency"):
+                page, total = self._page_by_trust(candidates, min_trust, limit, offset)
+            else:
+                page, total = self._page_by_scan(
+                    candidates, needle, min_trust, max_price, max_latency_ms, sort_by, limit, offset
+                )
+
+            results = [
+                {
+                    "agent_id": doc["agent_id"],
+                    "display_name": doc["display_name"],
+                    "trust_score": doc["trust_score"],
+                    "capabilities": [cap[0] for cap in doc["capabilities"]],
+                }
+                for doc in page
+            ]
+            return results, total
+
+    def _page_by_trust(
+        self,
+        candidates: Optional[Set[str]],
+        min_trust: Optional[float],
+        limit: int,
+        offset: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Page through trust_order without sorting the matches"""
+        order = self.trust_order
+        cutoff = bisect_right(order, (-min_trust, "\uffff")) if min_trust else len(order)
+
+        if candidates is None:
+            return [self.agents[agent_id] for _, agent_id in order[offset:min(offset + limit, cutoff)]], cutoff
+
+        if min_trust:
+            total = sum(1 for agent_id in candidates if self.agents[agent_id]["trust_score"] >= min_trust)
+        else:
+            total = len(candidates)
+
+        if len(candidates) * 8 < cutoff:
+            # Sparse matches: sorting them is cheaper than walking the order
+            docs = [self.agents[agent_id] for agent_id in candidates]
+            if min_trust:
+                docs = [doc for doc in docs if doc["trust_score"] >= min_trust]
+            page = heapq.nsmallest(offset + limit, docs, key=lambda doc: (-doc["trust_score"], doc["agent_id"]))
+            return page[offset:], total
+
+        page = []
+        for _, agent_id in order[:cutoff]:
+            if agent_id in candidates:
+                page.append(self.agents[agent_id])
+                if len(page) == offset + limit:
+                    break
+        return page[offset:], total
+
+    def _page_by_scan(
+        self,
+        candidates: Optional[Set[str]],
+        needle: Optional[str],
+        min_trust: Optional[float],
+        max_price: Optional[float],
+        max_latency_ms: Optional[int],
+        sort_by: str,
+        limit: int,
+        offset: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Filter on per-capability price/latency and sort the matches"""
+        hits = []
+        for agent_id in (self.agents.keys() if candidates is None else candidates):
+            doc = self.agents[agent_id]
+            if min_trust and doc["trust_score"] < min_trust:
+                continue
+
+            caps = doc["capabilities"]
+            if needle:
+                caps = [cap for cap in caps if needle in cap[0].lower()]
+            if max_price is not None:
+                caps = [cap for cap in caps if cap[1] is not None and cap[1] <= max_price]
+            if max_latency_ms is not None:
+                caps = [cap for cap in caps if cap[2] is not None and cap[2] <= max_latency_ms]
+            if not caps:
+                continue
+
+            prices = [cap[1] for cap in caps if cap[1] is not None]
+            latencies = [cap[2] for cap in caps if cap[2] is not None]
+            hits.append((
+                doc,
+                min(prices) if prices else None,
+                min(latencies) if latencies else None,
+            ))
+
+        if sort_by == "price":
+            key = lambda hit: (hit[1] is None, hit[1] or 0.0)
+        elif sort_by == "latency":
+            key = lambda hit: (hit[2] is None, hit[2] or 0)
+        else:
+            key = lambda hit: -hit[0]["trust_score"]
+        page = heapq.nsmallest(offset + limit, hits, key=key)[offset:]
+        return [doc for doc, _, _ in page], len(hits)
+
+
+# Global search index instance
+search_index = AgentSearchIndex()
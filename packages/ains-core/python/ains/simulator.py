@@ -0,0 +1,709 @@
+"""AINS scheduling simulator
+
+Discrete-event simulation of task dispatch on a virtual clock, for comparing
+scheduling policies before rolling them out. No database, API or wall-clock
+waiting is involved: a million tasks take 10-45 seconds per policy (about
+2.5 minutes for all seven) instead of days of real dispatch. Pass
+--policies to time only the ones being compared.
+
+The simulation runs the production scheduling logic against in-memory
+agents and tasks:
+
+- lease policies (agents pull work when a slot frees up): "fifo",
+  "priority" (aged priority, the ordering fair_queue uses inside a tenant)
+  and "fair_queue" (FairQueueEngine: priority bands, tenant DRR, caps)
+- routing policies (tasks are pushed to an agent on arrival): the
+  advanced_features rules "round_robin", "trust_weighted" and
+  "fastest_response", and "least_loaded" on a load_index.LoadIndex
+- failures go through retry.should_retry and retry_delay_seconds; tasks
+  that outrun timeout_seconds fail with timeouts.timeout_error
+
+Agents have lognormal latency, a failure rate and a number of slots;
+clients submit Poisson arrivals with their own share and priority range.
+Every policy sees the same arrivals and task sizes for a given seed.
+
+    python -m ains.simulator --tasks 1000000 --policies fifo,fair_queue,least_loaded
+
+Each policy reports queue wait and end-to-end latency percentiles, makespan,
+throughput, slot utilization, retries, and Jain's fairness index over the
+clients' mean queue waits (1.0 = every client waits equally long).
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from bisect import bisect
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .advanced_features import (
+    pick_fastest_response,
+    pick_round_robin,
+    pick_trust_weighted
+)
+from .fair_queue import DEFAULT_WEIGHTS, FairQueueEngine
+from .load_index import LoadIndex
+from .retry import retry_delay_seconds, should_retry
+from .timeouts import timeout_error
+
+LEASE_POLICIES = ("fifo", "priority", "fair_queue")
+ROUTING_POLICIES = ("round_robin", "least_loaded", "trust_weighted", "fastest_response")
+POLICIES = LEASE_POLICIES + ROUTING_POLICIES
+
+# Virtual time 0 as a wall-clock instant, for code that works on datetimes
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+RETRYABLE_ERROR = "connection reset by peer"
+NON_RETRYABLE_ERROR = "validation error: malformed input"
+
+# Event kinds
+_ARRIVAL, _FINISH, _RETRY = 0, 1, 2
+
+
+# ============================================================================
+# SCENARIO
+# ============================================================================
+
+@dataclass
+class AgentProfile:
+    """A group of identical simulated agents"""
+    name: str
+    count: int
+    capabilities: List[str]
+    latency_median: float = 1.0
+    latency_sigma: float = 0.5
+    failure_rate: float = 0.0
+    concurrency: int = 5
+    trust_score: float = 0.5
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency_median * math.exp(self.latency_sigma ** 2 / 2)
+
+
+@dataclass
+class ClientProfile:
+    """A tenant submitting tasks"""
+    client_id: str
+    share: float = 1.0
+    priority_range: Tuple[int, int] = (1, 10)
+    weight: Optional[float] = None
+    max_concurrency: Optional[int] = None
+
+
+@dataclass
+class Scenario:
+    """Fleet, workload and failure model shared by every simulated policy"""
+    agents: List[AgentProfile]
+    clients: List[ClientProfile]
+    tasks: int = 100_000
+    load: float = 0.9
+    capability_mix: Optional[Dict[str, float]] = None
+    timeout_seconds: Optional[float] = 30.0
+    max_retries: int = 3
+    retry_policy: str = "exponential"
+    non_retryable_rate: float = 0.1
+    aging_seconds: float = 300.0
+    band_weights: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_WEIGHTS))
+    seed: int = 1
+
+    def capacity(self) -> float:
+        """Tasks per second the fleet completes with every slot busy"""
+        return sum(p.count * p.concurrency / p.mean_latency for p in self.agents)
+
+    def arrival_rate(self) -> float:
+        return self.load * self.capacity()
+
+    def mix(self) -> Dict[str, float]:
+        """Capability mix: as configured, else proportional to fleet capacity"""
+        if self.capability_mix:
+            return dict(self.capability_mix)
+        mix: Dict[str, float] = {}
+        for p in self.agents:
+            for capability in p.capabilities:
+                share = p.count * p.concurrency / p.mean_latency / len(p.capabilities)
+                mix[capability] = mix.get(capability, 0.0) + share
+        return mix
+
+
+def default_scenario(tasks: int = 100_000, agents: int = 100, clients: int = 8, **overrides) -> Scenario:
+    """
+    A mixed fleet and tenant population.
+
+    Args:
+        tasks: Tasks to submit
+        agents: Fleet size: 80% fast, 15% slow, 5% flaky agents
+        clients: Small tenants next to one bulk and one interactive client
+        **overrides: Other Scenario fields
+
+    Returns:
+        Scenario
+    """
+    slow = max(1, agents * 15 // 100)
+    flaky = max(1, agents * 5 // 100)
+    fleet = [
+        AgentProfile("fast", max(1, agents - slow - flaky), ["text", "code"],
+                     latency_median=0.5, latency_sigma=0.5, failure_rate=0.01, concurrency=4, trust_score=0.8),
+        AgentProfile("slow", slow, ["text"],
+                     latency_median=3.0, latency_sigma=0.8, failure_rate=0.05, concurrency=4, trust_score=0.6),
+        AgentProfile("flaky", flaky, ["code", "image"],
+                     latency_median=1.0, latency_sigma=1.0, failure_rate=0.3, concurrency=4, trust_score=0.2),
+    ]
+    tenants = [
+        ClientProfile("bulk", share=0.6, priority_range=(1, 4)),
+        ClientProfile("interactive", share=0.1, priority_range=(7, 10)),
+    ]
+    tenants += [
+        ClientProfile(f"tenant-{i}", share=0.3 / clients, priority_range=(3, 8))
+        for i in range(clients)
+    ]
+    return Scenario(agents=fleet, clients=tenants, tasks=tasks, **overrides)
+
+
+# ============================================================================
+# SIMULATED ENTITIES
+# ============================================================================
+
+class SimTask:
+    """A task; duck-types the Task fields retry.should_retry reads"""
+
+    __slots__ = ("task_id", "client_id", "capability", "priority", "created_at",
+                 "ready_at", "size", "retry_count", "max_retries", "retry_policy", "wait")
+
+    def __init__(self, task_id, client_id, capability, priority, created_at, size, max_retries, retry_policy):
+        self.task_id = task_id
+        self.client_id = client_id
+        self.capability = capability
+        self.priority = priority
+        self.created_at = created_at
+        self.ready_at = created_at
+        self.size = size  # standard normal draw, scaled by the agent's latency
+        self.retry_count = 0
+        self.max_retries = max_retries
+        self.retry_policy = retry_policy
+        self.wait = 0.0
+
+
+class SimAgent:
+    """An agent; duck-types the Agent fields the routing rules read"""
+
+    __slots__ = ("agent_id", "profile", "tags", "trust_score", "last_assigned_at",
+                 "avg_completion_time_seconds", "total_tasks_completed", "total_tasks_failed",
+                 "free", "backlog", "idle_in", "busy_seconds", "log_median", "sigma")
+
+    def __init__(self, agent_id: str, profile: AgentProfile):
+        self.agent_id = agent_id
+        self.profile = profile
+        self.tags = profile.capabilities
+        self.trust_score = profile.trust_score
+        self.last_assigned_at: Optional[datetime] = None
+        self.avg_completion_time_seconds: Optional[float] = None
+        self.total_tasks_completed = 0
+        self.total_tasks_failed = 0
+        self.free = profile.concurrency
+        self.backlog: Deque[SimTask] = deque()  # routed but not started
+        self.idle_in: set = set()  # capabilities whose idle list holds this agent
+        self.busy_seconds = 0.0
+        self.log_median = math.log(profile.latency_median)
+        self.sigma = profile.latency_sigma
+
+    def record(self, success: bool, seconds: float):
+        """Mirror trust_system.update_agent_metrics_on_task_completion"""
+        if success:
+            self.total_tasks_completed += 1
+            self.trust_score = min(1.0, self.trust_score + 0.02)
+            if self.avg_completion_time_seconds:
+                # Weighted average (70% old, 30% new)
+                self.avg_completion_time_seconds = self.avg_completion_time_seconds * 0.7 + seconds * 0.3
+            else:
+                self.avg_completion_time_seconds = seconds
+        else:
+            self.total_tasks_failed += 1
+            self.trust_score = max(0.0, self.trust_score - 0.05)
+
+
+# ============================================================================
+# LEASE QUEUES
+# ============================================================================
+
+class _FifoQueue:
+    # Whether a release can make a queued task dispatchable (tenant caps)
+    capped = False
+
+    def __init__(self, scenario: Scenario, clock):
+        self.queues: Dict[str, Deque[SimTask]] = {}
+
+    def push(self, task: SimTask):
+        queue = self.queues.get(task.capability)
+        if queue is None:
+            queue = self.queues[task.capability] = deque()
+        queue.append(task)
+
+    def pop(self, capability: str) -> Optional[SimTask]:
+        queue = self.queues.get(capability)
+        return queue.popleft() if queue else None
+
+    def release(self, task: SimTask):
+        pass
+
+
+class _AgedPriorityQueue(_FifoQueue):
+    """Highest aged priority first: fair_queue's in-tenant order without bands or tenants"""
+
+    def __init__(self, scenario: Scenario, clock):
+        self.queues: Dict[str, list] = {}
+        self.aging_seconds = scenario.aging_seconds
+        self.sequence = itertools.count()
+
+    def push(self, task: SimTask):
+        queue = self.queues.get(task.capability)
+        if queue is None:
+            queue = self.queues[task.capability] = []
+        if self.aging_seconds > 0:
+            key = task.created_at - task.priority * self.aging_seconds
+        else:
+            key = -task.priority
+        heapq.heappush(queue, (key, next(self.sequence), task))
+
+    def pop(self, capability: str) -> Optional[SimTask]:
+        queue = self.queues.get(capability)
+        return heapq.heappop(queue)[2] if queue else None
+
+
+class _SimFairQueue(FairQueueEngine):
+    """FairQueueEngine on the virtual clock, without Prometheus updates"""
+
+    def _record_wait(self, client_id: str, wait_seconds: float):
+        pass
+
+    def _publish_depth(self, client_id: str):
+        pass
+
+
+class _FairQueue:
+    def __init__(self, scenario: Scenario, clock):
+        self.engine = _SimFairQueue(
+            weights=scenario.band_weights,
+            aging_seconds=scenario.aging_seconds,
+            client_weights={c.client_id: c.weight for c in scenario.clients if c.weight is not None},
+            client_caps={c.client_id: c.max_concurrency for c in scenario.clients if c.max_concurrency is not None},
+            clock=lambda: EPOCH.timestamp() + clock()
+        )
+        self.capped = bool(self.engine.client_caps)
+        self.tasks: Dict[int, SimTask] = {}
+        # Queued tasks per capability, so idle agents skip empty dequeues
+        self.pending: Dict[str, int] = {}
+
+    def push(self, task: SimTask):
+        self.tasks[task.task_id] = task
+        self.pending[task.capability] = self.pending.get(task.capability, 0) + 1
+        self.engine.enqueue(task.task_id, task.capability, task.priority,
+                            EPOCH + timedelta(seconds=task.created_at), task.client_id)
+
+    def pop(self, capability: str) -> Optional[SimTask]:
+        if not self.pending.get(capability):
+            return None
+        task_id = self.engine.dequeue(capability)
+        if task_id is None:
+            return None
+        self.pending[capability] -= 1
+        return self.tasks.pop(task_id)
+
+    def release(self, task: SimTask):
+        self.engine.release(task.task_id)
+
+
+QUEUES = {"fifo": _FifoQueue, "priority": _AgedPriorityQueue, "fair_queue": _FairQueue}
+
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+class Simulation:
+    """One policy run over a scenario"""
+
+    def __init__(self, scenario: Scenario, policy: str):
+        """
+        Args:
+            scenario: Fleet and workload
+            policy: One of POLICIES
+
+        Raises:
+            ValueError: Unknown policy or a capability no agent serves
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.scenario = scenario
+        self.policy = policy
+        self.now = 0.0
+        self.events: list = []
+        self.sequence = itertools.count()
+
+        self.agents: List[SimAgent] = []
+        for profile in scenario.agents:
+            for i in range(profile.count):
+                self.agents.append(SimAgent(f"{profile.name}-{i}", profile))
+        self.capable: Dict[str, List[SimAgent]] = {}
+        for agent in self.agents:
+            for capability in agent.tags:
+                self.capable.setdefault(capability, []).append(agent)
+        missing = [c for c in scenario.mix() if c not in self.capable]
+        if missing:
+            raise ValueError(f"No agent serves capabilities: {', '.join(missing)}")
+
+        # Independent streams so every policy sees the same workload
+        self.arrivals = random.Random(scenario.seed)
+        self.service = random.Random(scenario.seed + 1)
+        self.routing = random.Random(scenario.seed + 2)
+
+        self.queue = QUEUES[policy](scenario, lambda: self.now) if policy in QUEUES else None
+        # Agents with a free slot and nothing to lease, per capability
+        self.idle: Dict[str, Deque[SimAgent]] = {c: deque() for c in self.capable}
+        # Tasks routed to each agent and not yet finished, for least_loaded
+        self.loads: Optional[LoadIndex] = None
+        if policy == "least_loaded":
+            # Routed tasks wait in agent backlogs, so the index must not cap them at a slot count
+            self.loads = LoadIndex(default_max_concurrency=None)
+            self.loads.loaded = True
+            for agent in self.agents:
+                self.loads.track_agent(agent.agent_id, agent.tags)
+            self.by_id = {agent.agent_id: agent for agent in self.agents}
+
+        self.waits: Dict[str, List[float]] = {c.client_id: [] for c in scenario.clients}
+        self.latencies: List[float] = []
+        self.submitted = {c.client_id: 0 for c in scenario.clients}
+        self.completed = {c.client_id: 0 for c in scenario.clients}
+        self.failed = {c.client_id: 0 for c in scenario.clients}
+        self.retries = 0
+        self.timeouts = 0
+        self.last_event = 0.0
+
+    def _schedule(self, at: float, kind: int, *payload):
+        heapq.heappush(self.events, (at, next(self.sequence), kind, payload))
+
+    # ==================== WORKLOAD ====================
+
+    def _workload(self):
+        scenario = self.scenario
+        rng = self.arrivals
+        rate = scenario.arrival_rate()
+        clients = scenario.clients
+        client_weights = list(itertools.accumulate(c.share for c in clients))
+        mix = scenario.mix()
+        capabilities = list(mix)
+        capability_weights = list(itertools.accumulate(mix.values()))
+        last_client, last_capability = len(clients) - 1, len(capabilities) - 1
+        at = 0.0
+        for task_id in range(scenario.tasks):
+            at += rng.expovariate(rate)
+            # Inlined random.choices(cum_weights=...)
+            client = clients[min(last_client, bisect(client_weights, rng.random() * client_weights[-1]))]
+            capability = capabilities[min(
+                last_capability, bisect(capability_weights, rng.random() * capability_weights[-1])
+            )]
+            low, high = client.priority_range
+            yield SimTask(task_id, client.client_id, capability, rng.randint(low, high), at,
+                          rng.gauss(0.0, 1.0), scenario.max_retries, scenario.retry_policy)
+
+    # ==================== DISPATCH ====================
+
+    def _submit(self, task: SimTask):
+        task.ready_at = self.now
+        if self.queue is not None:
+            self.queue.push(task)
+            self._drain(task.capability)
+            return
+
+        agent = self._route(task)
+        agent.backlog.append(task)
+        if agent.free:
+            self._start(agent, agent.backlog.popleft())
+
+    def _route(self, task: SimTask) -> SimAgent:
+        candidates = self.capable[task.capability]
+        if self.policy == "round_robin":
+            agent = pick_round_robin(candidates)
+        elif self.policy == "least_loaded":
+            agent = self.by_id[self.loads.least_loaded(task.capability)]
+            self.loads.adjust(agent.agent_id, 1)
+        elif self.policy == "trust_weighted":
+            agent = pick_trust_weighted(candidates, task.capability, self.routing)
+        else:
+            agent = pick_fastest_response(candidates)
+        agent.last_assigned_at = EPOCH + timedelta(seconds=self.now)
+        return agent
+
+    def _drain(self, capability: str):
+        """Hand queued tasks of a capability to idle agents"""
+        idle = self.idle[capability]
+        while idle:
+            agent = idle[0]
+            if not agent.free:
+                idle.popleft()
+                agent.idle_in.discard(capability)
+                continue
+            task = self.queue.pop(capability)
+            if task is None:
+                return
+            self._start(agent, task)
+
+    def _lease(self, agent: SimAgent):
+        """A slot freed up: lease from the agent's capabilities, else wait idle"""
+        for capability in agent.tags:
+            while agent.free:
+                task = self.queue.pop(capability)
+                if task is None:
+                    break
+                self._start(agent, task)
+            if agent.free and capability not in agent.idle_in:
+                agent.idle_in.add(capability)
+                self.idle[capability].append(agent)
+
+    def _start(self, agent: SimAgent, task: SimTask):
+        wait = self.now - task.ready_at
+        task.wait += wait
+        self.waits[task.client_id].append(wait)
+        agent.free -= 1
+
+        seconds = math.exp(agent.log_median + agent.sigma * task.size)
+        timeout = self.scenario.timeout_seconds
+        if timeout is not None and seconds > timeout:
+            # Detected when it happens; the timeout worker polls in production
+            self._schedule(self.now + timeout, _FINISH, agent, task, timeout, timeout_error(timeout))
+            return
+        error = None
+        if self.service.random() < agent.profile.failure_rate:
+            if self.service.random() < self.scenario.non_retryable_rate:
+                error = NON_RETRYABLE_ERROR
+            else:
+                error = RETRYABLE_ERROR
+        self._schedule(self.now + seconds, _FINISH, agent, task, seconds, error)
+
+    def _finish(self, agent: SimAgent, task: SimTask, seconds: float, error: Optional[str]):
+        agent.free += 1
+        agent.busy_seconds += seconds
+        agent.record(error is None, seconds)
+        if self.queue is not None:
+            self.queue.release(task)
+        elif self.loads is not None:
+            self.loads.adjust(agent.agent_id, -1)
+
+        if error is None:
+            self.completed[task.client_id] += 1
+            self.latencies.append(self.now - task.created_at)
+            self.last_event = self.now
+        else:
+            if error != RETRYABLE_ERROR and error != NON_RETRYABLE_ERROR:
+                self.timeouts += 1
+            if should_retry(task, error):
+                # Same bookkeeping as retry.schedule_retry
+                task.retry_count += 1
+                self.retries += 1
+                self._schedule(self.now + retry_delay_seconds(task.retry_count, task.retry_policy), _RETRY, task)
+            else:
+                self.failed[task.client_id] += 1
+                self.last_event = self.now
+
+        if self.queue is not None:
+            self._lease(agent)
+            # A tenant below its cap again may unblock other idle agents
+            if self.queue.capped:
+                self._drain(task.capability)
+        elif agent.backlog:
+            self._start(agent, agent.backlog.popleft())
+
+    def run(self) -> Dict[str, Any]:
+        """Simulate every task to completion or permanent failure"""
+        started = time.perf_counter()
+        if self.queue is not None:
+            for agent in self.agents:
+                self._lease(agent)
+
+        workload = self._workload()
+        first = next(workload, None)
+        if first is not None:
+            self._schedule(first.created_at, _ARRIVAL, first)
+
+        events = self.events
+        pop = heapq.heappop
+        while events:
+            self.now, _, kind, payload = pop(events)
+            if kind == _FINISH:
+                self._finish(*payload)
+            elif kind == _ARRIVAL:
+                task = payload[0]
+                self.submitted[task.client_id] += 1
+                self._submit(task)
+                following = next(workload, None)
+                if following is not None:
+                    self._schedule(following.created_at, _ARRIVAL, following)
+            else:
+                self._submit(payload[0])
+
+        return self.report(time.perf_counter() - started)
+
+    # ==================== REPORT ====================
+
+    def report(self, runtime_seconds: float) -> Dict[str, Any]:
+        all_waits = [wait for waits in self.waits.values() for wait in waits]
+        makespan = self.last_event
+        completed = sum(self.completed.values())
+        slots = sum(agent.profile.concurrency for agent in self.agents)
+        clients = {
+            client_id: {
+                "submitted": self.submitted[client_id],
+                "completed": self.completed[client_id],
+                "failed": self.failed[client_id],
+                "queue_wait_seconds": summarize(waits)
+            }
+            for client_id, waits in self.waits.items()
+        }
+        return {
+            "policy": self.policy,
+            "tasks": self.scenario.tasks,
+            "completed": completed,
+            "failed": sum(self.failed.values()),
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "queue_wait_seconds": summarize(all_waits),
+            "latency_seconds": summarize(self.latencies),
+            "makespan_seconds": round(makespan, 3),
+            "throughput_per_second": round(completed / makespan, 3) if makespan else 0.0,
+            "utilization": round(sum(a.busy_seconds for a in self.agents) / (makespan * slots), 4) if makespan else 0.0,
+            "fairness": round(jain_index([
+                stats["queue_wait_seconds"]["mean"] for stats in clients.values() if stats["submitted"]
+            ]), 4),
+            "clients": clients,
+            "runtime_seconds": round(runtime_seconds, 3)
+        }
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Mean, max and nearest-rank percentiles"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    count = len(ordered)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(count - 1, max(0, math.ceil(p * count) - 1))], 4)
+
+    return {
+        "count": count,
+        "mean": round(sum(ordered) / count, 4),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1], 4)
+    }
+
+
+def jain_index(values: List[float]) -> float:
+    """Jain's fairness index: 1.0 when all values are equal, 1/n when one value dominates"""
+    if not values:
+        return 1.0
+    squares = sum(value * value for value in values)
+    if squares == 0:
+        return 1.0
+    return sum(values) ** 2 / (len(values) * squares)
+
+
+def simulate(scenario: Scenario, policies: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run a scenario under each policy.
+
+    Args:
+        scenario: Fleet and workload
+        policies: Policies to compare (default: all)
+
+    Returns:
+        Dict with the scenario and one report per policy
+    """
+    return {
+        "scenario": {
+            **asdict(scenario),
+            "capacity_per_second": round(scenario.capacity(), 3),
+            "arrival_rate_per_second": round(scenario.arrival_rate(), 3)
+        },
+        "policies": {policy: Simulation(scenario, policy).run() for policy in (policies or POLICIES)}
+    }
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare AINS scheduling policies on a virtual clock")
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=8, help="Small tenants besides bulk and interactive")
+    parser.add_argument("--policies", default=",".join(POLICIES))
+    parser.add_argument("--load", type=float, default=0.9, help="Arrival rate as a fraction of fleet capacity")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Task timeout in seconds (0: none)")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--retry-policy", default="exponential", choices=["exponential", "linear", "fixed"])
+    parser.add_argument("--aging-seconds", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON result here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    scenario = default_scenario(
+        tasks=args.tasks,
+        agents=args.agents,
+        clients=args.clients,
+        load=args.load,
+        timeout_seconds=args.timeout or None,
+        max_retries=args.max_retries,
+        retry_policy=args.retry_policy,
+        aging_seconds=args.aging_seconds,
+        seed=args.seed
+    )
+    try:
+        result = simulate(scenario, [p.strip() for p in args.policies.split(",") if p.strip()])
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    # Columns sized to their widest cell, so large makespans and waits stay apart
+    header = ["policy", "wait p50", "wait p99", "lat p99", "makespan", "fairness", "failed", "runtime"]
+    rows = [
+        [
+            policy,
+            f"{report['queue_wait_seconds']['p50']:.3f}",
+            f"{report['queue_wait_seconds']['p99']:.3f}",
+            f"{report['latency_seconds']['p99']:.3f}",
+            f"{report['makespan_seconds']:.1f}",
+            f"{report['fairness']:.3f}",
+            str(report['failed']),
+            f"{report['runtime_seconds']:.2f}s"
+        ]
+        for policy, report in result["policies"].items()
+    ]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        ))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
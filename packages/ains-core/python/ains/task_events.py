@@ -0,0 +1,126 @@
+"""AINS Task Change Events
+
+Captures task inserts, updates and deletes made through the ORM and hands
+them to subscribers once the transaction commits, so in-memory structures
+(like the fair queue) stay in sync without hooking every write path.
+Changes from rolled-back transactions are discarded.
+
+Bulk Query.update()/delete() bypass the ORM unit of work; subscribers must
+tolerate the resulting staleness (e.g. re-validate on dequeue).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from .db import Task
+
+
+@dataclass
+class TaskChange:
+    """A committed change to a task row"""
+    task_id: str
+    old_status: Optional[str]
+    new_status: Optional[str]  # None when the task was deleted
+    capability: Optional[str]
+    priority: int
+    created_at: Optional[datetime]
+    client_id: Optional[str] = None
+    assigned_agent_id: Optional[str] = None
+    old_assigned_agent_id: Optional[str] = None
+    is_blocked: bool = False
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+
+_subscribers: List[Callable[[TaskChange], None]] = []
+
+PENDING_KEY = "ains_task_changes"
+
+
+def subscribe(callback: Callable[[TaskChange], None]):
+    """Register a callback invoked for every committed task change"""
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback: Callable[[TaskChange], None]):
+    """Remove a previously registered callback"""
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def publish(change: TaskChange):
+    """Deliver a change to subscribers immediately (for changes made outside the ORM)"""
+    for callback in list(_subscribers):
+        try:
+            callback(change)
+        except Exception as e:
+            print(f"⚠️  Task change subscriber failed: {e}")
+
+
+def _previous(state, attribute: str):
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, attribute)
+
+
+def _queue(target, old_status: Optional[str], new_status: Optional[str]):
+    session = object_session(target)
+    if session is None:
+        return
+
+    state = inspect(target)
+    session.info.setdefault(PENDING_KEY, []).append(TaskChange(
+        task_id=target.task_id,
+        old_status=old_status,
+        new_status=new_status,
+        capability=target.capability_required,
+        priority=target.priority if target.priority is not None else 5,
+        created_at=target.created_at,
+        client_id=target.client_id,
+        assigned_agent_id=target.assigned_agent_id,
+        old_assigned_agent_id=_previous(state, "assigned_agent_id"),
+        is_blocked=bool(target.is_blocked),
+        started_at=target.started_at,
+        completed_at=target.completed_at,
+        metadata=target.task_metadata,
+    ))
+
+
+@event.listens_for(Task, "after_insert")
+def _task_inserted(mapper, connection, target):
+    _queue(target, None, target.status or "PENDING")
+
+
+@event.listens_for(Task, "after_update")
+def _task_updated(mapper, connection, target):
+    state = inspect(target)
+    watched = ("status", "priority", "assigned_agent_id", "capability_required", "is_blocked")
+    if not any(state.attrs[name].history.has_changes() for name in watched):
+        return
+    _queue(target, _previous(state, "status"), target.status)
+
+
+@event.listens_for(Task, "after_delete")
+def _task_deleted(mapper, connection, target):
+    _queue(target, target.status, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if not changes:
+        return
+    for change in changes:
+        publish(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(PENDING_KEY, None)
@@ -2,9 +2,11 @@
 from datetime import datetime, timezone
 from typing import Optional, List
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case, select, update
 
 from .db import Task, Agent
+from .fair_queue import fair_queue
+from .load_index import load_index
 
 
 class PriorityQueue:
@@ -17,53 +19,60 @@ class PriorityQueue:
         """
         Get next task for agent considering priority and fairness.
         
-        Uses weighted fair queuing:
-        - High priority tasks (8-10) processed first
-        - Medium priority tasks (5-7) prevent starvation
-        - Low priority tasks (1-4) guaranteed processing
+        Served by the fair queue engine: priority bands (high 8-10,
+        medium 5-7, low 1-4) share dequeues by deficit round robin
+        according to their weights, tenants share each band by weighted
+        round robin within their concurrency caps, and tasks age within
+        their band, so no band or tenant starves.
+        
+        The returned task is removed from the in-memory queue; callers
+        assign it (or put it back with fair_queue.enqueue).
         
         Args:
             agent_id: Agent requesting task
             capability: Capability the agent can handle
         
         Returns:
-            Next task to process, or None if queue empty
+            Next task to process, or None if queue empty or the agent has no free slot
+        """
+        tasks = self.get_next_tasks_for_agent(agent_id, capability, max_tasks=1)
+        return tasks[0] if tasks else None
+    
+    def get_next_tasks_for_agent(self, agent_id: str, capability: str, max_tasks: Optional[int] = None) -> List[Task]:
         """
-        # Get agent's current workload
-        active_tasks = self.db.query(Task).filter(
-            Task.assigned_agent_id == agent_id,
-            Task.status.in_(['ASSIGNED', 'ACTIVE'])
-        ).count()
+        Get a batch of next tasks for an agent, up to its free concurrency slots.
         
-        # Don't overload agents (max 5 concurrent tasks)
-        if active_tasks >= 5:
-            return None
+        Free slots come from the load index (the agent's max_concurrency
+        minus its in-flight tasks), not a count() per call.
         
-        # Priority-based selection with fairness
-        # 70% chance to pick high priority, 30% for medium/low to prevent starvation
-        import random
-        use_strict_priority = random.random() < 0.7
+        Args:
+            agent_id: Agent requesting tasks
+            capability: Capability the agent can handle
+            max_tasks: Further cap on the batch size
         
-        if use_strict_priority:
-            # Strict priority ordering
-            task = self.db.query(Task).filter(
-                Task.status == 'PENDING',
-                func.lower(Task.capability_required) == capability.lower()
-            ).order_by(
-                Task.priority.desc(),
-                Task.created_at.asc()
-            ).first()
-        else:
-            # Fair queuing - oldest task from medium/low priority
-            task = self.db.query(Task).filter(
-                Task.status == 'PENDING',
-                func.lower(Task.capability_required) == capability.lower(),
-                Task.priority <= 7  # Medium and low priority
-            ).order_by(
-                Task.created_at.asc()
-            ).first()
+        Returns:
+            Tasks in dequeue order (possibly empty)
+        """
+        load_index.ensure_loaded(self.db)
+        budget = load_index.free_slots(agent_id)
+        if max_tasks is not None:
+            budget = min(budget, max_tasks)
         
-        return task
+        fair_queue.ensure_loaded(self.db)
+        
+        tasks: List[Task] = []
+        while len(tasks) < budget:
+            task_id = fair_queue.dequeue(capability)
+            if task_id is None:
+                break
+            
+            # Bulk updates bypass task events, so re-check the row
+            task = self.db.get(Task, task_id)
+            if task and task.status == 'PENDING' and not task.is_blocked:
+                tasks.append(task)
+            else:
+                fair_queue.release(task_id)
+        return tasks
     
     def get_queue_stats(self) -> dict:
         """
@@ -115,37 +124,61 @@ class PriorityQueue:
         }
 
 
-def adjust_priority_by_age(db: Session, max_age_hours: int = 24):
+def adjust_priority_by_age(db: Session, max_age_hours: int = 24, persist: bool = True):
     """
-    Increase priority of old tasks to prevent starvation.
+    Boost old low/medium priority tasks to prevent starvation.
     
-    Tasks older than max_age_hours get priority boost.
+    The boost is stored with a single set-based UPDATE
+    (priority = LEAST(9, priority + 2)) over the (status, created_at) index,
+    and the affected tasks are re-queued. Dispatch does not depend on it:
+    the fair queue ages every task at dequeue time and promotes it into a
+    higher band once its effective priority gets there. Operators run the
+    stored boost through POST /aitp/queue/age. persist=False only counts the
+    tasks past the threshold.
     
     Args:
         db: Database session
         max_age_hours: Age threshold for priority boost
+        persist: Rewrite the stored priority (False only counts eligible tasks)
     
     Returns:
-        Number of tasks updated
+        Number of tasks boosted (or eligible for a boost when not persisting)
     """
     from datetime import timedelta
     
     cutoff_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
     
-    # Find old low-priority tasks
-    old_tasks = db.query(Task).filter(
-        Task.status == 'PENDING',
-        Task.created_at < cutoff_time,
-        Task.priority < 7  # Only boost low/medium priority
-    ).all()
+    # Only boost low/medium priority (Core statements: the boost is one set-based UPDATE)
+    table = Task.__table__
+    criteria = (
+        table.c.status == 'PENDING',
+        table.c.created_at < cutoff_time,
+        table.c.priority < 7
+    )
+    
+    if not persist:
+        return db.execute(select(func.count()).select_from(table).where(*criteria)).scalar() or 0
     
-    updated = 0
-    for task in old_tasks:
-        # Boost priority by 2, max 9
-        task.priority = min(9, task.priority + 2)
-        updated += 1
+    # Boost priority by 2, max 9 (CASE rather than LEAST so SQLite works too)
+    statement = update(table).where(*criteria).values(
+        priority=case((table.c.priority + 2 > 9, 9), else_=table.c.priority + 2)
+    )
     
-    if updated > 0:
+    # The bulk UPDATE bypasses task events, so hand the new priorities to the fair queue
+    if db.get_bind().dialect.update_returning:
+        rows = db.execute(statement.returning(
+            table.c.task_id, table.c.capability_required, table.c.priority,
+            table.c.created_at, table.c.client_id, table.c.is_blocked
+        )).all()
         db.commit()
+        if fair_queue.loaded:
+            for task_id, capability, priority, created_at, client_id, is_blocked in rows:
+                if not is_blocked:
+                    fair_queue.enqueue(task_id, capability, priority, created_at, client_id)
+        return len(rows)
     
+    updated = db.execute(statement).rowcount
+    db.commit()
+    if updated and fair_queue.loaded:
+        fair_queue.load_from_db(db)
     return updated
@@ -6,6 +6,11 @@ from sqlalchemy.orm import Session
 from .db import Task
 
 
+def timeout_error(timeout_seconds: int) -> str:
+    """Error message recorded on a task that ran past its timeout"""
+    return f"Task timed out after {timeout_seconds} seconds"
+
+
 def check_timeouts(db: Session, limit: int = 50) -> int:
     """
     Check for timed-out tasks and mark them as failed.
@@ -32,15 +37,18 @@ def check_timeouts(db: Session, limit: int = 50) -> int:
     
     for task in timed_out_tasks:
         # Calculate when task should timeout
-        timeout_at = task.started_at + timedelta(seconds=task.timeout_seconds)
+        started_at = task.started_at
+        if started_at.tzinfo is None:
+            started_at = started_at.replace(tzinfo=timezone.utc)
+        timeout_at = started_at + timedelta(seconds=task.timeout_seconds)
         
-        timeout_at = task.started_at.replace(tzinfo=timezone.utc) + timedelta(seconds=task.timeout_seconds) if task.started_at.tzinfo is None else task.started_at + timedelta(seconds=task.timeout_seconds)
+        if now >= timeout_at:
             # Task has timed out
-        task.status = 'FAILED'
-        task.completed_at = now
-        task.updated_at = now
-        task.error_message = f"Task timed out after {task.timeout_seconds} seconds"
-        timed_out_count += 1
+            task.status = 'FAILED'
+            task.completed_at = now
+            task.updated_at = now
+            task.error_message = timeout_error(task.timeout_seconds)
+            timed_out_count += 1
     
     if timed_out_count > 0:
         db.commit()
@@ -0,0 +1,219 @@
+"""AINS Agent Trust Index
+
+Per-capability weighted samplers over agent trust scores, so a
+trust-weighted routing decision is an O(log n) draw instead of loading
+every agent and rebuilding a weight list. The samplers are the Fenwick
+trees from aicp.weighted_sampler, shared with the AICP TrustWeightedRouter.
+
+Agent inserts, trust/tag updates and deletes made through the ORM are
+applied once their transaction commits. Without aicp installed the index
+reports itself unavailable and routing falls back to scanning agents.
+"""
+
+import random
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from .db import Agent
+
+try:
+    from aicp.weighted_sampler import WeightedSampler
+    SAMPLER_AVAILABLE = True
+except ImportError:
+    SAMPLER_AVAILABLE = False
+
+# Same rules as advanced_features.pick_trust_weighted
+MIN_TRUST = 0.3
+MIN_WEIGHT = 0.1
+
+PENDING_KEY = "ains_agent_trust_changes"
+
+
+def trust_weight(trust_score: Optional[float]) -> float:
+    return max(trust_score or 0.0, MIN_WEIGHT)
+
+
+class _CapabilitySamplers:
+    """One capability's agents: those at or above MIN_TRUST, and all of them"""
+
+    def __init__(self):
+        self.trusted = WeightedSampler()
+        self.capable = WeightedSampler()
+
+    def set(self, agent_id: str, trust_score: Optional[float]):
+        weight = trust_weight(trust_score)
+        self.capable.set(agent_id, weight)
+        if (trust_score or 0.0) >= MIN_TRUST:
+            self.trusted.set(agent_id, weight)
+        else:
+            self.trusted.remove(agent_id)
+
+    def remove(self, agent_id: str):
+        self.trusted.remove(agent_id)
+        self.capable.remove(agent_id)
+
+    def sample(self, rng) -> Optional[str]:
+        # Fallback: any capable agent
+        return (self.trusted if len(self.trusted) else self.capable).sample(rng)
+
+
+class TrustIndex:
+    """Agent trust scores with per-capability weighted sampling"""
+
+    def __init__(self):
+        self.available = SAMPLER_AVAILABLE
+        self.lock = threading.Lock()
+        self.trust: Dict[str, Optional[float]] = {}
+        self.tags: Dict[str, Tuple[str, ...]] = {}
+        self.capabilities: Dict[str, _CapabilitySamplers] = {}
+        self.loaded = False
+
+    # ==================== LOADING ====================
+
+    def ensure_loaded(self, db: Session):
+        """Load agents on first use"""
+        if not self.loaded:
+            self.load_from_db(db)
+
+    def load_from_db(self, db: Session):
+        """Rebuild the index from the agents table"""
+        if not self.available:
+            return
+        table = Agent.__table__
+        rows = db.execute(select(table.c.agent_id, table.c.tags, table.c.trust_score)).all()
+        with self.lock:
+            self.trust = {}
+            self.tags = {}
+            self.capabilities = {}
+            for agent_id, tags, trust_score in rows:
+                self._track(agent_id, tags or [], trust_score)
+            self.loaded = True
+        print(f"🎲 Trust index loaded {len(rows)} agents")
+
+    # ==================== AGENTS ====================
+
+    def track_agent(self, agent_id: str, tags: Iterable[str], trust_score: Optional[float]):
+        """Add an agent, or update its tags and trust score in place (O(log n) per tag)"""
+        if not self.loaded:
+            return
+        with self.lock:
+            self._track(agent_id, tags, trust_score)
+
+    def forget_agent(self, agent_id: str):
+        with self.lock:
+            self.trust.pop(agent_id, None)
+            for tag in self.tags.pop(agent_id, ()):
+                self.capabilities[tag].remove(agent_id)
+
+    def _track(self, agent_id: str, tags: Iterable[str], trust_score: Optional[float]):
+        tags = tuple(dict.fromkeys(tags))
+        for tag in self.tags.get(agent_id, ()):
+            if tag not in tags:
+                self.capabilities[tag].remove(agent_id)
+        self.tags[agent_id] = tags
+        self.trust[agent_id] = trust_score
+        for tag in tags:
+            samplers = self.capabilities.get(tag)
+            if samplers is None:
+                samplers = self.capabilities[tag] = _CapabilitySamplers()
+            samplers.set(agent_id, trust_score)
+
+    # ==================== QUERIES ====================
+
+    def sample(
+        self,
+        capability: str,
+        rng=random,
+        accept: Optional[Callable[[str], bool]] = None,
+        attempts: int = 8
+    ) -> Optional[str]:
+        """
+        Random agent with a capability, weighted by trust.
+
+        Agents with trust >= 0.3 are preferred; each weighs max(trust, 0.1).
+
+        Args:
+            capability: Capability tag
+            rng: Random source
+            accept: Filter on candidates (e.g. has a free slot); rejected
+                draws are retried, then the accepted agents are weighed directly
+            attempts: Draws before falling back to the direct weighing
+
+        Returns:
+            agent_id, or None if no (accepted) agent has the capability
+        """
+        with self.lock:
+            samplers = self.capabilities.get(capability)
+            if not samplers:
+                return None
+            for _ in range(attempts if accept else 1):
+                agent_id = samplers.sample(rng)
+                if agent_id is None or accept is None or accept(agent_id):
+                    return agent_id
+            # Most of the weight sits on rejected agents: O(n) over this capability
+            for sampler in (samplers.trusted, samplers.capable):
+                accepted = [(key, weight) for key, weight in zip(sampler.keys, sampler.weights) if accept(key)]
+                if accepted:
+                    keys, weights = zip(*accepted)
+                    return rng.choices(keys, weights=weights, k=1)[0]
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "agents": len(self.tags),
+                "capabilities": len(self.capabilities),
+                "trusted": sum(len(s.trusted) for s in self.capabilities.values())
+            }
+
+
+# Global trust index instance
+trust_index = TrustIndex()
+
+
+# ============================================================================
+# ORM EVENTS
+# ============================================================================
+
+def _queue(target, deleted: bool = False):
+    session = object_session(target)
+    if session is None or not trust_index.loaded:
+        return
+    session.info.setdefault(PENDING_KEY, []).append(
+        (target.agent_id, None if deleted else tuple(target.tags or ()), target.trust_score)
+    )
+
+
+@event.listens_for(Agent, "after_insert")
+def _agent_inserted(mapper, connection, target):
+    _queue(target)
+
+
+@event.listens_for(Agent, "after_update")
+def _agent_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.trust_score.history.has_changes() or state.attrs.tags.history.has_changes():
+        _queue(target)
+
+
+@event.listens_for(Agent, "after_delete")
+def _agent_deleted(mapper, connection, target):
+    _queue(target, deleted=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    for agent_id, tags, trust_score in changes or ():
+        if tags is None:
+            trust_index.forget_agent(agent_id)
+        else:
+            trust_index.track_agent(agent_id, tags, trust_score)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(PENDING_KEY, None)
@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 
 from .db import Agent, Task, TrustRecord
+from .cache import cache
+from .search_index import search_index
 
 
 def calculate_trust_score(
@@ -140,6 +142,10 @@ def adjust_trust_score(
     db.commit()
     db.refresh(record)
     
+    # Cached agent responses carry the trust score
+    cache.invalidate_agent(agent_id)
+    search_index.update_trust(agent_id, trust_after)
+    
     return record
 
 
@@ -0,0 +1,130 @@
+"""
+Per-request overhead of the Prometheus middleware.
+
+Replays requests in-process (raw ASGI, no sockets) against an app with the
+same route table as the AINS API and trivial endpoints, so the numbers are
+the middleware's own cost:
+
+    python benchmarks/bench_metrics_middleware.py [--requests 20000]
+
+Compares no middleware, the previous BaseHTTPMiddleware implementation
+(raw-path labels) and the pure-ASGI route-template middleware.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from ains.observability.metrics import (
+    http_requests_total,
+    http_request_duration_seconds,
+    http_requests_in_progress
+)
+from ains.observability.middleware import PrometheusMiddleware
+
+
+class LegacyPrometheusMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation this benchmark replaced"""
+
+    async def dispatch(self, request: Request, call_next):
+        method = request.method
+        endpoint = request.url.path
+        http_requests_in_progress.labels(method=method, endpoint=endpoint).inc()
+        start_time = time.time()
+        try:
+            response = await call_next(request)
+            http_requests_total.labels(method=method, endpoint=endpoint, status_code=response.status_code).inc()
+            http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(time.time() - start_time)
+            return response
+        finally:
+            http_requests_in_progress.labels(method=method, endpoint=endpoint).dec()
+
+
+def ains_routes():
+    """(path template, methods) of every AINS API route"""
+    from ains.api import app
+    return [(route.path, route.methods) for route in app.routes if isinstance(route, APIRoute)]
+
+
+def build_app(routes, middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    async def endpoint():
+        return {"ok": True}
+
+    for path, methods in routes:
+        app.add_api_route(path, endpoint, methods=list(methods))
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+def request_paths(routes, count):
+    """Concrete GET paths, with a fresh ID in every parameterised request"""
+    templates = [path for path, methods in routes if "GET" in methods]
+    paths = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        paths.append(template.replace("{", "").replace("}", f"-{i}") if "{" in template else template)
+    return paths
+
+
+async def replay(app, paths):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for path in paths:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "root_path": "", "query_string": b"", "headers": [],
+            "client": ("127.0.0.1", 1), "server": ("bench", 80)
+        }
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+def series_count():
+    return sum(len(metric.samples) for metric in http_requests_total.collect())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    routes = ains_routes()
+    paths = request_paths(routes, args.requests)
+    variants = [
+        ("no middleware", None),
+        ("BaseHTTPMiddleware, raw paths", LegacyPrometheusMiddleware),
+        ("pure ASGI, route templates", PrometheusMiddleware),
+    ]
+
+    print(f"{len(routes)} routes, {len(paths)} requests\n")
+    print(f"{'variant':<32}{'us/request':>12}{'overhead':>12}{'new series':>12}")
+    baseline = None
+    for name, middleware in variants:
+        app = build_app(routes, middleware)
+        asyncio.run(replay(app, paths[:500]))  # warm up
+        before = series_count()
+        elapsed = asyncio.run(replay(app, paths))
+        per_request = elapsed / len(paths) * 1e6
+        baseline = per_request if baseline is None else baseline
+        print(f"{name:<32}{per_request:>12.1f}{per_request - baseline:>12.1f}{series_count() - before:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,14 @@ import time
 import secrets
 import requests
 from datetime import datetime, timezone
+from typing import Optional
 
 API_BASE_URL = os.getenv("AINS_API_URL", "http://localhost:8000")
 AGENT_NAME = os.getenv("AGENT_NAME", f"sample-agent-{secrets.token_hex(4)}")
 HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "30"))
-POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "5"))
+POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "5"))  # Back-off after a failed lease request
+LEASE_WAIT_SECONDS = int(os.getenv("LEASE_WAIT_SECONDS", "20"))
+LEASE_BATCH_SIZE = int(os.getenv("LEASE_BATCH_SIZE", "1"))
 
 class AINSAgent:
     def __init__(self, api_url: str, agent_name: str):
@@ -101,27 +104,27 @@ class AINSAgent:
             print(f"⚠️  Capability error: {e}")
             return False
     
-    def poll_tasks(self) -> list:
-        """Poll for tasks"""
+    def lease_tasks(self, wait_seconds: int) -> Optional[list]:
+        """Long-poll for tasks; returns as soon as work is leased or the wait ends"""
         try:
-            resp = self.session.get(
-                f"{self.api_url}/aitp/tasks",
+            resp = self.session.post(
+                f"{self.api_url}/aitp/agents/{self.agent_id}/lease",
                 params={
-                    "assigned_agent_id": self.agent_id,
-                    "status": "ASSIGNED",
-                    "limit": 10
-                }
+                    "max_tasks": LEASE_BATCH_SIZE,
+                    "wait_seconds": wait_seconds
+                },
+                timeout=wait_seconds + 10
             )
             if resp.status_code == 200:
-                data = resp.json()
-                tasks = data if isinstance(data, list) else data.get("tasks", [])
+                tasks = resp.json().get("tasks", [])
                 if tasks:
-                    print(f"📋 Found {len(tasks)} task(s)")
+                    print(f"📋 Leased {len(tasks)} task(s)")
                 return tasks
-            return []
+            print(f"⚠️  Lease {resp.status_code}: {resp.text}")
+            return None
         except Exception as e:
-            print(f"⚠️  Poll error: {e}")
-            return []
+            print(f"⚠️  Lease error: {e}")
+            return None
     
     def execute_task(self, task: dict) -> dict:
         """Execute task"""
@@ -131,12 +134,11 @@ class AINSAgent:
         return {"processed": True, "timestamp": datetime.now(timezone.utc).isoformat()}
     
     def report_completion(self, task_id: str, result: dict) -> bool:
-        """Report completion"""
+        """Ack the lease with the task result"""
         payload = {"status": "COMPLETED", "result_data": result}
         try:
-            resp = self.session.put(
-                f"{self.api_url}/aitp/tasks/{task_id}/status",
-                params={"agent_id": self.agent_id},
+            resp = self.session.post(
+                f"{self.api_url}/aitp/agents/{self.agent_id}/leases/{task_id}/ack",
                 json=payload
             )
             if resp.status_code in (200, 204):
@@ -172,21 +174,23 @@ class AINSAgent:
                     self.send_heartbeat()
                     last_heartbeat = now
                 
-                # Poll for tasks
+                # Long-poll for tasks, waking up in time for the next heartbeat
                 poll_count += 1
-                tasks = self.poll_tasks()
+                wait = max(1, min(LEASE_WAIT_SECONDS, int(last_heartbeat + HEARTBEAT_INTERVAL - now)))
+                tasks = self.lease_tasks(wait)
+                if tasks is None:
+                    time.sleep(POLL_INTERVAL)
+                    continue
                 for task in tasks:
                     result = self.execute_task(task)
                     task_id = task.get("task_id") or task.get("taskid")
                     if task_id:
                         self.report_completion(task_id, result)
                 
-                # Status update every 30 seconds
+                # Periodic status update
                 if poll_count % 6 == 0:
                     print(f"⏱️  Running ({poll_count} polls)")
                 
-                time.sleep(POLL_INTERVAL)
-                
         except KeyboardInterrupt:
             print("\n👋 Shutting down gracefully")
             sys.exit(0)
@@ -18,6 +18,7 @@ setup(
             "pytest>=7.4.0",
             "pytest-cov>=4.1.0",
             "pytest-asyncio>=0.21.0",
+            "pytest-benchmark>=4.0.0",
             "black>=23.7.0",
             "pylint>=2.17.0",
         ]
@@ -20,3 +20,60 @@ def test_cache_set_get_invalidate():
 def test_cache_fallback():
     # You can add tests for fallback cache if implemented
     pass
+
+
+def test_response_cache_etag():
+    from ains.cache import agent_key, etag_matches
+
+    key = agent_key("agent_response_test")
+    assert cache.get_response(key) is None
+
+    etag = cache.set_response(key, b'{"agent_id":"agent_response_test"}')
+    body, cached_etag = cache.get_response(key)
+    assert body == b'{"agent_id":"agent_response_test"}'
+    assert cached_etag == etag
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+    # Invalidating the agent drops its cached responses
+    cache.invalidate_agent("agent_response_test")
+    assert cache.get_response(key) is None
+
+
+def test_agent_listings_invalidated_by_generation():
+    from ains.cache import agent_list_key
+
+    generation = cache.get_list_generation()
+    key = agent_list_key(generation, None, 10, 0)
+    cache.set_response(key, b'{"agents":[]}')
+    assert cache.get_response(key) is not None
+
+    cache.invalidate_agent_listings()
+    assert cache.get_list_generation() != generation
+    assert cache.get_response(agent_list_key(cache.get_list_generation(), None, 10, 0)) is None
+
+
+def test_memory_cache_expires_and_evicts():
+    from ains.cache import AgentCache, agent_key, agent_list_key
+
+    now = [0.0]
+    memory = AgentCache(ttl=60, max_entries=2, use_redis=False, clock=lambda: now[0])
+    memory.set_agent("a1", {"agent_id": "a1"})
+    memory.set_response(agent_key("a1"), b"{}")
+    memory.get_agent("a1")
+    memory.set_capability("c1", {"capability_id": "c1"})
+    # The least recently used entry (the response) was evicted
+    assert memory.get_response(agent_key("a1")) is None
+    assert memory.get_agent("a1") == {"agent_id": "a1"}
+
+    for offset in range(3):
+        memory.set_response(agent_list_key(0, None, 10, offset), b"[]")
+    assert len(memory.memory_lists) == 2
+
+    now[0] = 61
+    assert memory.get_agent("a1") is None
+    assert memory.get_response(agent_list_key(0, None, 10, 2)) is None
@@ -2,7 +2,9 @@
 
 import pytest
 from ains.db import Agent, AgentTag, TrustRecord, Base, engine
-from sqlalchemy.orm import sessionmaker
+import gc
+
+from sqlalchemy.orm import sessionmaker, configure_mappers
 from datetime import datetime
 
 
@@ -78,3 +80,10 @@ def test_trust_record_creation(db_session):
     assert retrieved is not None
     assert float(retrieved.trust_score) == 75.5
     assert retrieved.successful_transactions == 10
+
+
+def test_mappers_configure():
+    """Agent.assigned_tasks resolves after Task is rebound to ScheduledTask"""
+    gc.collect()
+    configure_mappers()
+    assert Agent.assigned_tasks.property.mapper.local_table.name == "tasks"
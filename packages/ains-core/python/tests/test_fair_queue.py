@@ -0,0 +1,239 @@
+"""Test the deficit-round-robin fair queue engine"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ains.api import app
+from ains.db import Task, get_db
+from ains.fair_queue import FairQueueEngine, band_for_priority, effective_priority, parse_weights
+from ains.task_queue import adjust_priority_by_age
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_band_for_priority():
+    assert band_for_priority(10) == "high"
+    assert band_for_priority(8) == "high"
+    assert band_for_priority(7) == "medium"
+    assert band_for_priority(5) == "medium"
+    assert band_for_priority(1) == "low"
+
+
+def test_parse_weights():
+    assert parse_weights(None) == {"high": 6, "medium": 3, "low": 1}
+    assert parse_weights("4,2,1") == {"high": 4, "medium": 2, "low": 1}
+    with pytest.raises(ValueError):
+        parse_weights("4,0,1")
+
+
+def test_drr_shares_follow_weights():
+    engine = FairQueueEngine(weights={"high": 6, "medium": 3, "low": 1}, clock=START.timestamp)
+    for i in range(100):
+        engine.enqueue(f"h{i}", "cap", 9, START)
+        engine.enqueue(f"m{i}", "cap", 6, START)
+        engine.enqueue(f"l{i}", "cap", 2, START)
+
+    served = [engine.dequeue("cap")[0] for _ in range(50)]
+    assert served.count("h") == 30
+    assert served.count("m") == 15
+    assert served.count("l") == 5
+
+
+def test_aging_within_band():
+    engine = FairQueueEngine(aging_seconds=60)
+    engine.enqueue("new_p10", "cap", 10, START + timedelta(minutes=10))
+    engine.enqueue("old_p8", "cap", 8, START)
+
+    # Waiting 10 minutes is worth more than two priority levels
+    assert engine.dequeue("cap") == "old_p8"
+    assert engine.dequeue("cap") == "new_p10"
+    assert engine.dequeue("cap") is None
+
+
+def test_aged_tasks_are_promoted_across_bands():
+    now = [START.timestamp()]
+    engine = FairQueueEngine(weights={"high": 6, "medium": 3, "low": 1}, aging_seconds=60,
+                             clock=lambda: now[0])
+    engine.enqueue("old_low", "cap", 2, START, client_id="small")
+    for i in range(100):
+        engine.enqueue(f"h{i}", "cap", 9, START, client_id="bulk")
+
+    # Within its band's share the low task waits behind high-band work
+    assert engine.dequeue("cap") == "h0"
+    assert engine.depth("cap") == {"high": 99, "medium": 0, "low": 1}
+
+    # Three minutes later it is worth priority 5 (medium), six minutes later 8 (high)
+    now[0] += 180
+    engine.dequeue("cap")
+    assert engine.depth("cap")["medium"] == 1
+    now[0] += 180
+    assert "old_low" in [engine.dequeue("cap") for _ in range(2)]
+    assert engine.depth("cap") == {"high": 97, "medium": 0, "low": 0}
+
+
+def test_effective_priority():
+    engine = FairQueueEngine(aging_seconds=60)
+    now = START.timestamp()
+
+    assert engine.effective_priority(3, START, now) == 3
+    assert engine.effective_priority(3, START, now + 120) == 5
+    assert engine.effective_priority(None, START, now) == 5
+    # Queued "in the future" (clock skew) never lowers the priority
+    assert engine.effective_priority(3, START + timedelta(minutes=5), now) == 3
+    assert effective_priority(3, START, 0, now + 600) == 3
+
+
+def test_remove_and_reprioritize():
+    engine = FairQueueEngine()
+    engine.enqueue("a", "Cap", 3, START)
+    engine.enqueue("b", "cap", 3, START + timedelta(seconds=1))
+    engine.remove("a")
+    engine.enqueue("b", "cap", 9, START + timedelta(seconds=1))
+
+    assert engine.depth("cap") == {"high": 1, "medium": 0, "low": 0}
+    assert engine.dequeue("CAP") == "b"
+    assert engine.dequeue("cap") is None
+
+
+def test_tenants_share_a_band():
+    engine = FairQueueEngine()
+    # One tenant floods the band before another submits anything
+    for i in range(1000):
+        engine.enqueue(f"bulk{i}", "cap", 5, START, client_id="bulk")
+    for i in range(3):
+        engine.enqueue(f"small{i}", "cap", 5, START + timedelta(hours=1), client_id="small")
+
+    served = [engine.dequeue("cap") for _ in range(6)]
+    assert sorted(task_id for task_id in served if task_id.startswith("small")) == ["small0", "small1", "small2"]
+
+
+def test_tenant_weights_and_caps():
+    engine = FairQueueEngine(client_weights={"gold": 3})
+    for i in range(50):
+        engine.enqueue(f"gold{i}", "cap", 5, START, client_id="gold")
+        engine.enqueue(f"free{i}", "cap", 5, START, client_id="free")
+
+    served = [engine.dequeue("cap") for _ in range(40)]
+    assert sum(task_id.startswith("gold") for task_id in served) == 30
+
+    # Capped tenants are skipped until their in-flight tasks finish
+    engine.set_client_policy("gold", max_concurrency=30)
+    served = [engine.dequeue("cap") for _ in range(5)]
+    assert all(task_id.startswith("free") for task_id in served)
+
+    engine.release("gold0")
+    assert engine.dequeue("cap").startswith("gold")
+
+    # A band whose tenants are all capped yields to other bands
+    engine.set_client_policy("free", max_concurrency=1)
+    engine.enqueue("low0", "cap", 1, START, client_id="other")
+    assert engine.dequeue("cap") == "low0"
+    assert engine.dequeue("cap") is None
+
+
+def test_tenant_stats():
+    engine = FairQueueEngine(client_caps={"acme": 2})
+    engine.enqueue("t1", "cap", 5, START, client_id="acme")
+    engine.enqueue("t2", "cap", 5, START, client_id="acme")
+    engine.dequeue("cap")
+
+    stats = {row["client_id"]: row for row in engine.tenant_stats()}
+    assert stats["acme"]["queued"] == 1
+    assert stats["acme"]["inflight"] == 1
+    assert stats["acme"]["max_concurrency"] == 2
+    assert stats["acme"]["dequeued"] == 1
+    assert stats["acme"]["avg_wait_seconds"] > 0
+
+
+def test_simulation_bounded_wait_per_band():
+    """
+    The high band alone exceeds capacity. Strict priority would starve the
+    other bands; DRR keeps their waits bounded while high absorbs the overload.
+    """
+    clock = [START.timestamp()]
+    engine = FairQueueEngine(weights={"high": 6, "medium": 3, "low": 1}, clock=lambda: clock[0])
+    capacity = 10
+    arrivals = {"high": (9, 12), "medium": (6, 2), "low": (2, 1)}  # band: (priority, per tick)
+    enqueued_at = {}
+    max_wait = {"high": 0, "medium": 0, "low": 0}
+    sequence = 0
+
+    for tick in range(2000):
+        now = START + timedelta(seconds=tick)
+        clock[0] = now.timestamp()
+        for band, (priority, rate) in arrivals.items():
+            if band == "low" and tick % 2:
+                continue
+            for _ in range(rate):
+                task_id = f"{band}:{sequence}"
+                sequence += 1
+                enqueued_at[task_id] = tick
+                engine.enqueue(task_id, "cap", priority, now)
+
+        for _ in range(capacity):
+            task_id = engine.dequeue("cap")
+            if task_id is None:
+                break
+            band = task_id.split(":")[0]
+            max_wait[band] = max(max_wait[band], tick - enqueued_at.pop(task_id))
+
+    assert max_wait["medium"] <= 2
+    assert max_wait["low"] <= 2
+    # Overloaded band keeps growing, which is the expected cost
+    assert engine.depth("cap")["high"] > 1000
+
+
+def test_adjust_priority_by_age_boosts_old_tasks_in_one_update():
+    engine = create_engine("sqlite:///:memory:")
+    Task.__table__.create(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(Task.__table__.insert(), [
+            {"task_id": task_id, "client_id": "c", "task_type": "x", "capability_required": "cap",
+             "input_data": {}, "priority": priority, "status": "PENDING",
+             "created_at": now - timedelta(hours=age), "updated_at": now}
+            for task_id, priority, age in (("old", 3, 25), ("old_p8", 8, 25), ("old_p6", 6, 30), ("new", 3, 1))
+        ])
+
+    db = sessionmaker(bind=engine)()
+    assert adjust_priority_by_age(db, max_age_hours=24, persist=False) == 2
+    assert adjust_priority_by_age(db, max_age_hours=24) == 2
+    table = Task.__table__
+    priorities = dict(db.execute(select(table.c.task_id, table.c.priority)).all())
+    assert priorities == {"old": 5, "old_p8": 8, "old_p6": 8, "new": 3}
+    db.close()
+
+
+def test_age_endpoint_runs_the_stored_boost():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Task.__table__.create(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(Task.__table__.insert(), [
+            {"task_id": "old", "client_id": "c", "task_type": "x", "capability_required": "cap",
+             "input_data": {}, "priority": 3, "status": "PENDING",
+             "created_at": now - timedelta(hours=3), "updated_at": now}
+        ])
+
+    def override_get_db():
+        db = sessionmaker(bind=engine)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        dry_run = client.post("/aitp/queue/age?max_age_hours=2&dry_run=true").json()
+        assert (dry_run["boosted"], dry_run["dry_run"]) == (1, True)
+        assert client.post("/aitp/queue/age?max_age_hours=2").json()["boosted"] == 1
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    with engine.connect() as connection:
+        assert connection.execute(select(Task.__table__.c.priority)).scalar() == 5
@@ -0,0 +1,122 @@
+"""Test the heartbeat buffer: incremental gauge, batched flush and health sweep"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from ains.db import Agent
+from ains.heartbeats import HeartbeatBuffer
+from ains.observability.metrics import agents_active
+
+
+@pytest.fixture
+def buffer():
+    buffer = HeartbeatBuffer()
+    buffer.loaded = True
+    return buffer
+
+
+def test_available_count_is_incremental(buffer):
+    buffer.track("a1", "AVAILABLE")
+    buffer.track("a2", "AVAILABLE")
+    buffer.track("a3", "BUSY")
+    assert buffer.available == 2
+    assert agents_active._value.get() == 2
+
+    buffer.track("a1", "INACTIVE")
+    buffer.track("a3", "AVAILABLE")
+    buffer.forget("a2")
+    assert buffer.available == 1
+    assert agents_active._value.get() == 1
+
+
+def test_track_ignored_before_load():
+    buffer = HeartbeatBuffer()
+    buffer.track("a1", "AVAILABLE")
+    assert buffer.stats() == {"agents": 0, "available": 0, "pending_flush": 0}
+
+
+def test_flush_writes_dirty_rows_in_one_batch(buffer):
+    engine = create_engine("sqlite:///:memory:")
+    table = Agent.__table__
+    table.create(engine)
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [
+            {"agent_id": agent_id, "display_name": agent_id, "public_key": "k",
+             "endpoint": "http://x", "signature": "s", "status": "AVAILABLE"}
+            for agent_id in ("a1", "a2", "a3")
+        ])
+
+    seen_at = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    for agent_id in ("a1", "a2", "a3"):
+        buffer.track(agent_id, "AVAILABLE")
+    for agent_id in ("a1", "a3"):
+        buffer.agents[agent_id].last_heartbeat = seen_at
+        buffer.agents[agent_id].dirty = True
+
+    db = sessionmaker(bind=engine)()
+    assert buffer.flush(db) == 2
+    assert buffer.stats()["pending_flush"] == 0
+    assert buffer.flush(db) == 0
+
+    rows = dict(db.execute(select(table.c.agent_id, table.c.last_heartbeat)).all())
+    assert rows["a1"] == rows["a3"] == seen_at.replace(tzinfo=None)
+    assert rows["a2"] is None
+    db.close()
+
+
+def test_flush_leaves_status_changed_elsewhere(buffer):
+    db = _agents_db([("a1", "AVAILABLE", None)])
+    buffer.track("a1", "AVAILABLE")
+    seen_at = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    buffer.agents["a1"].last_heartbeat = seen_at
+    buffer.agents["a1"].dirty = True
+
+    # Another worker marks the agent BUSY after this map read it
+    table = Agent.__table__
+    db.execute(table.update().values(status="BUSY"))
+    db.commit()
+
+    assert buffer.flush(db) == 1
+    row = db.execute(select(table.c.status, table.c.last_heartbeat)).one()
+    assert (row.status, row.last_heartbeat) == ("BUSY", seen_at.replace(tzinfo=None))
+    db.close()
+
+
+def _agents_db(rows):
+    engine = create_engine("sqlite:///:memory:")
+    table = Agent.__table__
+    table.create(engine)
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [
+            {"agent_id": agent_id, "display_name": agent_id, "public_key": "k",
+             "endpoint": "http://x", "signature": "s", "status": status, "last_heartbeat": seen}
+            for agent_id, status, seen in rows
+        ])
+    return sessionmaker(bind=engine)()
+
+
+def test_sweep_marks_stale_agents_in_batches(buffer):
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(hours=1)
+    rows = [(f"stale{i}", "AVAILABLE", old) for i in range(25)]
+    rows += [("fresh", "AVAILABLE", now), ("gone", "INACTIVE", old), ("never", "AVAILABLE", None)]
+    db = _agents_db(rows)
+    for agent_id, status, seen in rows:
+        buffer.track(agent_id, status, seen)
+    # Heartbeat received but not yet flushed: must not be swept
+    buffer.agents["stale0"].last_heartbeat = now
+    buffer.agents["stale0"].dirty = True
+
+    swept = buffer.sweep(db, timedelta(minutes=10), batch_size=10)
+
+    assert sorted(swept) == sorted(f"stale{i}" for i in range(1, 25))
+    table = Agent.__table__
+    statuses = dict(db.execute(select(table.c.agent_id, table.c.status)).all())
+    assert statuses["stale0"] == "AVAILABLE"
+    assert statuses["stale1"] == "INACTIVE"
+    assert statuses["fresh"] == statuses["never"] == "AVAILABLE"
+    assert buffer.available == 3
+    assert buffer.sweep(db, timedelta(minutes=10)) == []
+    db.close()
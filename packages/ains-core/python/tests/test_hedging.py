@@ -0,0 +1,128 @@
+"""Test hedged execution: thresholds, the extra-load budget and first-result-wins claims"""
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from ains.db import Task
+from ains.hedging import HedgeManager, claim_result, hedge_original, hedge_task_id
+from ains.latency_sketch import LatencyTracker
+from ains.task_events import TaskChange
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _change(task_id, old_status, new_status, agent_id=None, capability="image"):
+    return TaskChange(
+        task_id=task_id, old_status=old_status, new_status=new_status, capability=capability,
+        priority=5, created_at=None, assigned_agent_id=agent_id, old_assigned_agent_id=agent_id
+    )
+
+
+def _manager(**kwargs):
+    tracker = LatencyTracker(min_samples=10)
+    for latency in range(1, 101):
+        tracker.record("a1", "image", float(latency * 10))
+    clock = _Clock()
+    manager = HedgeManager(policies={"image": 0.9}, tracker=tracker, clock=clock, **kwargs)
+    return manager, tracker, clock
+
+
+def test_tasks_become_due_past_the_capability_quantile():
+    manager, tracker, clock = _manager(budget_percent=100)
+    assert 890 <= manager.threshold_ms("image", "a1") <= 920
+
+    manager.set_policy("TEXT", 0.99)
+    manager.on_task_change(_change("t1", "PENDING", "ASSIGNED", "a1"))
+    manager.on_task_change(_change("t2", "PENDING", "ASSIGNED", "a1", capability="text"))
+    manager.on_task_change(_change("t3", "PENDING", "ASSIGNED", "a1", capability="code"))
+    assert manager.due() == []
+    clock.now = 0.95
+    assert [task_id for task_id, _ in manager.due()] == ["t1"]
+
+    # Capabilities without enough completions fall back to the agent's advertised p99
+    tracker.advertise("a1", "text", 500.0)
+    assert sorted(task_id for task_id, _ in manager.due()) == ["t1", "t2"]
+
+    # Completed tasks are no longer watched
+    manager.on_task_change(_change("t1", "ACTIVE", "COMPLETED", "a1"))
+    assert [task_id for task_id, _ in manager.due()] == ["t2"]
+
+
+def test_budget_and_copy_bookkeeping():
+    manager, _, _ = _manager(budget_percent=5, burst=2)
+    for i in range(60):
+        manager.on_task_change(_change(f"t{i}", "PENDING", "ASSIGNED", "a1"))
+    assert manager.stats()["tokens"] == 2.0
+    assert manager.stats()["watching"] == 60
+
+    # The original finishing first queues its copy for cancellation
+    manager.hedges["t1"] = hedge_task_id("t1")
+    manager.on_task_change(_change(hedge_task_id("t1"), None, "ASSIGNED", "a2"))
+    manager.on_task_change(_change("t1", "ACTIVE", "COMPLETED", "a1"))
+    assert manager.losers == ["t1-hedge"]
+    assert "t1" not in manager.hedges
+
+    # A copy that fails leaves the original running without a copy
+    manager.hedges["t2"] = hedge_task_id("t2")
+    manager.on_task_change(_change("t2-hedge", "ACTIVE", "FAILED", "a2"))
+    assert "t2" not in manager.hedges and "t2" in manager.watching
+    assert hedge_original("t2-hedge") == "t2" and hedge_original("t2") is None
+
+
+def test_only_the_first_result_is_accepted():
+    engine = create_engine("sqlite:///:memory:")
+    Task.__table__.create(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(Task.__table__.insert(), [
+            {"task_id": "t1", "client_id": "c", "task_type": "x", "capability_required": "image",
+             "input_data": {}, "status": "ACTIVE", "assigned_agent_id": "a1",
+             "created_at": now, "updated_at": now}
+        ])
+
+    db = sessionmaker(bind=engine)()
+    assert claim_result(db, "t1", {"from": "a2"}, now)
+    assert not claim_result(db, "t1", {"from": "a1"}, now)
+    db.commit()
+    row = db.execute(select(Task.__table__.c.status, Task.__table__.c.result_data)).one()
+    assert (row.status, row.result_data) == ("COMPLETED", {"from": "a2"})
+    db.close()
+
+
+def test_tasks_opt_in_or_out_through_metadata():
+    manager, _, clock = _manager(budget_percent=100)
+    manager.set_policy("image", None)
+    opted_in = _change("t1", "PENDING", "ASSIGNED", "a1")
+    opted_in.metadata = {"hedge": 0.9}
+    manager.on_task_change(opted_in)
+    manager.on_task_change(_change("t2", "PENDING", "ASSIGNED", "a1"))
+
+    manager.set_policy("image", 0.5)
+    opted_out = _change("t3", "PENDING", "ASSIGNED", "a1")
+    opted_out.metadata = {"hedge": False}
+    manager.on_task_change(opted_out)
+    clock.now = 0.95
+    assert [task_id for task_id, _ in manager.due()] == ["t1"]
+    assert manager.quantile_for("image", {"hedge": 1.5}) == 0.5
+
+
+def test_hedge_win_is_sampled_once_under_the_winning_agent():
+    tracker = LatencyTracker(min_samples=1)
+    started = datetime(2025, 1, 1, 12, 0, 50, tzinfo=timezone.utc)
+    completed = datetime(2025, 1, 1, 12, 1, 0, tzinfo=timezone.utc)
+    # settle() completes the original under the copy's agent and start time
+    for task_id in ("t1", "t1-hedge"):
+        tracker.on_task_change(TaskChange(
+            task_id=task_id, old_status="ACTIVE", new_status="COMPLETED", capability="image",
+            priority=5, created_at=None, assigned_agent_id="fast", started_at=started, completed_at=completed
+        ))
+    assert ("slow", "image") not in tracker.sketches
+    assert tracker.sketches[("fast", "image")].count == 1
+    assert tracker.capability_sketches["image"].count == 1
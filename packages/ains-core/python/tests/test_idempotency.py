@@ -0,0 +1,76 @@
+"""Test idempotency keys: replay from memory and database, fingerprints, failures and expiry"""
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from ains.db import IdempotencyRecord
+from ains.idempotency import IdempotencyInProgress, IdempotencyKeyReused, IdempotencyStore
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    IdempotencyRecord.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _run(store, db, body, handler, key="k1", **kwargs):
+    return store.run(db, "tasks", "client", key, body, handler, lambda value: value, **kwargs)
+
+
+def test_retries_replay_the_first_response(db):
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return {"task_id": f"task_{len(calls)}"}
+
+    store = IdempotencyStore()
+    assert _run(store, db, {"a": 1, "b": 2}, handler) == ({"task_id": "task_1"}, False)
+    assert _run(store, db, {"b": 2, "a": 1}, handler) == ({"task_id": "task_1"}, True)
+
+    # Another worker (or a restart) replays from the table
+    restarted = IdempotencyStore()
+    assert _run(restarted, db, {"a": 1, "b": 2}, handler) == ({"task_id": "task_1"}, True)
+    assert len(calls) == 1
+    assert restarted.stats()["replayed_db"] == 1 and store.stats()["replayed_memory"] == 1
+
+    with pytest.raises(IdempotencyKeyReused):
+        _run(store, db, {"a": 2}, handler)
+    # Keys are scoped per client
+    assert store.run(db, "tasks", "other", "k1", {"a": 2}, handler, lambda value: value)[1] is False
+
+
+def test_failed_requests_do_not_hold_the_key(db):
+    store = IdempotencyStore()
+
+    def failing():
+        raise ValueError("validation failed")
+
+    with pytest.raises(ValueError):
+        _run(store, db, {"a": 1}, failing)
+    assert _run(store, db, {"a": 1}, lambda: {"success": False}, store_if=lambda r: r["success"])[1] is False
+    assert _run(store, db, {"a": 1}, lambda: {"success": True}) == ({"success": True}, False)
+
+    # A retry racing the original request is turned away
+    record_key = store.record_key("tasks", "client", "k2")
+    assert store.lookup(db, record_key, "fp") is None
+    with pytest.raises(IdempotencyInProgress):
+        store.lookup(db, record_key, "fp")
+    store.release(record_key)
+    assert store.lookup(db, record_key, "fp") is None
+
+
+def test_expired_responses_are_not_replayed_and_get_purged(db):
+    store = IdempotencyStore(ttl_seconds=0)
+    assert _run(store, db, {"a": 1}, lambda: {"n": 1}) == ({"n": 1}, False)
+    assert _run(store, db, {"a": 1}, lambda: {"n": 2}) == ({"n": 2}, False)
+
+    table = IdempotencyRecord.__table__
+    assert db.execute(select(table.c.response)).scalar_one() == {"n": 2}
+    store.last_purge = None
+    assert store.maybe_purge(db) == 1
+    assert store.maybe_purge(db) is None
+    assert db.execute(select(func.count()).select_from(table)).scalar() == 0
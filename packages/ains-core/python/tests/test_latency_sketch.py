@@ -0,0 +1,97 @@
+"""Test latency sketches and SLO-aware agent selection"""
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from ains.advanced_features import route_slo_aware, task_deadline_ms
+from ains.db import Agent, Capability, Task
+from ains.latency_sketch import DDSketch, LatencyTracker
+from ains.task_events import TaskChange
+
+
+def test_sketch_quantiles_stay_within_relative_accuracy():
+    rng = random.Random(5)
+    values = sorted(rng.lognormvariate(4, 1) for _ in range(20000))
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    assert sketch.count == 20000
+    assert DDSketch().quantile(0.99) is None
+
+    # Bucket cap merges the low end and keeps the tail exact-ish
+    small = DDSketch(relative_accuracy=0.01, max_buckets=200)
+    for value in values:
+        small.add(value)
+    assert len(small.buckets) <= 200
+    assert small.quantile(0.99) == pytest.approx(sketch.quantile(0.99))
+
+
+def test_choose_prefers_lowest_p99_within_deadline_and_uses_advertised_slos():
+    tracker = LatencyTracker(min_samples=5, explore_rate=0.0)
+    for _ in range(10):
+        tracker.record("fast", "text", 100)
+        tracker.record("slow", "text", 900)
+    # Cold agent: only its advertised SLO counts
+    tracker.record("cold", "text", 10)
+    tracker.advertise("cold", "text", 400, 99.0)
+
+    assert tracker.predict_p99_ms("cold", "text") == 400
+    assert tracker.choose("text", ["fast", "slow", "cold"], deadline_ms=1000) == "fast"
+    assert tracker.choose("text", ["slow", "cold"], deadline_ms=500) == "cold"
+    # Nobody meets the deadline: best effort
+    assert tracker.choose("text", ["slow", "cold"], deadline_ms=50) == "cold"
+    # No data at all: explore
+    assert tracker.choose("text", ["new"]) == "new"
+    assert tracker.choose("text", []) is None
+
+    summary = tracker.agent_summary("cold")["text"]
+    assert summary["advertised_p99_ms"] == 400 and not summary["warm"]
+    assert summary["observed"]["count"] == 1
+
+
+def test_completions_feed_sketches_and_route_slo_aware():
+    tracker = LatencyTracker(min_samples=1, explore_rate=0.0)
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for agent_id, seconds in (("a1", 2.0), ("a2", 0.5)):
+        tracker.on_task_change(TaskChange(
+            task_id="t", old_status="ACTIVE", new_status="COMPLETED", capability="text", priority=5,
+            created_at=None, assigned_agent_id=agent_id, old_assigned_agent_id=agent_id,
+            started_at=started.replace(tzinfo=None), completed_at=started + timedelta(seconds=seconds)
+        ))
+    assert tracker.predict_p99_ms("a2", "text") == pytest.approx(500, rel=0.01)
+
+    engine = create_engine("sqlite:///:memory:")
+    Agent.__table__.create(engine)
+    Task.__table__.create(engine)
+    Capability.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(Agent.__table__.insert(), [
+            {"agent_id": agent_id, "display_name": agent_id, "public_key": "k",
+             "endpoint": "http://x", "signature": "s", "tags": ["text"]}
+            for agent_id in ("a1", "a2")
+        ])
+    db = sessionmaker(bind=engine)()
+
+    import ains.advanced_features as advanced_features
+    original = advanced_features.latency_tracker
+    advanced_features.latency_tracker = tracker
+    try:
+        task = SimpleNamespace(capability_required="text", timeout_seconds=1, expires_at=None)
+        assert task_deadline_ms(task) == 1000
+        assert route_slo_aware(db, task) == "a2"
+        assigned = db.execute(
+            select(Agent.__table__.c.last_assigned_at).where(Agent.__table__.c.agent_id == "a2")
+        ).scalar()
+        assert assigned is not None
+        assert route_slo_aware(db, SimpleNamespace(capability_required="image", timeout_seconds=None, expires_at=None)) is None
+    finally:
+        advanced_features.latency_tracker = original
+    db.close()
@@ -0,0 +1,125 @@
+"""Test long-poll waiters and lease reaping of the lease manager"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from ains import task_events
+from ains.db import Task
+from ains.leasing import LeaseManager
+from ains.task_events import TaskChange
+
+
+class QueueBackedLeases(LeaseManager):
+    """Lease manager whose lease() pops from a list instead of the database"""
+
+    def __init__(self):
+        super().__init__()
+        self.available = []
+
+    def lease(self, db, agent_id, capabilities, max_tasks=1, visibility_timeout=None):
+        taken, self.available = self.available[:max_tasks], self.available[max_tasks:]
+        return taken
+
+
+def _pending(task_id, capability):
+    return TaskChange(task_id=task_id, old_status=None, new_status="PENDING",
+                      capability=capability, priority=5, created_at=None)
+
+
+def test_wait_times_out_without_work():
+    manager = QueueBackedLeases()
+    started = time.monotonic()
+    tasks = asyncio.run(manager.wait_for_tasks(None, "agent", ["echo"], wait_seconds=0.2))
+    assert tasks == []
+    assert time.monotonic() - started < 2
+    assert manager.waiting() == {}
+
+
+def test_task_event_wakes_waiter_from_another_thread():
+    manager = QueueBackedLeases()
+
+    def submit():
+        time.sleep(0.2)
+        manager.available.append("t1")
+        manager.on_task_change(_pending("t1", "ECHO"))
+
+    async def poll():
+        threading.Thread(target=submit).start()
+        started = time.monotonic()
+        tasks = await manager.wait_for_tasks(None, "agent", ["echo"], wait_seconds=10)
+        return tasks, time.monotonic() - started
+
+    tasks, elapsed = asyncio.run(poll())
+    assert tasks == ["t1"]
+    # Woken by the event, not by the timeout
+    assert elapsed < 5
+
+
+def test_other_capabilities_do_not_wake():
+    manager = QueueBackedLeases()
+
+    async def poll():
+        waiter = asyncio.ensure_future(manager.wait_for_tasks(None, "agent", ["echo"], wait_seconds=0.3))
+        await asyncio.sleep(0.05)
+        assert manager.waiting() == {"cap:echo": 1, "agent:agent": 1}
+        manager.on_task_change(_pending("t2", "translate"))
+        return await waiter
+
+    assert asyncio.run(poll()) == []
+
+
+def test_pushed_assignment_wakes_agent():
+    manager = QueueBackedLeases()
+
+    async def poll():
+        waiter = asyncio.ensure_future(manager.wait_for_tasks(None, "agent", ["echo"], wait_seconds=10))
+        await asyncio.sleep(0.05)
+        manager.available.append("t3")
+        manager.on_task_change(TaskChange(
+            task_id="t3", old_status="PENDING", new_status="ASSIGNED", capability="echo",
+            priority=5, created_at=None, assigned_agent_id="agent"
+        ))
+        return await asyncio.wait_for(waiter, timeout=5)
+
+    assert asyncio.run(poll()) == ["t3"]
+
+
+def test_reaper_requeues_expired_leases_until_retries_run_out():
+    engine = create_engine("sqlite:///:memory:")
+    Task.__table__.create(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(Task.__table__.insert(), [
+            {"task_id": task_id, "client_id": "c", "task_type": "x", "capability_required": "echo",
+             "input_data": {}, "status": "ACTIVE", "assigned_agent_id": "a1", "started_at": now,
+             "retry_count": retry_count, "max_retries": 2, "lease_expires_at": now + lease,
+             "created_at": now, "updated_at": now}
+            for task_id, retry_count, lease in [
+                ("retry", 1, timedelta(seconds=-5)), ("spent", 2, timedelta(seconds=-5)),
+                ("live", 2, timedelta(minutes=5))
+            ]
+        ])
+
+    changes = []
+    task_events.subscribe(changes.append)
+    db = sessionmaker(bind=engine)()
+    try:
+        assert LeaseManager().reap_expired(db) == 2
+    finally:
+        task_events.unsubscribe(changes.append)
+
+    table = Task.__table__
+    rows = {row.task_id: row for row in db.execute(select(table)).all()}
+    assert (rows["retry"].status, rows["retry"].retry_count, rows["retry"].assigned_agent_id) == ("PENDING", 2, None)
+    assert rows["spent"].status == "FAILED" and rows["spent"].completed_at is not None
+    assert "no retries" in rows["spent"].error_message
+    assert rows["live"].status == "ACTIVE"
+    assert sorted((c.task_id, c.old_status, c.new_status, c.old_assigned_agent_id) for c in changes) == [
+        ("retry", "ACTIVE", "PENDING", "a1"), ("spent", "ACTIVE", "FAILED", "a1")
+    ]
+    assert LeaseManager().reap_expired(db) == 0
+    db.close()
@@ -0,0 +1,202 @@
+"""Test the agent load index: bucket queue, task-event counters and reconciliation"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ains.db import Agent, Capability, Task
+from ains.fair_queue import fair_queue
+from ains.load_index import LoadIndex, load_index
+from ains.routing import route_pending_tasks
+from ains.task_events import TaskChange
+
+
+def _index(agents):
+    index = LoadIndex()
+    index.loaded = True
+    for agent_id, tags in agents:
+        index.track_agent(agent_id, tags)
+    return index
+
+
+def _change(old_status, new_status, agent_id=None, old_agent_id=None):
+    return TaskChange(
+        task_id="t", old_status=old_status, new_status=new_status, capability="text",
+        priority=5, created_at=None, assigned_agent_id=agent_id, old_assigned_agent_id=old_agent_id
+    )
+
+
+def test_least_loaded_follows_loads_and_rotates_ties():
+    index = _index([("a1", ["text"]), ("a2", ["text", "code"]), ("a3", ["code"])])
+
+    assert [index.least_loaded("text") for _ in range(3)] == ["a1", "a2", "a1"]
+    index.adjust("a1", 2)
+    index.adjust("a2", 1)
+    assert index.least_loaded("text") == "a2"
+    assert index.least_loaded("code") == "a3"
+    index.adjust("a2", -1)
+    index.adjust("a3", 3)
+    assert index.least_loaded("code") == "a2"
+    assert index.least_loaded("image") is None
+
+    index.forget_agent("a2")
+    assert index.least_loaded("text") == "a1"
+    assert index.stats() == {"agents": 2, "capabilities": 2, "inflight": 5, "saturated": 0}
+
+
+def test_task_changes_move_inflight_counts():
+    index = _index([("a1", ["text"]), ("a2", ["text"])])
+
+    index.on_task_change(_change(None, "PENDING"))
+    index.on_task_change(_change("PENDING", "ASSIGNED", "a1", None))
+    index.on_task_change(_change("PENDING", "ASSIGNED", "a1", None))
+    index.on_task_change(_change("ASSIGNED", "ACTIVE", "a1", "a1"))
+    assert index.load("a1") == 2
+
+    # Reassignment, completion, cancellation and deletion
+    index.on_task_change(_change("ACTIVE", "ASSIGNED", "a2", "a1"))
+    assert (index.load("a1"), index.load("a2")) == (1, 1)
+    index.on_task_change(_change("ASSIGNED", "COMPLETED", "a2", "a2"))
+    index.on_task_change(_change("ACTIVE", "CANCELLED", "a1", "a1"))
+    index.on_task_change(_change("ASSIGNED", None, "a1", "a1"))
+    assert (index.load("a1"), index.load("a2")) == (0, 0)
+
+
+def test_reconcile_replaces_drifted_counts_with_one_query():
+    engine = create_engine("sqlite:///:memory:")
+    Agent.__table__.create(engine)
+    Task.__table__.create(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(Agent.__table__.insert(), [
+            {"agent_id": agent_id, "display_name": agent_id, "public_key": "k",
+             "endpoint": "http://x", "signature": "s", "tags": ["text"]}
+            for agent_id in ("a1", "a2", "a3")
+        ])
+        connection.execute(Task.__table__.insert(), [
+            {"task_id": f"t{i}", "client_id": "c", "task_type": "x", "capability_required": "text",
+             "input_data": {}, "status": status, "assigned_agent_id": agent_id,
+             "created_at": now, "updated_at": now}
+            for i, (status, agent_id) in enumerate([
+                ("ASSIGNED", "a1"), ("ACTIVE", "a1"), ("COMPLETED", "a1"),
+                ("ACTIVE", "a2"), ("PENDING", None), ("FAILED", "a3")
+            ])
+        ])
+
+    db = sessionmaker(bind=engine)()
+    index = LoadIndex()
+    index.load_from_db(db)
+    assert (index.load("a1"), index.load("a2"), index.load("a3")) == (2, 1, 0)
+    assert index.least_loaded("text") == "a3"
+
+    # Drift from writes that bypassed task events
+    index.adjust("a3", 4)
+    index.adjust("a1", -2)
+    assert index.reconcile(db) == 2
+    assert (index.load("a1"), index.load("a3")) == (2, 0)
+    assert index.maybe_reconcile(db) is None
+    db.close()
+
+
+def test_declared_slots_gate_selection_and_free_slots():
+    index = LoadIndex(default_max_concurrency=2)
+    index.loaded = True
+    index.track_agent("small", ["text"])
+    index.track_agent("gpu", ["text"], max_concurrency=64)
+
+    index.adjust("small", 2)
+    assert index.free_slots("small") == 0
+    assert [index.least_loaded("text") for _ in range(3)] == ["gpu"] * 3
+    index.adjust("gpu", 63)
+    assert index.free_slots("gpu") == 1
+    index.adjust("gpu", 1)
+    assert index.least_loaded("text") is None
+    assert index.stats()["saturated"] == 2
+
+    # A task finishing frees a slot; a heartbeat can re-declare the limit
+    index.adjust("small", -1)
+    assert index.least_loaded("text") == "small"
+    assert index.set_max_concurrency("gpu", 128)
+    assert not index.set_max_concurrency("gpu", 128)
+    assert index.free_slots("gpu") == 64
+    assert index.least_loaded("text") == "small"
+    assert index.free_slots("unknown") == 2
+    assert LoadIndex(default_max_concurrency=None).free_slots("unknown") > 10**6
+
+
+def _routing_db(agents, tasks):
+    """Agents as (agent_id, status, trust), tasks as (task_id, client_id, expires_at), all capable of ocr"""
+    engine = create_engine("sqlite:///:memory:")
+    for table in (Agent.__table__, Capability.__table__, Task.__table__):
+        table.create(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        if agents:
+            connection.execute(Agent.__table__.insert(), [
+                {"agent_id": agent_id, "display_name": agent_id, "public_key": "k",
+                 "endpoint": "http://x", "signature": "s", "tags": ["ocr"], "status": status,
+                 "trust_score": trust, "max_concurrency": 2}
+                for agent_id, status, trust in agents
+            ])
+            connection.execute(Capability.__table__.insert(), [
+                {"capability_id": f"cap-{agent_id}", "agent_id": agent_id, "name": "ocr",
+                 "version": "1.0", "input_schema": {}, "output_schema": {}}
+                for agent_id, _, _ in agents
+            ])
+        connection.execute(Task.__table__.insert(), [
+            {"task_id": task_id, "client_id": client_id, "task_type": "ocr", "capability_required": "ocr",
+             "input_data": {}, "priority": 5, "status": "PENDING", "expires_at": expires_at,
+             "created_at": now, "updated_at": now}
+            for task_id, client_id, expires_at in tasks
+        ])
+
+    db = sessionmaker(bind=engine)()
+    fair_queue.load_from_db(db)
+    load_index.load_from_db(db)
+    return db
+
+
+def _task_rows(db):
+    table = Task.__table__
+    return db.execute(table.select().order_by(table.c.task_id)).all()
+
+
+def test_route_pending_tasks_fills_online_agent_slots():
+    db = _routing_db(
+        [("offline", "INACTIVE", 0.99), ("busy", "BUSY", 0.9)],
+        [(f"t{i}", "c", None) for i in range(3)]
+    )
+
+    # BUSY agents still take work up to their slots; INACTIVE ones get none
+    assert route_pending_tasks(db, limit=10) == 2
+    assert [(row.status, row.assigned_agent_id) for row in _task_rows(db)] == [
+        ("ASSIGNED", "busy"), ("ASSIGNED", "busy"), ("PENDING", None)
+    ]
+    db.close()
+
+
+def test_routing_without_agents_leaves_the_queue_untouched():
+    db = _routing_db([("offline", "INACTIVE", 0.99)], [("t0", "tenant", None)])
+
+    for _ in range(3):
+        assert route_pending_tasks(db, limit=10) == 0
+
+    # No dispatch wait was recorded and the task is still queued
+    [stats] = [row for row in fair_queue.tenant_stats() if row["client_id"] == "tenant"]
+    assert stats["queued"] == 1
+    assert stats["dequeued"] == 0
+    db.close()
+
+
+def test_routing_fails_expired_tasks():
+    expired = datetime.now(timezone.utc) - timedelta(minutes=1)
+    db = _routing_db([("a1", "AVAILABLE", 0.9)], [("t0", "c", expired), ("t1", "c", None)])
+
+    assert route_pending_tasks(db, limit=10) == 1
+    rows = _task_rows(db)
+    assert [(row.task_id, row.status, row.assigned_agent_id) for row in rows] == [
+        ("t0", "FAILED", None), ("t1", "ASSIGNED", "a1")
+    ]
+    assert rows[0].error_message == "Task expired"
+    assert fair_queue.depth("ocr") == {"high": 0, "medium": 0, "low": 0}
+    db.close()
@@ -0,0 +1,74 @@
+"""Test bounded-cardinality metrics: top-K labelling and the "other" bucket"""
+from prometheus_client import CollectorRegistry, generate_latest
+
+from ains.observability.cardinality import (
+    BoundedCounter, BoundedGauge, BoundedHistogram, TopKSelector, OTHER_LABEL
+)
+
+
+def _registry(limit):
+    registry = CollectorRegistry()
+    selector = TopKSelector(limit, refresh_seconds=0)
+    completed = BoundedCounter('t_completed', 'Completed', ['task_type', 'agent_id'],
+                               key_label='agent_id', selector=selector, registry=registry)
+    trust = BoundedGauge('t_trust', 'Trust', ['agent_id', 'display_name'], key_label='agent_id',
+                         selector=selector, key_attributes=('display_name',), registry=registry)
+    return registry, completed, trust
+
+
+def test_only_top_k_keys_are_labelled():
+    registry, completed, trust = _registry(limit=2)
+    for agent_id, count in (("busy", 10), ("steady", 5), ("idle1", 1), ("idle2", 2)):
+        completed.labels(task_type="echo", agent_id=agent_id).inc(count)
+        trust.labels(agent_id=agent_id, display_name=agent_id.upper()).set(0.5)
+
+    samples = {labels: value for labels, value in completed.samples()}
+    assert samples == {
+        ("echo", "busy"): 10,
+        ("echo", "steady"): 5,
+        ("echo", OTHER_LABEL): 3,
+    }
+    text = generate_latest(registry).decode()
+    assert 't_trust{agent_id="other",display_name="other"} 0.5' in text
+    assert "idle1" not in text
+
+
+def test_membership_follows_volume():
+    registry, completed, _ = _registry(limit=1)
+    completed.labels(task_type="echo", agent_id="early").inc()
+    assert [labels[1] for labels, _ in completed.samples()] == ["early"]
+
+    completed.labels(task_type="echo", agent_id="late").inc(5)
+    samples = dict(completed.samples())
+    assert samples[("echo", "late")] == 5
+    assert samples[("echo", OTHER_LABEL)] == 1
+
+
+def test_gauge_keeps_one_series_per_key():
+    _, _, trust = _registry(limit=5)
+    trust.labels(agent_id="a1", display_name="old").set(0.4)
+    trust.labels(agent_id="a1", display_name="new").set(0.7)
+    assert trust.samples() == [(("a1", "new"), 0.7)]
+
+
+def test_tenant_gauges_and_histograms_fold_into_other():
+    registry = CollectorRegistry()
+    selector = TopKSelector(1, refresh_seconds=0)
+    depth = BoundedGauge('t_depth', 'Depth', ['client_id'], key_label='client_id',
+                         selector=selector, fold_sum=True, registry=registry)
+    wait = BoundedHistogram('t_wait', 'Wait', ['client_id'], key_label='client_id',
+                            selector=selector, buckets=(1, 10), registry=registry)
+    selector.observe("big", 100)
+    for client_id, queued in (("big", 7), ("small1", 2), ("small2", 3)):
+        depth.labels(client_id=client_id).set(queued)
+    for client_id, seconds in (("big", 0.5), ("small1", 5), ("small2", 50), ("small2", 0.2)):
+        wait.labels(client_id=client_id).observe(seconds)
+
+    assert dict(depth.samples()) == {("big",): 7, (OTHER_LABEL,): 5}
+    text = generate_latest(registry).decode()
+    assert 't_wait_bucket{client_id="other",le="1.0"} 1.0' in text
+    assert 't_wait_bucket{client_id="other",le="10.0"} 2.0' in text
+    assert 't_wait_bucket{client_id="other",le="+Inf"} 3.0' in text
+    assert 't_wait_count{client_id="other"} 3.0' in text
+    assert 't_wait_sum{client_id="big"} 0.5' in text
+    assert "small" not in text
@@ -0,0 +1,61 @@
+"""Test the Prometheus middleware: route-template labels and the unmatched-path cap"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ains.observability.metrics import http_requests_total
+from ains.observability.middleware import PrometheusMiddleware, RouteTemplates, UNMATCHED_LABEL
+
+
+def _app(max_unmatched_paths=2):
+    app = FastAPI()
+
+    @app.get("/mw/tasks/{task_id}")
+    def get_task(task_id: str):
+        return {"task_id": task_id}
+
+    @app.get("/mw/health")
+    def health():
+        return {"ok": True}
+
+    app.add_middleware(PrometheusMiddleware, max_unmatched_paths=max_unmatched_paths)
+    return app
+
+
+def _count(endpoint, status_code="200"):
+    for metric in http_requests_total.collect():
+        for sample in metric.samples:
+            labels = sample.labels
+            if sample.name.endswith("_total") and labels["endpoint"] == endpoint \
+                    and labels["status_code"] == status_code:
+                return sample.value
+    return 0
+
+
+def test_requests_labelled_by_route_template():
+    client = TestClient(_app())
+    for task_id in ("a", "b", "c"):
+        assert client.get(f"/mw/tasks/{task_id}").status_code == 200
+    client.get("/mw/health")
+
+    assert _count("/mw/tasks/{task_id}") == 3
+    assert _count("/mw/health") == 1
+    assert _count("/mw/tasks/a") == 0
+
+
+def test_unmatched_paths_are_capped():
+    client = TestClient(_app(max_unmatched_paths=2))
+    for i in range(5):
+        assert client.get(f"/mw/unknown/{i}").status_code == 404
+
+    assert _count("/mw/unknown/0", "404") == 1
+    assert _count("/mw/unknown/1", "404") == 1
+    assert _count("/mw/unknown/4", "404") == 0
+    assert _count(UNMATCHED_LABEL, "404") >= 3
+
+
+def test_route_templates_resolve():
+    app = _app()
+    templates = RouteTemplates(app.router.routes)
+    assert templates.resolve("/mw/tasks/xyz") == "/mw/tasks/{task_id}"
+    assert templates.resolve("/mw/health") == "/mw/health"
+    assert templates.resolve("/mw/tasks/xyz/extra") is None
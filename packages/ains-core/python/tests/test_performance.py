@@ -89,6 +89,36 @@ def test_cleanup_old_data():
     db.close()
 
 
+def test_stats_snapshot_shares_computation(monkeypatch):
+    """Concurrent callers within the TTL share one stats computation"""
+    import threading
+    import time
+    from ains import performance
+
+    calls = []
+
+    def fake_stats(db):
+        calls.append(1)
+        time.sleep(0.05)
+        return {"tasks": {"total": len(calls)}}
+
+    monkeypatch.setattr(performance, "get_system_stats", fake_stats)
+    snapshot = performance.StatsSnapshot(ttl_seconds=60)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(snapshot.get(None))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result == {"tasks": {"total": 1}} for result in results)
+
+    snapshot.invalidate()
+    assert snapshot.get(None) == {"tasks": {"total": 2}}
+
+
 @pytest.fixture(scope="module", autouse=True)
 def cleanup():
     yield
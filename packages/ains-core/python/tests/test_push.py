@@ -0,0 +1,97 @@
+"""Test the agent push hub: sequencing, replay, resync and backpressure"""
+import asyncio
+import threading
+
+from ains.push import PushHub, parse_last_event_id
+from ains.task_events import TaskChange
+
+
+def _change(status, old_status, agent_id=None, old_agent_id=None):
+    return TaskChange(task_id="t1", old_status=old_status, new_status=status, capability="echo",
+                      priority=5, created_at=None, client_id="c",
+                      assigned_agent_id=agent_id, old_assigned_agent_id=old_agent_id)
+
+
+def test_live_delivery_in_order():
+    hub = PushHub()
+
+    async def run():
+        connection, replay, resync = hub.connect("a1")
+        assert replay == [] and resync is False
+        hub.publish("a1", "task.assigned", {"task_id": "t1"})
+        # Published from another thread, as sync endpoints do
+        thread = threading.Thread(target=hub.publish, args=("a1", "task.cancelled", {"task_id": "t1"}))
+        thread.start()
+        thread.join()
+        first = await connection.next_event(timeout=2)
+        second = await connection.next_event(timeout=2)
+        hub.disconnect(connection)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first.seq, first.type) == (1, "task.assigned")
+    assert (second.seq, second.type) == (2, "task.cancelled")
+    assert hub.stats()["connections"] == 0
+
+
+def test_resume_replays_missed_events():
+    hub = PushHub(buffer_size=10)
+    for i in range(5):
+        hub.publish("a1", "task.assigned", {"task_id": f"t{i}"})
+
+    async def run():
+        return hub.connect("a1", last_seq=3, epoch=hub.epoch)
+
+    _, replay, resync = asyncio.run(run())
+    assert [event.seq for event in replay] == [4, 5]
+    assert resync is False
+
+
+def test_resync_when_buffer_overrun_or_epoch_changed():
+    hub = PushHub(buffer_size=3)
+    for i in range(10):
+        hub.publish("a1", "task.assigned", {"task_id": f"t{i}"})
+
+    async def run():
+        overrun = hub.connect("a1", last_seq=2, epoch=hub.epoch)
+        restarted = hub.connect("a1", last_seq=9, epoch="previous")
+        return overrun, restarted
+
+    (_, replay, overrun), (_, _, restarted) = asyncio.run(run())
+    assert [event.seq for event in replay] == [8, 9, 10]
+    assert overrun is True
+    assert restarted is True
+
+
+def test_slow_consumer_is_dropped():
+    hub = PushHub(max_queue=3)
+
+    async def run():
+        connection, _, _ = hub.connect("a1")
+        for i in range(5):
+            hub.publish("a1", "task.assigned", {"task_id": f"t{i}"})
+        await asyncio.sleep(0.05)
+        return connection, await connection.next_event(timeout=1)
+
+    connection, event = asyncio.run(run())
+    # The queue is cleared and closed instead of growing
+    assert event is None
+    assert connection.overflowed
+
+
+def test_task_changes_become_events():
+    hub = PushHub()
+    hub.on_task_change(_change("ASSIGNED", "PENDING", agent_id="a1"))
+    hub.on_task_change(_change("CANCELLED", "ASSIGNED", agent_id="a1"))
+    hub.on_task_change(_change("CANCELLED", "PENDING"))  # never assigned: nobody to tell
+
+    events = list(hub.streams["a1"].buffer)
+    assert [event.type for event in events] == ["task.assigned", "task.cancelled"]
+    assert events[0].data["capability"] == "echo"
+    assert list(hub.streams) == ["a1"]
+
+
+def test_parse_last_event_id():
+    assert parse_last_event_id("abc:12") == ("abc", 12)
+    assert parse_last_event_id("abc:x") == (None, None)
+    assert parse_last_event_id(None) == (None, None)
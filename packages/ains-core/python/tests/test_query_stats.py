@@ -0,0 +1,71 @@
+"""Test query instrumentation: fingerprints, slow-query log and per-request budget"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from ains.observability.query_stats import QueryStats, fingerprint, redact
+
+
+def test_fingerprint_normalizes_values_and_in_lists():
+    a = fingerprint("SELECT * FROM agents WHERE agent_id IN (?, ?, ?) AND status = 'ACTIVE' LIMIT 10")
+    b = fingerprint("SELECT *   FROM agents\nWHERE agent_id IN (?, ?) AND status = 'BUSY' LIMIT 50")
+    assert a == b
+    assert a.text == "SELECT * FROM agents WHERE agent_id IN (?+) AND status = ? LIMIT ?"
+    assert (a.query_type, a.table) == ("SELECT", "agents")
+    assert fingerprint("UPDATE scheduled_tasks SET status=%(status)s").table == "scheduled_tasks"
+
+
+def test_redact_keeps_only_types():
+    assert redact(("secret", 3)) == ["<str>", "<int>"]
+    assert redact({"token": "secret"}) == {"token": "<str>"}
+    assert redact([{"a": 1}, {"a": 2}]) == {"rows": 2, "first": {"a": "<int>"}}
+
+
+def test_statements_are_timed_and_slow_ones_logged():
+    stats = QueryStats(slow_threshold_ms=0, ring_size=3)
+    engine = create_engine("sqlite:///:memory:")
+    stats.instrument(engine)
+    stats.instrument(engine)  # idempotent
+
+    with engine.connect() as connection:
+        for i in range(5):
+            connection.execute(text("SELECT :value"), {"value": f"secret{i}"})
+
+    slow = stats.slow_queries()
+    assert len(slow) == 3
+    assert slow[0]["parameters"] == ["<str>"]
+    assert "secret" not in repr(slow)
+    [top] = [fp for fp in stats.top_fingerprints() if fp["statement"] == "SELECT ?"]
+    assert top["count"] == 5
+
+
+def test_failed_statements_leave_no_state_on_the_connection():
+    stats = QueryStats()
+    engine = create_engine("sqlite:///:memory:")
+    stats.instrument(engine)
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+        connection.execute(text("SELECT 1"))
+        assert "ains_query_start" not in connection.info
+
+    [top] = [fp for fp in stats.top_fingerprints() if fp["statement"] == "SELECT ?"]
+    assert top["count"] == 1
+
+
+def test_query_budget_counts_per_request(capsys):
+    stats = QueryStats(query_budget=2)
+    token = stats.begin_request("/ains/agents")
+    for _ in range(3):
+        stats.record("SELECT * FROM agents WHERE agent_id = ?", ("a1",), 0.001)
+    request = stats.end_request(token, "GET")
+
+    assert request.count == 3
+    assert stats.budget_warnings == 1
+    assert "GET /ains/agents ran 3 queries" in capsys.readouterr().out
+
+    # Outside a request nothing is counted
+    stats.record("SELECT 1", (), 0.001)
+    assert stats.budget_warnings == 1
@@ -0,0 +1,163 @@
+"""Test the result cache: content keys, TTL hits, in-flight coalescing and bounded LRU storage"""
+import os
+import secrets
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from ains import api, task_events
+from ains.api import app
+from ains.db import Agent, Capability, Task, get_db
+from ains.fair_queue import fair_queue
+from ains.load_index import load_index
+from ains.result_cache import ResultCache, canonical_hash, capability_version
+from ains.task_events import TaskChange
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _response(task_id, result=None):
+    return {"task_id": task_id, "status": "PENDING", "result_data": result}
+
+
+def test_keys_ignore_key_order_but_not_versions_or_clients():
+    cache = ResultCache(policies={"Embedding": 60})
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": "1"})
+    assert capability_version(["2.0", None, "1.0", "2.0"]) == ",1.0,2.0"
+
+    assert cache.ttl_for("EMBEDDING") == 60
+    assert cache.key("Embedding", "c1", "1.0", {"x": 1}) == cache.key("embedding", "c1", "1.0", {"x": 1})
+    assert cache.key("embedding", "c1", "1.0", {"x": 1}) != cache.key("embedding", "c1", "2.0", {"x": 1})
+    assert cache.key("embedding", "c1", "1.0", {"x": 1}) != cache.key("embedding", "c2", "1.0", {"x": 1})
+
+
+def test_running_tasks_coalesce_then_results_hit_until_ttl():
+    clock = _Clock()
+    cache = ResultCache(policies={"ocr": 60}, clock=clock)
+    key = cache.key("ocr", "c1", "1", {"file": "a.png"})
+    assert cache.lookup(key) == (None, None)
+
+    cache.track(key, "t1", _response("t1"))
+    assert cache.lookup(key) == (None, "t1")
+    assert cache.complete("t1", {"status": "COMPLETED", "result_data": {"text": "hi"}})
+    assert not cache.complete("t1", {"status": "COMPLETED"})
+    cached, running = cache.lookup(key)
+    assert running is None and cached["task_id"] == "t1" and cached["result_data"] == {"text": "hi"}
+
+    clock.now = 61
+    assert cache.lookup(key) == (None, None)
+
+    # A failed task is no longer coalesced onto
+    cache.track(key, "t2", _response("t2"))
+    cache.on_task_change(TaskChange(
+        task_id="t2", old_status="ACTIVE", new_status="FAILED", capability="ocr", priority=5, created_at=None
+    ))
+    assert cache.lookup(key) == (None, None)
+    assert cache.stats()["expired"] == 1
+
+
+def test_storage_is_bounded_with_lru_eviction():
+    cache = ResultCache(policies={"ocr": 60}, max_entries=2, max_bytes=24)
+    keys = [cache.key("ocr", "c1", "1", {"n": n}) for n in range(3)]
+    cache.store(keys[0], _response("t0", "x"))
+    cache.store(keys[1], _response("t1", "y"))
+    cache.lookup(keys[0])
+    cache.store(keys[2], _response("t2", "z"))
+    assert [cache.lookup(key)[0] is not None for key in keys] == [True, False, True]
+
+    # Byte budget: one large result evicts the rest, an oversized one is not cached
+    cache.store(keys[1], _response("t1", "y" * 20))
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 22
+    cache.store(keys[0], _response("t0", "x" * 40))
+    assert cache.lookup(keys[0])[0] is None
+    assert cache.stats()["evicted"] == 3
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    """TestClient on a fresh database, result cache and dispatch state"""
+    _, path = tempfile.mkstemp()
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Agent.metadata.create_all(bind=engine)
+    Task.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    cache = ResultCache()
+    monkeypatch.setattr(api, "result_cache", cache)
+    task_events.subscribe(cache.on_task_change)
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app), engine, cache
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        task_events.unsubscribe(cache.on_task_change)
+        engine.dispose()
+        os.unlink(path)
+
+
+def test_identical_submissions_from_two_clients_stay_separate(api_client):
+    client, engine, cache = api_client
+    capability = "ocr"
+    with engine.begin() as connection:
+        connection.execute(Agent.__table__.insert(), [
+            {"agent_id": agent_id, "display_name": agent_id, "public_key": secrets.token_hex(8),
+             "endpoint": "http://x", "signature": "s", "tags": [capability]}
+            for agent_id in ("client_a", "client_b", "worker")
+        ])
+        connection.execute(Capability.__table__.insert(), [
+            {"capability_id": secrets.token_hex(8), "agent_id": "worker", "name": capability,
+             "version": "1.0", "input_schema": {}, "output_schema": {}}
+        ])
+    # Queues and load counters left by earlier tests describe other databases
+    db = sessionmaker(bind=engine)()
+    fair_queue.load_from_db(db)
+    load_index.load_from_db(db)
+    db.close()
+    cache.set_policy(capability, 60)
+
+    def submit(client_id):
+        response = client.post("/aitp/tasks", json={
+            "client_id": client_id, "task_type": "ocr", "capability_required": capability,
+            "input_data": {"file": "a.png"}
+        })
+        assert response.status_code == 200
+        return response.json()
+
+    first_a = submit("client_a")
+    first_b = submit("client_b")
+    assert first_b["task_id"] != first_a["task_id"]
+    assert (first_b["client_id"], first_b["result_cache"]) == ("client_b", None)
+    assert submit("client_a")["task_id"] == first_a["task_id"]
+
+    # Client A's result is replayed to A only
+    with engine.begin() as connection:
+        connection.execute(update(Task.__table__).where(Task.__table__.c.task_id == first_a["task_id"])
+                           .values(status="ACTIVE", assigned_agent_id="worker"))
+    completed = client.put(f"/aitp/tasks/{first_a['task_id']}/status?agent_id=worker",
+                           json={"status": "COMPLETED", "result_data": {"text": "secret"}})
+    assert completed.status_code == 200
+
+    hit = submit("client_a")
+    assert (hit["task_id"], hit["result_cache"], hit["result_data"]) == (first_a["task_id"], "hit", {"text": "secret"})
+    again_b = submit("client_b")
+    assert (again_b["task_id"], again_b["client_id"], again_b["result_cache"]) == \
+        (first_b["task_id"], "client_b", "coalesced")
+    assert again_b["result_data"] is None
+    assert cache.stats()["hit"] == 1
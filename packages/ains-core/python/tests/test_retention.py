@@ -0,0 +1,102 @@
+"""Test chunked, archiving, resumable retention"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, Column, String, DateTime
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from ains.retention import DEFAULT_CHECKPOINT_PATH, RetentionEngine, get_retention_engine
+
+Base = declarative_base()
+
+
+class Event(Base):
+    __tablename__ = "events"
+
+    event_id = Column(String(16), primary_key=True)
+    status = Column(String(16), nullable=False)
+    finished_at = Column(DateTime, nullable=False)
+
+
+NOW = datetime(2025, 6, 1)
+
+
+def old_done(cutoff):
+    return [Event.status == "DONE", Event.finished_at < cutoff]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    for i in range(25):
+        session.add(Event(event_id=f"e{i:03d}", status="DONE", finished_at=NOW - timedelta(days=60)))
+    for i in range(5):
+        session.add(Event(event_id=f"k{i:03d}", status="DONE", finished_at=NOW))
+        session.add(Event(event_id=f"p{i:03d}", status="PENDING", finished_at=NOW - timedelta(days=60)))
+    session.commit()
+
+    yield session
+    session.close()
+
+
+def test_purge_in_chunks(db):
+    engine = RetentionEngine(chunk_size=10, pause_seconds=0)
+    report = engine.purge(db, "events", Event, NOW - timedelta(days=30), old_done)
+
+    assert report["deleted"] == 25
+    assert report["chunks"] == 3
+    assert report["complete"]
+    assert report["rows_per_second"] > 0
+    assert db.query(Event).count() == 10
+
+
+def test_archive_and_resume(db):
+    with tempfile.TemporaryDirectory() as archive_dir:
+        engine = RetentionEngine(chunk_size=10, pause_seconds=0, archive_dir=archive_dir)
+
+        # Interrupted run leaves a checkpoint behind
+        first = engine.purge(db, "events", Event, NOW - timedelta(days=30), old_done, max_chunks=1)
+        assert first["deleted"] == 10 and not first["complete"]
+        with open(engine.checkpoint_path) as f:
+            assert json.load(f)["events"]["deleted"] == 10
+
+        # Resuming keeps the original cutoff even if a later one is passed
+        second = engine.purge(db, "events", Event, NOW + timedelta(days=30), old_done)
+        assert second["deleted"] == 15 and second["complete"]
+        assert db.query(Event).filter(Event.event_id.like("k%")).count() == 5
+        with open(engine.checkpoint_path) as f:
+            assert "events" not in json.load(f)
+
+        archived = []
+        for name in sorted(os.listdir(os.path.join(archive_dir, "events"))):
+            with gzip.open(os.path.join(archive_dir, "events", name), "rt") as f:
+                archived.extend(json.loads(line) for line in f)
+
+        assert len(archived) == 25
+        assert archived[0]["event_id"] == "e000"
+        assert archived[0]["finished_at"].startswith("2025-04-02")
+
+
+def test_default_engine_resumes_without_archiving(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("AINS_ARCHIVE_DIR", "AINS_RETENTION_CHECKPOINT"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AINS_RETENTION_CHUNK_SIZE", "10")
+    monkeypatch.setenv("AINS_RETENTION_PAUSE_SECONDS", "0")
+
+    # Interrupted run: nothing archived, but the checkpoint is kept
+    first = get_retention_engine().purge(db, "events", Event, NOW - timedelta(days=30), old_done, max_chunks=1)
+    assert (first["deleted"], first["archived"], first["complete"]) == (10, 0, False)
+    assert os.path.exists(tmp_path / DEFAULT_CHECKPOINT_PATH)
+
+    # A fresh engine (e.g. after a restart) resumes with the original cutoff
+    second = get_retention_engine().purge(db, "events", Event, NOW + timedelta(days=30), old_done)
+    assert (second["deleted"], second["complete"]) == (15, True)
+    assert db.query(Event).filter(Event.event_id.like("k%")).count() == 5
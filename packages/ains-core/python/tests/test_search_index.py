@@ -0,0 +1,132 @@
+import time
+from types import SimpleNamespace
+
+from ains.search_index import AgentSearchIndex, tokenize
+
+
+def make_agent(agent_id, trust, tags, capabilities):
+    return SimpleNamespace(
+        agent_id=agent_id,
+        display_name=agent_id.title(),
+        trust_score=trust,
+        tags=tags,
+        capabilities=[
+            SimpleNamespace(
+                agent_id=agent_id,
+                name=name,
+                description=description,
+                price=price,
+                latency_p99_ms=latency
+            )
+            for name, description, price, latency in capabilities
+        ]
+    )
+
+
+def build_index():
+    index = AgentSearchIndex(rebuild_seconds=0)
+    index.load([
+        make_agent("translator", 0.9, ["nlp"], [
+            ("translate-text", "Translate documents between languages", 0.02, 300),
+        ]),
+        make_agent("summarizer", 0.7, ["nlp", "fast"], [
+            ("summarize-text", "Summarize long documents", 0.01, 120),
+        ]),
+        make_agent("vision", 0.8, ["images"], [
+            ("image-classify", "Classify images", 0.05, 800),
+        ]),
+    ])
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Translate-Text v2") == ["translate", "text", "v2"]
+    assert tokenize(None) == []
+
+
+def test_capability_substring_and_sort():
+    index = build_index()
+    results, total = index.search(capability="text")
+    assert total == 2
+    assert [r["agent_id"] for r in results] == ["translator", "summarizer"]
+
+    results, _ = index.search(capability="text", sort_by="price")
+    assert results[0]["agent_id"] == "summarizer"
+    assert results[0]["capabilities"] == ["summarize-text"]
+
+
+def test_prefix_and_fuzzy_matching():
+    index = build_index()
+    results, total = index.search(q="docu")
+    assert total == 2
+
+    _, total = index.search(q="sumarize")
+    assert total == 0
+    results, total = index.search(q="sumarize", fuzzy=True)
+    assert [r["agent_id"] for r in results] == ["summarizer"]
+
+
+def test_filters():
+    index = build_index()
+    _, total = index.search(tags=["nlp"], min_trust=0.8)
+    assert total == 1
+
+    results, _ = index.search(max_price=0.03, max_latency_ms=200)
+    assert [r["agent_id"] for r in results] == ["summarizer"]
+
+
+def test_writes_keep_index_in_sync():
+    index = build_index()
+    index.add_capability(SimpleNamespace(
+        agent_id="vision", name="ocr", description="Extract text from scans",
+        price=0.03, latency_p99_ms=400
+    ))
+    results, _ = index.search(q="scans")
+    assert [r["agent_id"] for r in results] == ["vision"]
+
+    index.update_trust("summarizer", 0.95)
+    results, _ = index.search(tags=["nlp"])
+    assert results[0]["agent_id"] == "summarizer"
+
+    index.remove_agent("vision")
+    _, total = index.search(q="scans")
+    assert total == 0
+    assert "scans" not in index.vocab
+
+
+def test_agents_without_capabilities_are_not_listed():
+    index = build_index()
+    index.add_agent(make_agent("idle", 0.99, ["nlp"], []))
+    assert "idle" in index.agents
+
+    # Unfiltered, tag and text searches all skip it, as the capability join did
+    results, total = index.search()
+    assert total == 3 and "idle" not in [r["agent_id"] for r in results]
+    _, total = index.search(tags=["nlp"])
+    assert total == 2
+    index.update_trust("idle", 1.0)
+    assert index.search(limit=1)[0][0]["agent_id"] == "translator"
+
+    # Publishing a capability lists it
+    index.add_capability(SimpleNamespace(
+        agent_id="idle", name="ocr", description="Read scans", price=None, latency_p99_ms=None
+    ))
+    results, total = index.search()
+    assert total == 4 and results[0]["agent_id"] == "idle"
+
+
+def test_search_latency_at_scale():
+    index = AgentSearchIndex(rebuild_seconds=0)
+    index.load([
+        make_agent(f"agent_{i}", (i % 100) / 100, [f"tag{i % 50}"], [
+            (f"cap-{i % 1000}", f"Capability number {i % 1000}", (i % 20) / 100, 100 + i % 900),
+        ])
+        for i in range(100_000)
+    ])
+
+    start = time.perf_counter()
+    results, total = index.search(q="cap 42", tags=["tag42"], min_trust=0.4, limit=10)
+    elapsed = time.perf_counter() - start
+
+    assert total > 0 and len(results) <= 10
+    assert elapsed < 0.05
@@ -0,0 +1,98 @@
+"""Test the virtual-clock scheduling simulator"""
+from datetime import datetime, timezone
+
+import pytest
+
+from ains.advanced_features import pick_fastest_response, pick_round_robin
+from ains.simulator import (
+    POLICIES,
+    AgentProfile,
+    ClientProfile,
+    Scenario,
+    Simulation,
+    default_scenario,
+    jain_index,
+    main,
+    simulate
+)
+
+
+def test_every_task_completes_or_fails_under_every_policy():
+    result = simulate(default_scenario(tasks=2000, agents=20, timeout_seconds=5.0))
+
+    for policy, report in result["policies"].items():
+        assert report["completed"] + report["failed"] == 2000, policy
+        assert sum(c["submitted"] for c in report["clients"].values()) == 2000
+        assert report["retries"] > 0
+        assert report["timeouts"] > 0
+        assert report["makespan_seconds"] > 0
+        assert 0 < report["fairness"] <= 1
+
+
+def test_runs_are_deterministic():
+    scenario = default_scenario(tasks=1000, agents=10, seed=7)
+    first = Simulation(scenario, "fair_queue").run()
+    second = Simulation(scenario, "fair_queue").run()
+    first.pop("runtime_seconds")
+    second.pop("runtime_seconds")
+    assert first == second
+
+
+def test_fair_queue_shields_small_tenant_from_bulk_backlog():
+    # Overloaded fleet: a bulk client floods the queue ahead of a small tenant
+    scenario = Scenario(
+        agents=[AgentProfile("a", 4, ["text"], latency_median=1.0, latency_sigma=0.1, concurrency=1)],
+        clients=[
+            ClientProfile("bulk", share=0.9, priority_range=(5, 5)),
+            ClientProfile("small", share=0.1, priority_range=(5, 5))
+        ],
+        tasks=3000,
+        load=1.5,
+        timeout_seconds=None
+    )
+    fifo = Simulation(scenario, "fifo").run()
+    fair = Simulation(scenario, "fair_queue").run()
+
+    small_fifo = fifo["clients"]["small"]["queue_wait_seconds"]["mean"]
+    small_fair = fair["clients"]["small"]["queue_wait_seconds"]["mean"]
+    assert small_fair < small_fifo / 5
+    assert fair["makespan_seconds"] == pytest.approx(fifo["makespan_seconds"], rel=0.05)
+
+
+def test_unknown_policy_and_unserved_capability_rejected():
+    with pytest.raises(ValueError):
+        Simulation(default_scenario(tasks=10), "random")
+
+    scenario = default_scenario(tasks=10, capability_mix={"audio": 1.0})
+    with pytest.raises(ValueError):
+        Simulation(scenario, POLICIES[0])
+
+
+def test_routing_rules_and_fairness_index():
+    class A:
+        def __init__(self, agent_id, last_assigned_at=None, avg=None, completed=0):
+            self.agent_id = agent_id
+            self.last_assigned_at = last_assigned_at
+            self.avg_completion_time_seconds = avg
+            self.total_tasks_completed = completed
+
+    old = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    new = datetime(2025, 1, 2)
+    assert pick_round_robin([A("a", new), A("b", old), A("c", old)]).agent_id == "b"
+    assert pick_round_robin([A("a", old), A("b")]).agent_id == "b"
+    assert pick_fastest_response([A("a"), A("b", avg=3.0, completed=1), A("c", avg=2.0, completed=4)]).agent_id == "c"
+    assert pick_fastest_response([A("a"), A("b")]).agent_id == "a"
+
+    assert jain_index([2.0, 2.0, 2.0]) == 1.0
+    assert jain_index([1.0, 0.0, 0.0, 0.0]) == 0.25
+    assert jain_index([0.0, 0.0]) == 1.0
+
+
+def test_cli_table_keeps_columns_apart(capsys):
+    assert main(["--tasks", "500", "--agents", "5", "--policies", "fifo,fastest_response"]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["policy", "wait", "p50", "wait", "p99", "lat", "p99",
+                                "makespan", "fairness", "failed", "runtime"]
+    for line in lines[1:3]:
+        assert len(line.split()) == 8
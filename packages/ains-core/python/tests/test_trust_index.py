@@ -0,0 +1,77 @@
+"""Test the agent trust index: per-capability weighted samplers kept in step with trust"""
+import random
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ains.db import Agent
+from ains.trust_index import TrustIndex, SAMPLER_AVAILABLE
+
+pytestmark = pytest.mark.skipif(not SAMPLER_AVAILABLE, reason="aicp (weighted sampler) not installed")
+
+
+def _index(agents):
+    index = TrustIndex()
+    index.loaded = True
+    for agent_id, tags, trust_score in agents:
+        index.track_agent(agent_id, tags, trust_score)
+    return index
+
+
+def _shares(index, capability, draws=4000):
+    rng = random.Random(11)
+    counts = Counter(index.sample(capability, rng) for _ in range(draws))
+    return {agent_id: count / draws for agent_id, count in counts.items()}
+
+
+def test_samples_trusted_agents_by_weight_and_falls_back_to_any_capable():
+    index = _index([("a1", ["text"], 0.9), ("a2", ["text"], 0.3), ("a3", ["text", "code"], 0.1)])
+
+    shares = _shares(index, "text")
+    assert set(shares) == {"a1", "a2"}
+    assert shares["a1"] == pytest.approx(0.75, abs=0.03)
+    # Only an untrusted agent has the capability: it is still chosen
+    assert index.sample("code") == "a3"
+    assert index.sample("image") is None
+
+
+def test_trust_and_tag_changes_update_samplers_in_place():
+    index = _index([("a1", ["text"], 0.9), ("a2", ["text"], 0.9)])
+
+    index.track_agent("a1", ["text"], 0.0)
+    assert set(_shares(index, "text")) == {"a2"}
+    index.track_agent("a2", ["code"], 0.9)
+    assert _shares(index, "text") == {"a1": 1.0}
+    assert index.sample("code") == "a2"
+
+    index.forget_agent("a2")
+    assert index.sample("code") is None
+    assert index.stats() == {"agents": 1, "capabilities": 2, "trusted": 0}
+
+
+def test_load_from_db_reads_agents_with_one_query():
+    engine = create_engine("sqlite:///:memory:")
+    Agent.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(Agent.__table__.insert(), [
+            {"agent_id": agent_id, "display_name": agent_id, "public_key": "k",
+             "endpoint": "http://x", "signature": "s", "tags": ["text"], "trust_score": trust_score}
+            for agent_id, trust_score in (("a1", 0.8), ("a2", 0.05))
+        ])
+
+    db = sessionmaker(bind=engine)()
+    index = TrustIndex()
+    index.ensure_loaded(db)
+    assert index.loaded
+    assert {index.sample("text") for _ in range(50)} == {"a1"}
+    db.close()
+
+
+def test_sample_skips_rejected_agents():
+    index = _index([("busy", ["text"], 1.0), ("idle", ["text"], 0.1)])
+
+    picks = {index.sample("text", accept=lambda agent_id: agent_id != "busy") for _ in range(50)}
+    assert picks == {"idle"}
+    assert index.sample("text", accept=lambda agent_id: False) is None